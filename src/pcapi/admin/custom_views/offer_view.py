@@ -4,6 +4,7 @@ from typing import Union
 
 from flask import abort
 from flask import flash
+from flask import g
 from flask import has_app_context
 from flask import redirect
 from flask import request
@@ -34,8 +35,7 @@ from pcapi.core.offers import api as offers_api
 from pcapi.core.offers.api import import_offer_validation_config
 from pcapi.core.offers.models import OfferValidationConfig
 from pcapi.core.offers.models import OfferValidationStatus
-from pcapi.core.offers.offer_validation import compute_offer_validation_score
-from pcapi.core.offers.offer_validation import parse_offer_validation_config
+from pcapi.core.offers.offer_validation import get_compiled_offer_validation_config
 import pcapi.core.offers.repository as offers_repository
 from pcapi.core.offers.validation import check_user_can_load_config
 from pcapi.domain.admin_emails import send_offer_validation_notification_to_administration
@@ -223,9 +223,12 @@ def _venue_link(view, context, model, name) -> Markup:
 
 
 def _compute_score(view, context, model, name) -> float:
-    current_config = offers_repository.get_current_offer_validation_config()
-    validation_items = parse_offer_validation_config(model, current_config)[1]
-    return compute_offer_validation_score(validation_items)
+    # Offers of the list view are scored in batch by `get_list()`.
+    scores = g.get("offer_validation_scores", {})
+    if model.id in scores:
+        return scores[model.id]
+    current_config = get_compiled_offer_validation_config()
+    return current_config.compute_score(model)
 
 
 class OfferValidationForm(SecureForm):
@@ -279,6 +282,16 @@ class ValidationView(BaseAdminView):
     def get_query(self):
         return self.session.query(self.model).filter(self.model.validation == OfferValidationStatus.PENDING)
 
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        count, offers = super().get_list(
+            page, sort_column, sort_desc, search, filters, execute=execute, page_size=page_size
+        )
+        current_config = get_compiled_offer_validation_config()
+        if execute and current_config:
+            scores = current_config.compute_scores(offers)
+            g.offer_validation_scores = {offer.id: score for offer, score in zip(offers, scores)}
+        return count, offers
+
     def get_count_query(self):
         return self.session.query(func.count("*")).filter(self.model.validation == OfferValidationStatus.PENDING)
 
@@ -370,8 +383,7 @@ class ValidationView(BaseAdminView):
         legal_category_label = (
             legal_category["legal_category_label"] or "Ce lieu n'a pas de libellé de catégorie juridique"
         )
-        current_config = offers_repository.get_current_offer_validation_config()
-        validation_items = parse_offer_validation_config(offer, current_config)[1]
+        current_config = get_compiled_offer_validation_config()
         context = {
             "form": form,
             "cancel_link_url": url_for("/validation.index_view"),
@@ -380,7 +392,7 @@ class ValidationView(BaseAdminView):
             "pc_offer_url": _pro_offer_url(offer.id),
             "metabase_offer_url": _metabase_offer_url(offer.id) if IS_PROD else None,
             "offer_name": offer.name,
-            "offer_score": compute_offer_validation_score(validation_items),
+            "offer_score": current_config.compute_score(offer),
             "venue_name": offer.venue.publicName or offer.venue.name,
             "offerer_name": offer.venue.managingOfferer.name,
             "venue_url": _venue_url(offer.venue),
@@ -0,0 +1,37 @@
+"""add booking_side_effect table
+
+Revision ID: 5b9f2e1c7a3d
+Revises: ab0e07746494
+Create Date: 2021-06-28 10:12:43.518702
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b9f2e1c7a3d"
+down_revision = "ab0e07746494"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "booking_side_effect",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("bookingId", sa.BigInteger(), nullable=False),
+        sa.Column("type", sa.String(length=24), nullable=False),
+        sa.Column("dateCreated", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("dateLastAttempt", sa.DateTime(), nullable=True),
+        sa.Column("lastError", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["bookingId"], ["booking.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_booking_side_effect_bookingId"), "booking_side_effect", ["bookingId"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_booking_side_effect_bookingId"), table_name="booking_side_effect")
+    op.drop_table("booking_side_effect")
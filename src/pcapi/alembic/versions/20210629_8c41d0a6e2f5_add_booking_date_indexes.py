@@ -0,0 +1,55 @@
+"""add indexes on booking.dateCreated and booking.cancellationDate
+
+Revision ID: 8c41d0a6e2f5
+Revises: 5b9f2e1c7a3d
+Create Date: 2021-06-29 09:41:17.204395
+
+"""
+from alembic import op
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "8c41d0a6e2f5"
+down_revision = "5b9f2e1c7a3d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_booking_dateCreated" ON booking ("dateCreated")
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_booking_cancellationDate" ON booking ("cancellationDate")
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+
+def downgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_booking_cancellationDate"
+        """
+    )
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_booking_dateCreated"
+        """
+    )
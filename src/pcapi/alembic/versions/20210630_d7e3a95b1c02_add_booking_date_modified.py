@@ -0,0 +1,47 @@
+"""add booking.dateModified, updated by a trigger
+
+Revision ID: d7e3a95b1c02
+Revises: 8c41d0a6e2f5
+Create Date: 2021-06-30 11:05:52.736120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d7e3a95b1c02"
+down_revision = "8c41d0a6e2f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("booking", sa.Column("dateModified", sa.DateTime(), nullable=True))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION save_booking_modification_date()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            -- Keep the date if it is explicitly set by the UPDATE
+            IF TG_OP = 'INSERT' OR NEW."dateModified" IS NOT DISTINCT FROM OLD."dateModified" THEN
+                NEW."dateModified" = NOW();
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS booking_update_modification_date ON booking;
+
+        CREATE TRIGGER booking_update_modification_date
+        BEFORE INSERT OR UPDATE ON booking
+        FOR EACH ROW
+        EXECUTE PROCEDURE save_booking_modification_date()
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS booking_update_modification_date ON booking")
+    op.execute("DROP FUNCTION IF EXISTS save_booking_modification_date")
+    op.drop_column("booking", "dateModified")
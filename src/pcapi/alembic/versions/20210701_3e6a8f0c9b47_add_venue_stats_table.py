@@ -0,0 +1,36 @@
+"""add venue_stats table
+
+Revision ID: 3e6a8f0c9b47
+Revises: d7e3a95b1c02
+Create Date: 2021-07-01 09:41:27.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3e6a8f0c9b47"
+down_revision = "d7e3a95b1c02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "venue_stats",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("venueId", sa.BigInteger(), nullable=False),
+        sa.Column("activeBookingsQuantity", sa.BigInteger(), nullable=False),
+        sa.Column("validatedBookingsQuantity", sa.BigInteger(), nullable=False),
+        sa.Column("activeOffersCount", sa.BigInteger(), nullable=False),
+        sa.Column("soldOutOffersCount", sa.BigInteger(), nullable=False),
+        sa.Column("dateUpdated", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["venueId"], ["venue.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("venueId"),
+    )
+
+
+def downgrade():
+    op.drop_table("venue_stats")
@@ -0,0 +1,174 @@
+"""add offer.status, maintained by triggers
+
+Revision ID: 6f2d4b8a1c93
+Revises: 3e6a8f0c9b47
+Create Date: 2021-07-02 10:27:08.511234
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "6f2d4b8a1c93"
+down_revision = "3e6a8f0c9b47"
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 10_000
+
+
+def upgrade():
+    op.add_column("offer", sa.Column("status", sa.String(length=8), server_default="ACTIVE", nullable=False))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION compute_offer_status(offer_id BIGINT, validation TEXT, is_active BOOLEAN)
+        RETURNS TEXT AS $$
+        BEGIN
+            IF validation IN ('REJECTED', 'PENDING', 'DRAFT') THEN
+                RETURN validation;
+            END IF;
+            IF NOT is_active THEN
+                RETURN 'INACTIVE';
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM stock WHERE "offerId" = offer_id AND NOT "isSoftDeleted"
+            ) AND NOT EXISTS (
+                SELECT 1 FROM stock
+                WHERE "offerId" = offer_id
+                AND NOT "isSoftDeleted"
+                AND ("bookingLimitDatetime" IS NULL OR "bookingLimitDatetime" > NOW())
+            ) THEN
+                RETURN 'EXPIRED';
+            END IF;
+            IF NOT EXISTS (
+                SELECT 1 FROM stock
+                WHERE "offerId" = offer_id
+                AND NOT "isSoftDeleted"
+                AND ("beginningDatetime" IS NULL OR "beginningDatetime" > NOW())
+                AND (quantity IS NULL OR quantity - "dnBookedQuantity" > 0)
+            ) THEN
+                RETURN 'SOLD_OUT';
+            END IF;
+            RETURN 'ACTIVE';
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION save_offer_status()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.status = compute_offer_status(NEW.id, NEW.validation::text, NEW."isActive");
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS offer_update_status ON offer;
+
+        CREATE TRIGGER offer_update_status
+        BEFORE INSERT OR UPDATE OF validation, "isActive" ON offer
+        FOR EACH ROW
+        EXECUTE PROCEDURE save_offer_status()
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_offer_status(offer_id BIGINT)
+        RETURNS VOID AS $$
+        BEGIN
+            -- Only write when the status changes, to avoid locking the offer
+            -- on each booking.
+            UPDATE offer
+            SET status = compute_offer_status(id, validation::text, "isActive")
+            WHERE id = offer_id
+            AND status IS DISTINCT FROM compute_offer_status(id, validation::text, "isActive");
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION update_offer_status_from_stock()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM refresh_offer_status(OLD."offerId");
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW."offerId" != OLD."offerId") THEN
+                PERFORM refresh_offer_status(NEW."offerId");
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS stock_update_offer_status ON stock;
+
+        CREATE TRIGGER stock_update_offer_status
+        AFTER INSERT OR DELETE
+        OR UPDATE OF "offerId", quantity, "dnBookedQuantity", "bookingLimitDatetime", "beginningDatetime", "isSoftDeleted"
+        ON stock
+        FOR EACH ROW
+        EXECUTE PROCEDURE update_offer_status_from_stock()
+        """
+    )
+
+    # Commit the column and the triggers, so that the indexes can be
+    # built concurrently and each batch of the backfill below is
+    # committed on its own, without locking all offers until the end.
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_offer_status" ON offer (status)
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_stock_bookingLimitDatetime" ON stock ("bookingLimitDatetime")
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+    connection = op.get_bind()
+    max_id = connection.execute("SELECT max(id) FROM offer").scalar() or 0
+    for start in range(0, max_id + 1, BATCH_SIZE):
+        connection.execute(
+            sa.text(
+                """
+                UPDATE offer
+                SET status = compute_offer_status(id, validation::text, "isActive")
+                WHERE id BETWEEN :start AND :end
+                AND status IS DISTINCT FROM compute_offer_status(id, validation::text, "isActive")
+                """
+            ),
+            start=start,
+            end=start + BATCH_SIZE - 1,
+        )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS stock_update_offer_status ON stock")
+    op.execute("DROP FUNCTION IF EXISTS update_offer_status_from_stock")
+    op.execute("DROP FUNCTION IF EXISTS refresh_offer_status")
+    op.execute("DROP TRIGGER IF EXISTS offer_update_status ON offer")
+    op.execute("DROP FUNCTION IF EXISTS save_offer_status")
+    op.execute("DROP FUNCTION IF EXISTS compute_offer_status")
+    op.execute("COMMIT")
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_stock_bookingLimitDatetime"
+        """
+    )
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_offer_status"
+        """
+    )
+    op.drop_column("offer", "status")
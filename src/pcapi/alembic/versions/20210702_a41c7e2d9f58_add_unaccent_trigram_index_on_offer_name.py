@@ -0,0 +1,87 @@
+"""add_unaccent_trigram_index_on_offer_name
+
+Revision ID: a41c7e2d9f58
+Revises: 6f2d4b8a1c93
+Create Date: 2021-07-02 15:48:21.307412
+
+"""
+from typing import Optional
+
+from alembic import op
+import sqlalchemy as sa
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "a41c7e2d9f58"
+down_revision = "6f2d4b8a1c93"
+branch_labels = None
+depends_on = None
+
+
+def _is_index_valid(index_name: str) -> Optional[bool]:
+    """Return whether the index is valid, or None if it does not exist."""
+    return (
+        op.get_bind()
+        .execute(sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), name=index_name)
+        .scalar()
+    )
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        """
+    )
+    op.execute("COMMIT")
+    # A cancelled concurrent build leaves an INVALID index, that
+    # `IF NOT EXISTS` would keep: drop it to build it again.
+    if _is_index_valid("idx_offer_trgm_unaccent_name") is False:
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS "idx_offer_trgm_unaccent_name"')
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_offer_trgm_unaccent_name"
+        ON offer USING gin (immutable_unaccent(name) gin_trgm_ops)
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+    # Only drop the old index once the new one can be used.
+    if not _is_index_valid("idx_offer_trgm_unaccent_name"):
+        raise RuntimeError("Index idx_offer_trgm_unaccent_name is not valid, idx_offer_trgm_name has been kept")
+    op.execute('DROP INDEX CONCURRENTLY IF EXISTS "idx_offer_trgm_name"')
+
+
+def downgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_offer_trgm_name"
+        ON offer USING gin (name gin_trgm_ops)
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+    op.execute('DROP INDEX CONCURRENTLY IF EXISTS "idx_offer_trgm_unaccent_name"')
+    op.execute("DROP FUNCTION IF EXISTS immutable_unaccent")
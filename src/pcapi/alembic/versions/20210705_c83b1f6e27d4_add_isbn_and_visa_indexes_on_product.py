@@ -0,0 +1,49 @@
+"""add_isbn_and_visa_indexes_on_product
+
+Revision ID: c83b1f6e27d4
+Revises: a41c7e2d9f58
+Create Date: 2021-07-05 09:41:56.120387
+
+"""
+from alembic import op
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "c83b1f6e27d4"
+down_revision = "a41c7e2d9f58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_product_isbn" ON product (("extraData" ->> 'isbn'))
+        WHERE "extraData" ->> 'isbn' IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_product_visa" ON product (("extraData" ->> 'visa'))
+        WHERE "extraData" ->> 'visa' IS NOT NULL
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+
+def downgrade():
+    op.execute("COMMIT")
+    op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_product_visa"')
+    op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_product_isbn"')
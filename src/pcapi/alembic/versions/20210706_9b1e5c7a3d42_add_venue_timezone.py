@@ -0,0 +1,90 @@
+"""add venue.timezone
+
+Revision ID: 9b1e5c7a3d42
+Revises: c83b1f6e27d4
+Create Date: 2021-07-06 14:12:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "9b1e5c7a3d42"
+down_revision = "c83b1f6e27d4"
+branch_labels = None
+depends_on = None
+
+
+# Copied from `pcapi.utils.date.CUSTOM_TIMEZONES` at the time of writing.
+CUSTOM_TIMEZONES = {
+    "971": "America/Guadeloupe",
+    "972": "America/Martinique",
+    "973": "America/Cayenne",
+    "974": "Indian/Reunion",
+    "975": "America/Miquelon",
+    "976": "Indian/Mayotte",
+    "977": "America/St_Barthelemy",
+    "978": "America/Guadeloupe",
+    "986": "Pacific/Wallis",
+    "987": "Pacific/Tahiti",
+    "988": "Pacific/Noumea",
+    "989": "Pacific/Pitcairn",
+}
+
+
+def upgrade():
+    # Adding a column with a constant default does not rewrite the table,
+    # only venues outside of the metropole timezone need to be updated.
+    op.add_column(
+        "venue", sa.Column("timezone", sa.String(length=50), server_default="Europe/Paris", nullable=False)
+    )
+    when_clauses = " ".join(
+        f"WHEN '{departement_code}' THEN '{timezone}'" for departement_code, timezone in CUSTOM_TIMEZONES.items()
+    )
+    op.execute(
+        f"""
+        UPDATE venue
+        SET timezone = CASE departement_code {when_clauses} END
+        FROM (
+            SELECT
+                venue.id AS venue_id,
+                COALESCE(
+                    venue."departementCode",
+                    CASE
+                        WHEN substring(offerer."postalCode", 1, 2)::int >= 97
+                        THEN substring(offerer."postalCode", 1, 3)
+                        ELSE substring(offerer."postalCode", 1, 2)
+                    END
+                ) AS departement_code
+            FROM venue
+            JOIN offerer ON offerer.id = venue."managingOffererId"
+        ) AS venue_departement
+        WHERE venue.id = venue_departement.venue_id
+        AND venue_departement.departement_code IN ({", ".join(f"'{code}'" for code in CUSTOM_TIMEZONES)})
+        """
+    )
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_venue_timezone" ON venue (timezone)
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+
+def downgrade():
+    op.execute("COMMIT")
+    op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_venue_timezone"')
+    op.drop_column("venue", "timezone")
@@ -0,0 +1,45 @@
+"""add index on booking.dateModified
+
+Revision ID: 4e7a2c9d1b58
+Revises: 9b1e5c7a3d42
+Create Date: 2021-07-07 10:23:41.518277
+
+"""
+from alembic import op
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "4e7a2c9d1b58"
+down_revision = "9b1e5c7a3d42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_booking_dateModified" ON booking ("dateModified")
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+
+def downgrade():
+    op.execute("COMMIT")
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_booking_dateModified"
+        """
+    )
@@ -0,0 +1,104 @@
+"""add venue_stats.isStale, set by a trigger on offer
+
+Revision ID: 7d3f1a9c5e26
+Revises: 4e7a2c9d1b58
+Create Date: 2021-07-08 09:52:14.206733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pcapi import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "7d3f1a9c5e26"
+down_revision = "4e7a2c9d1b58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("venue_stats", sa.Column("isStale", sa.Boolean(), server_default=sa.text("false"), nullable=False))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION mark_venue_stats_stale(venue_id BIGINT)
+        RETURNS VOID AS $$
+        BEGIN
+            -- Only write when the stats are not already stale, to avoid
+            -- locking them on each change.
+            UPDATE venue_stats SET "isStale" = true WHERE "venueId" = venue_id AND NOT "isStale";
+            IF NOT FOUND AND NOT EXISTS (SELECT 1 FROM venue_stats WHERE "venueId" = venue_id) THEN
+                INSERT INTO venue_stats (
+                    "venueId", "activeBookingsQuantity", "validatedBookingsQuantity",
+                    "activeOffersCount", "soldOutOffersCount", "isStale"
+                )
+                VALUES (venue_id, 0, 0, 0, 0, true)
+                ON CONFLICT ("venueId") DO NOTHING;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION mark_venue_stats_stale_from_offer()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (
+                TG_OP = 'UPDATE' AND (NEW.status IS DISTINCT FROM OLD.status OR NEW."venueId" != OLD."venueId")
+            ) THEN
+                PERFORM mark_venue_stats_stale(OLD."venueId");
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW."venueId" != OLD."venueId") THEN
+                PERFORM mark_venue_stats_stale(NEW."venueId");
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS offer_mark_venue_stats_stale ON offer;
+
+        CREATE TRIGGER offer_mark_venue_stats_stale
+        AFTER INSERT OR UPDATE OR DELETE ON offer
+        FOR EACH ROW
+        EXECUTE PROCEDURE mark_venue_stats_stale_from_offer()
+        """
+    )
+
+    op.execute("COMMIT")
+    op.execute(
+        """
+        SET SESSION statement_timeout = '300s'
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_booking_confirmationDate" ON booking ("confirmationDate")
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_stock_dateModified" ON stock ("dateModified")
+        """
+    )
+    op.execute(
+        f"""
+        SET SESSION statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS offer_mark_venue_stats_stale ON offer")
+    op.execute("DROP FUNCTION IF EXISTS mark_venue_stats_stale_from_offer")
+    op.execute("DROP FUNCTION IF EXISTS mark_venue_stats_stale")
+    op.drop_column("venue_stats", "isStale")
+    op.execute("COMMIT")
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_stock_dateModified"
+        """
+    )
+    op.execute(
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS "ix_booking_confirmationDate"
+        """
+    )
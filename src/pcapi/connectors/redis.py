@@ -1,5 +1,8 @@
 from enum import Enum
 import logging
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
 
 import redis
 from redis import Redis
@@ -18,6 +21,16 @@ class RedisBucket(Enum):
     REDIS_HASHMAP_INDEXED_OFFERS_NAME = "indexed_offers"
 
 
+BOOKING_QR_CODE_KEY = "booking_qr_code:{token}"
+BOOKING_QR_CODE_TIMEOUT = 60 * 60 * 24 * 30  # seconds
+
+NATIVE_OFFER_RESPONSE_KEY = "native_offer_response:{offer_id}"
+# The response depends on the current time (cancellation limit date,
+# expired stocks) and on writes done in SQL only (e.g. bulk updates),
+# hence a short timeout on top of the invalidation upon ORM writes.
+NATIVE_OFFER_RESPONSE_TIMEOUT = 60  # seconds
+
+
 def add_offer_id(client: Redis, offer_id: int) -> None:
     try:
         client.rpush(RedisBucket.REDIS_LIST_OFFER_IDS_NAME.value, offer_id)
@@ -25,6 +38,13 @@ def add_offer_id(client: Redis, offer_id: int) -> None:
         logger.exception("[REDIS] %s", error)
 
 
+def add_offer_ids(client: Redis, offer_ids: list[int]) -> None:
+    try:
+        client.rpush(RedisBucket.REDIS_LIST_OFFER_IDS_NAME.value, *offer_ids)
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
+
+
 def add_venue_id(client: Redis, venue_id: int) -> None:
     try:
         client.rpush(RedisBucket.REDIS_LIST_VENUE_IDS_NAME.value, venue_id)
@@ -139,3 +159,61 @@ def delete_offer_ids_in_error(client: Redis) -> None:
         )
     except redis.exceptions.RedisError as error:
         logger.exception("[REDIS] %s", error)
+
+
+def get_booking_qr_code(client: Redis, token: str) -> Optional[str]:
+    try:
+        qr_code = client.get(BOOKING_QR_CODE_KEY.format(token=token))
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
+        return None
+    if isinstance(qr_code, bytes):
+        qr_code = qr_code.decode("utf-8")
+    return qr_code
+
+
+def set_booking_qr_code(client: Redis, token: str, qr_code: str) -> None:
+    try:
+        client.set(BOOKING_QR_CODE_KEY.format(token=token), qr_code, ex=BOOKING_QR_CODE_TIMEOUT)
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
+
+
+def get_native_offer_response(client: Redis, offer_id: int) -> Optional[Tuple[str, str]]:
+    """Return the cached (etag, body) of the native offer response."""
+    try:
+        cached = client.hgetall(NATIVE_OFFER_RESPONSE_KEY.format(offer_id=offer_id))
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
+        return None
+    if not cached:
+        return None
+    cached = {
+        (key.decode("utf-8") if isinstance(key, bytes) else key): (
+            value.decode("utf-8") if isinstance(value, bytes) else value
+        )
+        for key, value in cached.items()
+    }
+    return cached["etag"], cached["body"]
+
+
+def set_native_offer_response(client: Redis, offer_id: int, etag: str, body: str) -> None:
+    key = NATIVE_OFFER_RESPONSE_KEY.format(offer_id=offer_id)
+    try:
+        pipeline = client.pipeline(transaction=True)
+        pipeline.hset(key, "etag", etag)
+        pipeline.hset(key, "body", body)
+        pipeline.expire(key, NATIVE_OFFER_RESPONSE_TIMEOUT)
+        pipeline.execute()
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
+
+
+def delete_native_offer_responses(client: Redis, offer_ids: Iterable[int]) -> None:
+    keys = [NATIVE_OFFER_RESPONSE_KEY.format(offer_id=offer_id) for offer_id in offer_ids]
+    if not keys:
+        return
+    try:
+        client.delete(*keys)
+    except redis.exceptions.RedisError as error:
+        logger.exception("[REDIS] %s", error)
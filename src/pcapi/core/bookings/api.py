@@ -1,7 +1,10 @@
 import base64
+import csv
 import datetime
 import io
 import logging
+import secrets
+import tempfile
 import typing
 
 from PIL import Image
@@ -9,27 +12,46 @@ from flask import current_app as app
 import pytz
 import qrcode
 import qrcode.image.svg
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from pcapi.connectors import redis
 from pcapi.core.bookings import conf
+from pcapi.core.bookings import exceptions
+from pcapi.core.bookings import repository as bookings_repository
 from pcapi.core.bookings.models import Booking
 from pcapi.core.bookings.models import BookingCancellationReasons
-from pcapi.core.bookings.repository import generate_booking_token
+from pcapi.core.bookings.models import BookingSideEffect
+from pcapi.core.bookings.models import BookingSideEffectType
 from pcapi.core.offers import repository as offers_repository
 from pcapi.core.offers.models import Offer
 from pcapi.core.offers.models import Stock
+from pcapi.core.users import repository as users_repository
+from pcapi.core.users import utils as users_utils
 from pcapi.core.users.models import User
 from pcapi.domain import user_emails
+from pcapi.domain.booking_recap.booking_recap import BookBookingRecap
+from pcapi.domain.booking_recap.booking_recap import BookingRecap
+from pcapi.domain.booking_recap.booking_recap import BookingRecapStatus
+from pcapi.domain.booking_recap.booking_recap import EventBookingRecap
+from pcapi.domain.booking_recap.booking_recap_history import BookingRecapValidatedHistory
 from pcapi.flask_app import db
+from pcapi.models.api_errors import ApiErrors
 from pcapi.models.feature import FeatureToggle
+from pcapi.notifications.push import update_users_attributes
+from pcapi.notifications.push.user_attributes_updates import UserUpdateData
+from pcapi.notifications.push.user_attributes_updates import get_user_attributes
+from pcapi.notifications.push.user_attributes_updates import get_user_booking_attributes
 from pcapi.repository import feature_queries
+from pcapi.repository import payment_queries
 from pcapi.repository import repository
 from pcapi.repository import transaction
 from pcapi.utils.mailing import MailServiceException
+from pcapi.utils.token import random_token
+from pcapi.workers.booking_side_effects_job import process_booking_side_effects_job
 from pcapi.workers.push_notification_job import send_cancel_booking_notification
 from pcapi.workers.push_notification_job import update_user_attributes_job
-from pcapi.workers.push_notification_job import update_user_bookings_attributes_job
-from pcapi.workers.user_emails_job import send_booking_cancellation_emails_to_user_and_offerer_job
 
 from . import validation
 
@@ -41,6 +63,35 @@ QR_CODE_VERSION = 2
 QR_CODE_BOX_SIZE = 5
 QR_CODE_BOX_BORDER = 1
 
+BOOKING_TOKEN_MAX_ATTEMPTS = 10
+BOOKING_SIDE_EFFECTS_BATCH_SIZE = 500
+BOOKING_SIDE_EFFECT_MAX_ATTEMPTS = 5
+BOOKING_SIDE_EFFECT_RETRY_DELAY = datetime.timedelta(minutes=10)
+
+BOOKINGS_RECAP_EXPORT_BUCKET = "exports"
+BOOKINGS_RECAP_EXPORT_URL_EXPIRATION = datetime.timedelta(days=2)
+BOOKINGS_RECAP_CSV_HEADER = [
+    "Lieu",
+    "Nom de l’offre",
+    "Date de l'évènement",
+    "ISBN",
+    "Nom et prénom du bénéficiaire",
+    "Email du bénéficiaire",
+    "Téléphone du bénéficiaire",
+    "Date et heure de réservation",
+    "Contremarque",
+    "Prix de la réservation",
+    "Statut de la contremarque",
+    "Date et heure de validation",
+]
+BOOKING_RECAP_STATUS_LABELS = {
+    BookingRecapStatus.booked: "réservé",
+    BookingRecapStatus.confirmed: "confirmé",
+    BookingRecapStatus.validated: "validé",
+    BookingRecapStatus.cancelled: "annulé",
+    BookingRecapStatus.reimbursed: "remboursé",
+}
+
 
 def book_offer(
     beneficiary: User,
@@ -49,47 +100,55 @@ def book_offer(
 ) -> Booking:
     """
     Return a booking or raise an exception if it's not possible.
-    Update a user's credit information on Batch.
+    Emails, reindexation and Batch updates are processed afterwards
+    by `process_booking_side_effects()`.
     """
-    # The call to transaction here ensures we free the FOR UPDATE lock
-    # on the stock if validation issues an exception
-    with transaction():
-        stock = offers_repository.get_and_lock_stock(stock_id=stock_id)
-        validation.check_can_book_free_offer(beneficiary, stock)
-        validation.check_offer_already_booked(beneficiary, stock.offer)
-        validation.check_quantity(stock.offer, quantity)
-        validation.check_stock_is_bookable(stock)
-        total_amount = quantity * stock.price
-        validation.check_expenses_limits(beneficiary, total_amount, stock.offer)
-        validation.check_activation_code_available(stock)
-
-        # FIXME (dbaty, 2020-10-20): if we directly set relations (for
-        # example with `booking.user = beneficiary`) instead of foreign keys,
-        # the session tries to add the object when `get_user_expenses()`
-        # is called because autoflush is enabled. As such, the PostgreSQL
-        # exceptions (tooManyBookings and insufficientFunds) may raise at
-        # this point and will bubble up. If we want them to be caught, we
-        # have to set foreign keys, so that the session is NOT autoflushed
-        # in `get_user_expenses` and is only committed in `repository.save()`
-        # where exceptions are caught. Since we are using flask-sqlalchemy,
-        # I don't think that we should use autoflush, nor should we use
-        # the `pcapi.repository.repository` module.
-        booking = Booking(
-            userId=beneficiary.id,
-            stockId=stock.id,
-            amount=stock.price,
-            quantity=quantity,
-            token=generate_booking_token(),
-        )
-
-        booking.dateCreated = datetime.datetime.utcnow()
-        booking.confirmationDate = compute_confirmation_date(stock.beginningDatetime, booking.dateCreated)
-
-        set_booking_is_used_for_digital_offers_with_activation_code(stock, booking)
-
-        stock.dnBookedQuantity += booking.quantity
+    # Checks are first done without any lock, to reject most invalid
+    # bookings cheaply. Those that depend on the other bookings of the
+    # beneficiary are done again in `_save_booking()`, under a lock.
+    stock = offers_repository.get_stock_for_booking(stock_id=stock_id)
+    validation.check_can_book_free_offer(beneficiary, stock)
+    validation.check_offer_already_booked(beneficiary, stock.offer)
+    validation.check_quantity(stock.offer, quantity)
+    validation.check_stock_is_bookable(stock)
+    total_amount = quantity * stock.price
+    validation.check_expenses_limits(beneficiary, total_amount, stock.offer)
+    validation.check_activation_code_available(stock)
+
+    # FIXME (dbaty, 2020-10-20): if we directly set relations (for
+    # example with `booking.user = beneficiary`) instead of foreign keys,
+    # the session tries to add the object when `get_user_expenses()`
+    # is called because autoflush is enabled. As such, the PostgreSQL
+    # exceptions (tooManyBookings and insufficientFunds) may raise at
+    # this point and will bubble up. If we want them to be caught, we
+    # have to set foreign keys, so that the session is NOT autoflushed
+    # in `get_user_expenses` and is only committed in `repository.save()`
+    # where exceptions are caught. Since we are using flask-sqlalchemy,
+    # I don't think that we should use autoflush, nor should we use
+    # the `pcapi.repository.repository` module.
+    booking = Booking(
+        userId=beneficiary.id,
+        stockId=stock.id,
+        amount=stock.price,
+        quantity=quantity,
+        token=random_token(),
+    )
 
-        repository.save(booking, stock)
+    booking.dateCreated = datetime.datetime.utcnow()
+    booking.confirmationDate = compute_confirmation_date(stock.beginningDatetime, booking.dateCreated)
+
+    # Tokens are random. Rather than checking that a token is free
+    # before each booking, rely on the unique constraint and retry
+    # with another token on the (rare) collisions.
+    for attempt in range(1, BOOKING_TOKEN_MAX_ATTEMPTS + 1):
+        try:
+            _save_booking(beneficiary, stock, booking, quantity)
+        except ApiErrors as error:
+            if "token" not in error.errors or attempt == BOOKING_TOKEN_MAX_ATTEMPTS:
+                raise
+            booking.token = random_token()
+        else:
+            break
 
     logger.info(
         "Beneficiary booked an offer",
@@ -102,21 +161,37 @@ def book_offer(
         },
     )
 
-    try:
-        user_emails.send_booking_confirmation_email_to_offerer(booking)
-    except MailServiceException as error:
-        logger.exception("Could not send booking=%s confirmation email to offerer: %s", booking.id, error)
-    try:
-        user_emails.send_booking_confirmation_email_to_beneficiary(booking)
-    except MailServiceException as error:
-        logger.exception("Could not send booking=%s confirmation email to beneficiary: %s", booking.id, error)
+    process_booking_side_effects_job.delay()
 
-    if feature_queries.is_active(FeatureToggle.SYNCHRONIZE_ALGOLIA):
-        redis.add_offer_id(client=app.redis_client, offer_id=stock.offerId)
+    return booking
 
-    update_user_bookings_attributes_job.delay(beneficiary.id)
 
-    return booking
+def _save_booking(beneficiary: User, stock: Stock, booking: Booking, quantity: int) -> None:
+    # The conditional UPDATE is the only place where the remaining
+    # quantity is enforced. It locks the stock row until the booking
+    # is committed, which is kept as short as possible. The call to
+    # transaction here ensures we free the locks if anything fails.
+    with transaction():
+        # Concurrent bookings of the same beneficiary (on this stock or
+        # another one) must not both pass the checks below: lock the
+        # beneficiary until the booking is committed.
+        beneficiary = users_repository.get_and_lock_user(beneficiary.id)
+        validation.check_offer_already_booked(beneficiary, stock.offer)
+        validation.check_expenses_limits(beneficiary, booking.total_amount, stock.offer)
+
+        booked_quantity = offers_repository.increment_stock_booked_quantity(stock.id, quantity)
+        if booked_quantity is None:
+            raise exceptions.StockIsNotBookable()
+        set_committed_value(stock, "dnBookedQuantity", booked_quantity)
+
+        # Activation codes must be reloaded now that we hold the lock:
+        # another booking may have taken one since the checks above.
+        db.session.expire(stock, ["activationCodes"])
+        validation.check_activation_code_available(stock)
+        set_booking_is_used_for_digital_offers_with_activation_code(stock, booking)
+
+        db.session.add(BookingSideEffect(booking=booking, type=BookingSideEffectType.BOOKED))
+        repository.save(booking)
 
 
 def set_booking_is_used_for_digital_offers_with_activation_code(stock, booking) -> None:
@@ -132,8 +207,14 @@ def set_booking_is_used_for_digital_offers_with_activation_code(stock, booking)
             booking.dateUsed = datetime.datetime.utcnow()
 
 
-def _cancel_booking(booking: Booking, reason: BookingCancellationReasons) -> None:
-    """Cancel booking and update a user's credit information on Batch"""
+def _cancel_booking(
+    booking: Booking,
+    reason: BookingCancellationReasons,
+    side_effect_type: BookingSideEffectType = BookingSideEffectType.CANCELLED,
+) -> None:
+    """Cancel booking and record its side effects (Batch and Algolia
+    updates, and emails if requested by `side_effect_type`).
+    """
     with transaction():
         stock = offers_repository.get_and_lock_stock(stock_id=booking.stockId)
         db.session.refresh(booking)
@@ -149,6 +230,7 @@ def _cancel_booking(booking: Booking, reason: BookingCancellationReasons) -> Non
         booking.isCancelled = True
         booking.cancellationReason = reason
         stock.dnBookedQuantity -= booking.quantity
+        db.session.add(BookingSideEffect(booking=booking, type=side_effect_type))
         repository.save(booking, stock)
     logger.info(
         "Booking has been cancelled",
@@ -158,10 +240,7 @@ def _cancel_booking(booking: Booking, reason: BookingCancellationReasons) -> Non
         },
     )
 
-    update_user_attributes_job.delay(booking.user.id)
-
-    if feature_queries.is_active(FeatureToggle.SYNCHRONIZE_ALGOLIA):
-        redis.add_offer_id(client=app.redis_client, offer_id=booking.stock.offerId)
+    process_booking_side_effects_job.delay()
 
 
 def _cancel_bookings_from_stock(stock: Stock, reason: BookingCancellationReasons) -> list[Booking]:
@@ -190,9 +269,11 @@ def cancel_booking_by_beneficiary(user: User, booking: Booking) -> None:
     if not user.isBeneficiary:
         raise RuntimeError("Unexpected call to cancel_booking_by_beneficiary with non-beneficiary user %s" % user)
     validation.check_beneficiary_can_cancel_booking(user, booking)
-    _cancel_booking(booking, BookingCancellationReasons.BENEFICIARY)
-
-    send_booking_cancellation_emails_to_user_and_offerer_job.delay(booking.id)
+    _cancel_booking(
+        booking,
+        BookingCancellationReasons.BENEFICIARY,
+        side_effect_type=BookingSideEffectType.CANCELLED_BY_BENEFICIARY,
+    )
 
 
 def cancel_booking_by_offerer(booking: Booking) -> None:
@@ -246,6 +327,142 @@ def cancel_booking_on_user_requested_account_suspension(booking: Booking) -> Non
         )
 
 
+def process_booking_side_effects() -> None:
+    """Process and delete pending booking side effects, by batches.
+
+    Side effects are written in the same transaction as the booking
+    (or its cancellation), so that none of them is lost if the process
+    crashes after the commit, and so that booking requests do not wait
+    for Mailjet, Redis or Batch. Rows are claimed with SKIP LOCKED, and
+    the claim is committed before calling these services: many workers
+    may run this function concurrently, and no lock is held while
+    waiting for them.
+    """
+    while True:
+        side_effect_ids = _claim_booking_side_effects()
+        if not side_effect_ids:
+            return
+        side_effects = (
+            BookingSideEffect.query.filter(BookingSideEffect.id.in_(side_effect_ids))
+            .options(
+                joinedload(BookingSideEffect.booking).joinedload(Booking.stock).joinedload(Stock.offer),
+                joinedload(BookingSideEffect.booking).joinedload(Booking.user),
+            )
+            .order_by(BookingSideEffect.id)
+            .all()
+        )
+        errors = _process_booking_side_effects_batch(side_effects)
+        with transaction():
+            processed_ids = [side_effect_id for side_effect_id in side_effect_ids if side_effect_id not in errors]
+            BookingSideEffect.query.filter(BookingSideEffect.id.in_(processed_ids)).delete(
+                synchronize_session=False
+            )
+            for side_effect_id, error in errors.items():
+                BookingSideEffect.query.filter_by(id=side_effect_id).update(
+                    {"lastError": error}, synchronize_session=False
+                )
+
+
+def _claim_booking_side_effects() -> list[int]:
+    # Claimed rows (and rows that failed) are only retried after a
+    # delay, so that a failing row does not block the others, nor is
+    # processed again by the current loop.
+    now = datetime.datetime.utcnow()
+    with transaction():
+        side_effect_ids = [
+            side_effect_id
+            for side_effect_id, in db.session.query(BookingSideEffect.id)
+            .filter(BookingSideEffect.attempts < BOOKING_SIDE_EFFECT_MAX_ATTEMPTS)
+            .filter(
+                or_(
+                    BookingSideEffect.dateLastAttempt.is_(None),
+                    BookingSideEffect.dateLastAttempt < now - BOOKING_SIDE_EFFECT_RETRY_DELAY,
+                )
+            )
+            .order_by(BookingSideEffect.id)
+            .limit(BOOKING_SIDE_EFFECTS_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ]
+        if side_effect_ids:
+            BookingSideEffect.query.filter(BookingSideEffect.id.in_(side_effect_ids)).update(
+                {"attempts": BookingSideEffect.attempts + 1, "dateLastAttempt": now}, synchronize_session=False
+            )
+    return side_effect_ids
+
+
+def _process_booking_side_effects_batch(side_effects: list[BookingSideEffect]) -> dict[int, str]:
+    """Process side effects and return errors by side effect id.
+
+    Emails are sent for each side effect. Algolia and Batch updates are
+    grouped: they resynchronize the current state of offers and users,
+    so a failure is logged but not retried (emails would be sent again).
+    """
+    errors = {}
+    offer_ids = set()
+    booked_users = {}
+    cancelled_users = {}
+    for side_effect in side_effects:
+        booking = side_effect.booking
+        try:
+            _process_booking_side_effect(side_effect)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception(
+                "Could not process booking side effect",
+                extra={"side_effect": side_effect.id, "booking": booking.id, "attempts": side_effect.attempts},
+            )
+            errors[side_effect.id] = repr(error)
+            continue
+        offer_ids.add(booking.stock.offerId)
+        if side_effect.type == BookingSideEffectType.BOOKED:
+            booked_users[booking.userId] = booking.user
+        else:
+            cancelled_users[booking.userId] = booking.user
+
+    if offer_ids and feature_queries.is_active(FeatureToggle.SYNCHRONIZE_ALGOLIA):
+        redis.add_offer_ids(client=app.redis_client, offer_ids=sorted(offer_ids))
+
+    users_data = []
+    for user_id, user in {**cancelled_users, **booked_users}.items():
+        attributes = {}
+        if user_id in cancelled_users:
+            attributes.update(get_user_attributes(user))
+        if user_id in booked_users:
+            attributes.update(get_user_booking_attributes(user))
+        users_data.append(UserUpdateData(user_id=str(user_id), attributes=attributes))
+    if users_data:
+        try:
+            update_users_attributes(users_data)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(
+                "Could not update users attributes after bookings",
+                extra={"users": [user_data.user_id for user_data in users_data]},
+            )
+
+    return errors
+
+
+def _process_booking_side_effect(side_effect: BookingSideEffect) -> None:
+    booking = side_effect.booking
+    if side_effect.type == BookingSideEffectType.BOOKED:
+        _send_booking_confirmation_emails(booking)
+    elif side_effect.type == BookingSideEffectType.CANCELLED_BY_BENEFICIARY:
+        try:
+            user_emails.send_booking_cancellation_emails_to_user_and_offerer(booking, booking.cancellationReason)
+        except MailServiceException as error:
+            logger.exception("Could not send booking=%s cancellation emails: %s", booking.id, error)
+
+
+def _send_booking_confirmation_emails(booking: Booking) -> None:
+    try:
+        user_emails.send_booking_confirmation_email_to_offerer(booking)
+    except MailServiceException as error:
+        logger.exception("Could not send booking=%s confirmation email to offerer: %s", booking.id, error)
+    try:
+        user_emails.send_booking_confirmation_email_to_beneficiary(booking)
+    except MailServiceException as error:
+        logger.exception("Could not send booking=%s confirmation email to beneficiary: %s", booking.id, error)
+
+
 def mark_as_used(booking: Booking, uncancel: bool = False) -> None:
     """Mark a booking as used.
 
@@ -275,6 +492,31 @@ def mark_as_used(booking: Booking, uncancel: bool = False) -> None:
     logger.info("Booking was marked as used", extra={"booking": booking.id})
 
 
+def mark_many_as_used(bookings: list[Booking]) -> dict[str, dict[str, list[str]]]:
+    """Mark the usable bookings as used, in a single transaction.
+
+    Return the errors of the bookings that could not be used, by token.
+    """
+    paid_booking_ids = payment_queries.get_paid_booking_ids([booking.id for booking in bookings])
+    errors_by_token = {}
+    used_bookings = []
+    now = datetime.datetime.utcnow()
+    with transaction():
+        for booking in bookings:
+            try:
+                validation.check_is_usable(booking, has_payment=booking.id in paid_booking_ids)
+            except ApiErrors as error:
+                errors_by_token[booking.token] = error.errors
+                continue
+            booking.isUsed = True
+            booking.dateUsed = now
+            db.session.add(booking)
+            used_bookings.append(booking)
+    for booking in used_bookings:
+        logger.info("Booking was marked as used", extra={"booking": booking.id})
+    return errors_by_token
+
+
 def mark_as_unused(booking: Booking) -> None:
     validation.check_can_be_mark_as_unused(booking)
     booking.isUsed = False
@@ -283,11 +525,86 @@ def mark_as_unused(booking: Booking) -> None:
     logger.info("Booking was marked as unused", extra={"booking": booking.id})
 
 
+def export_bookings_recap(
+    user_id: int,
+    event_date: typing.Optional[datetime.date] = None,
+    venue_id: typing.Optional[int] = None,
+    booking_period_beginning_date: typing.Optional[datetime.date] = None,
+    booking_period_ending_date: typing.Optional[datetime.date] = None,
+) -> str:
+    """Write all bookings recap of a pro user to a CSV file on the
+    object storage and return its URL.
+    """
+    bookings_recap = bookings_repository.get_bookings_recap_for_export(
+        user_id=user_id,
+        event_date=event_date,
+        venue_id=venue_id,
+        booking_period_beginning_date=booking_period_beginning_date,
+        booking_period_ending_date=booking_period_ending_date,
+    )
+    # Rows are written to a temporary file (and not kept in memory)
+    # as the export of large offerers may hold millions of rows.
+    object_id = f"bookings/{secrets.token_urlsafe(32)}.csv"
+    with tempfile.TemporaryFile() as export_file:
+        text_file = io.TextIOWrapper(export_file, encoding="utf-8-sig", newline="")
+        writer = csv.writer(text_file, dialect=csv.excel, delimiter=";", quoting=csv.QUOTE_ALL)
+        writer.writerow(BOOKINGS_RECAP_CSV_HEADER)
+        for booking_recap in bookings_recap:
+            writer.writerow(_serialize_booking_recap_as_csv_row(booking_recap))
+        text_file.detach()  # flush, but keep `export_file` open
+        export_file.seek(0)
+        # The export holds personal data of beneficiaries: it is stored
+        # on the private bucket and only reachable through a signed URL.
+        users_utils.store_file_object(
+            bucket=BOOKINGS_RECAP_EXPORT_BUCKET,
+            object_id=object_id,
+            file=export_file,
+            content_type="text/csv",
+        )
+    logger.info("Exported bookings recap", extra={"user": user_id, "object_id": object_id})
+    return users_utils.generate_signed_url(
+        f"{BOOKINGS_RECAP_EXPORT_BUCKET}/{object_id}", expiration=BOOKINGS_RECAP_EXPORT_URL_EXPIRATION
+    )
+
+
+def _serialize_booking_recap_as_csv_row(booking_recap: BookingRecap) -> list[str]:
+    event_beginning_datetime = (
+        booking_recap.event_beginning_datetime.isoformat() if isinstance(booking_recap, EventBookingRecap) else ""
+    )
+    isbn = booking_recap.offer_isbn if isinstance(booking_recap, BookBookingRecap) else ""
+    status_history = booking_recap.booking_status_history
+    date_used = status_history.date_used if isinstance(status_history, BookingRecapValidatedHistory) else None
+    return [
+        booking_recap.venue_name,
+        booking_recap.offer_name,
+        event_beginning_datetime,
+        isbn,
+        f"{booking_recap.beneficiary_lastname} {booking_recap.beneficiary_firstname}",
+        booking_recap.beneficiary_email,
+        booking_recap.beneficiary_phonenumber or "",
+        booking_recap.booking_date.isoformat(),
+        booking_recap.booking_token or "",
+        booking_recap.booking_amount,
+        BOOKING_RECAP_STATUS_LABELS[booking_recap.booking_status],
+        date_used.isoformat() if date_used else "",
+    ]
+
+
 def get_qr_code_data(booking_token: str) -> str:
     return f"PASSCULTURE:{QR_CODE_PASS_CULTURE_VERSION};TOKEN:{booking_token}"
 
 
 def generate_qr_code(booking_token: str) -> str:
+    # The QR code of a booking never changes: cache it rather than
+    # rendering it each time a list of bookings is serialized.
+    qr_code = redis.get_booking_qr_code(app.redis_client, booking_token)
+    if not qr_code:
+        qr_code = _render_qr_code(booking_token)
+        redis.set_booking_qr_code(app.redis_client, booking_token, qr_code)
+    return qr_code
+
+
+def _render_qr_code(booking_token: str) -> str:
     qr = qrcode.QRCode(
         version=QR_CODE_VERSION,
         error_correction=qrcode.constants.ERROR_CORRECT_Q,
@@ -10,6 +10,7 @@ CONFIRM_BOOKING_AFTER_CREATION_DELAY = datetime.timedelta(hours=48)
 CONFIRM_BOOKING_BEFORE_EVENT_DELAY = datetime.timedelta(hours=48)
 BOOKINGS_AUTO_EXPIRY_DELAY = datetime.timedelta(days=30)
 BOOKINGS_EXPIRY_NOTIFICATION_DELAY = datetime.timedelta(days=7)
+MAX_TOKENS_PER_BULK_USE = 100
 
 
 def _get_hours_from_timedelta(td: datetime.timedelta) -> float:
@@ -25,19 +26,27 @@ BOOKING_CONFIRMATION_ERROR_CLAUSES = {
 
 
 class BaseLimitConfiguration:
+    DIGITAL_CAPPED_TYPES = frozenset()
+    PHYSICAL_CAPPED_TYPES = frozenset()
+
+    def __init__(self):
+        # `Offer.type` holds the string form of the type.
+        self._digital_capped_types = frozenset(str(type_) for type_ in self.DIGITAL_CAPPED_TYPES)
+        self._physical_capped_types = frozenset(str(type_) for type_ in self.PHYSICAL_CAPPED_TYPES)
+
     # fmt: off
     def digital_cap_applies(self, offer):
         return (
             offer.isDigital
             and bool(self.DIGITAL_CAP)
-            and offer.type in {str(type_) for type_ in self.DIGITAL_CAPPED_TYPES}
+            and offer.type in self._digital_capped_types
         )
 
     def physical_cap_applies(self, offer):
         return (
             not offer.isDigital
             and bool(self.PHYSICAL_CAP)
-            and offer.type in {str(type_) for type_ in self.PHYSICAL_CAPPED_TYPES}
+            and offer.type in self._physical_capped_types
         )
     # fmt: on
 
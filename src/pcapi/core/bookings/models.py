@@ -12,8 +12,10 @@ from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import Numeric
 from sqlalchemy import String
+from sqlalchemy import Text
 from sqlalchemy import and_
 from sqlalchemy import event
+from sqlalchemy import func
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import expression
@@ -36,10 +38,14 @@ class Booking(PcObject, Model):
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    dateCreated = Column(DateTime, nullable=False, default=datetime.utcnow)
+    dateCreated = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     dateUsed = Column(DateTime, nullable=True)
 
+    # Set by a trigger on each INSERT or UPDATE, so that clients can
+    # only fetch bookings that changed since their last sync.
+    dateModified = Column(DateTime, nullable=True, index=True)
+
     stockId = Column(BigInteger, ForeignKey("stock.id"), index=True, nullable=False)
 
     stock = relationship("Stock", foreign_keys=[stockId], backref="bookings")
@@ -58,13 +64,13 @@ class Booking(PcObject, Model):
 
     isCancelled = Column(Boolean, nullable=False, server_default=expression.false(), default=False)
 
-    cancellationDate = Column(DateTime, nullable=True)
+    cancellationDate = Column(DateTime, nullable=True, index=True)
 
     isUsed = Column(Boolean, nullable=False, default=False, server_default=expression.false())
 
     displayAsEnded = Column(Boolean, nullable=True)
 
-    confirmationDate = Column(DateTime, nullable=True)
+    confirmationDate = Column(DateTime, nullable=True, index=True)
 
     cancellationReason = Column(
         "cancellationReason",
@@ -149,6 +155,41 @@ class Booking(PcObject, Model):
         return and_(cls.confirmationDate.isnot(None), cls.confirmationDate <= datetime.utcnow())
 
 
+class BookingSideEffectType(enum.Enum):
+    BOOKED = "BOOKED"
+    CANCELLED = "CANCELLED"
+    CANCELLED_BY_BENEFICIARY = "CANCELLED_BY_BENEFICIARY"
+
+
+class BookingSideEffect(PcObject, Model):
+    """Side effects (emails, reindexation, Batch updates) that must
+    follow a change of a booking.
+
+    Rows are written in the same transaction as the booking change
+    (transactional outbox) and deleted once they have been processed
+    by `api.process_booking_side_effects()`. Rows whose processing
+    failed are kept, with their error, and retried a few times.
+    """
+
+    __tablename__ = "booking_side_effect"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    bookingId = Column(BigInteger, ForeignKey("booking.id", ondelete="CASCADE"), index=True, nullable=False)
+
+    booking = relationship("Booking", foreign_keys=[bookingId])
+
+    type = Column(Enum(BookingSideEffectType, native_enum=False, create_constraint=False), nullable=False)
+
+    dateCreated = Column(DateTime, nullable=False, server_default=func.now())
+
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+
+    dateLastAttempt = Column(DateTime, nullable=True)
+
+    lastError = Column(Text, nullable=True)
+
+
 # FIXME (dbaty, 2020-02-08): once `Deposit.expirationDate` has been
 # populated after the deployment of v122, make the column NOT NULLable
 # and remove the filter below (add a migration for _each_ change).
@@ -257,3 +298,25 @@ Booking.trig_update_cancellationDate_on_isCancelled_ddl = """
     """
 
 event.listen(Booking.__table__, "after_create", DDL(Booking.trig_update_cancellationDate_on_isCancelled_ddl))
+
+Booking.trig_update_dateModified_ddl = """
+    CREATE OR REPLACE FUNCTION save_booking_modification_date()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        -- Keep the date if it is explicitly set by the UPDATE
+        IF TG_OP = 'INSERT' OR NEW."dateModified" IS NOT DISTINCT FROM OLD."dateModified" THEN
+            NEW."dateModified" = NOW();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS booking_update_modification_date ON booking;
+
+    CREATE TRIGGER booking_update_modification_date
+    BEFORE INSERT OR UPDATE ON booking
+    FOR EACH ROW
+    EXECUTE PROCEDURE save_booking_modification_date()
+    """
+
+event.listen(Booking.__table__, "after_create", DDL(Booking.trig_update_dateModified_ddl))
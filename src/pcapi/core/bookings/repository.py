@@ -1,16 +1,19 @@
 from datetime import date
 from datetime import datetime
 from datetime import time
+from datetime import tzinfo
 import math
+from typing import Iterator
 from typing import Optional
+import zoneinfo
 
-from dateutil import tz
 from sqlalchemy import Date
 from sqlalchemy import cast
 from sqlalchemy import func
-from sqlalchemy import or_
 from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Query
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.functions import coalesce
 from sqlalchemy.util._collections import AbstractKeyedTuple
@@ -18,6 +21,7 @@ from sqlalchemy.util._collections import AbstractKeyedTuple
 from pcapi.core.bookings import conf
 from pcapi.core.bookings.models import BookingCancellationReasons
 from pcapi.core.offerers.models import Offerer
+from pcapi.core.offers.models import EVENT_AUTOMATIC_REFUND_DELAY
 from pcapi.core.users.models import User
 from pcapi.core.users.utils import sanitize_email
 from pcapi.domain.booking_recap.booking_recap import BookBookingRecap
@@ -25,7 +29,6 @@ from pcapi.domain.booking_recap.booking_recap import BookingRecap
 from pcapi.domain.booking_recap.booking_recap import EventBookingRecap
 from pcapi.domain.booking_recap.booking_recap import ThingBookingRecap
 from pcapi.domain.booking_recap.bookings_recap_paginated import BookingsRecapPaginated
-from pcapi.domain.postal_code.postal_code import PostalCode
 from pcapi.models import Booking
 from pcapi.models import Offer
 from pcapi.models import Stock
@@ -35,11 +38,10 @@ from pcapi.models.api_errors import ResourceNotFoundError
 from pcapi.models.db import db
 from pcapi.models.payment import Payment
 from pcapi.models.payment_status import TransactionStatus
-from pcapi.utils.date import get_department_timezone
-from pcapi.utils.token import random_token
 
 
 DUO_QUANTITY = 2
+BOOKINGS_RECAP_EXPORT_BATCH_SIZE = 1000
 
 
 def find_by(token: str, email: str = None, offer_id: int = None) -> Booking:
@@ -64,6 +66,14 @@ def find_by(token: str, email: str = None, offer_id: int = None) -> Booking:
     return booking
 
 
+def find_by_tokens(tokens: list[str]) -> list[Booking]:
+    return (
+        Booking.query.filter(Booking.token.in_([token.upper() for token in tokens]))
+        .options(joinedload(Booking.stock).joinedload(Stock.offer).joinedload(Offer.venue))
+        .all()
+    )
+
+
 def find_by_pro_user_id(
     user_id: int,
     event_date: Optional[date] = None,
@@ -106,6 +116,32 @@ def find_by_pro_user_id(
     )
 
 
+def get_bookings_recap_for_export(
+    user_id: int,
+    event_date: Optional[date] = None,
+    venue_id: Optional[int] = None,
+    booking_period_beginning_date: Optional[date] = None,
+    booking_period_ending_date: Optional[date] = None,
+) -> Iterator[BookingRecap]:
+    """Yield all bookings recap of the pro user, without pagination.
+
+    Rows are fetched through a server-side cursor, so that memory
+    usage does not grow with the number of bookings.
+    """
+    bookings_recap_query = _filter_bookings_recap_query(
+        Booking.query, user_id, event_date, venue_id, booking_period_beginning_date, booking_period_ending_date
+    )
+    bookings_recap_query = _build_bookings_recap_query(bookings_recap_query)
+    bookings_recap_query_with_duplicates = _duplicate_booking_when_quantity_is_two(bookings_recap_query)
+    bookings = (
+        bookings_recap_query_with_duplicates.order_by(text('"bookingDate" DESC'))
+        .execution_options(stream_results=True)
+        .yield_per(BOOKINGS_RECAP_EXPORT_BATCH_SIZE)
+    )
+    for booking in bookings:
+        yield _serialize_booking_recap(booking)
+
+
 def find_ongoing_bookings_by_stock(stock_id: int) -> list[Booking]:
     return Booking.query.filter_by(stockId=stock_id, isCancelled=False, isUsed=False).all()
 
@@ -138,12 +174,57 @@ def find_bookings_eligible_for_payment_for_venue(venue_id: int, cutoff_date) ->
     )
 
 
-def token_exists(token: str) -> bool:
-    return db.session.query(Booking.query.filter_by(token=token.upper()).exists()).scalar()
-
+def mark_as_used_bookings_of_past_events(after_id: int, batch_size: int, date_used: datetime) -> list[int]:
+    """Mark as used (at most) `batch_size` bookings, whose id is greater
+    than `after_id`, of events that took place more than
+    `EVENT_AUTOMATIC_REFUND_DELAY` before `date_used`, with a single
+    UPDATE.
 
-def find_not_used_and_not_cancelled() -> list[Booking]:
-    return Booking.query.filter(Booking.isUsed.is_(False)).filter(Booking.isCancelled.is_(False)).all()
+    Return the ids of updated bookings.
+    """
+    booking_table = Booking.__table__
+    booking_ids = (
+        Booking.query.join(Stock)
+        .filter(
+            ~Booking.isUsed,
+            ~Booking.isCancelled,
+            Stock.beginningDatetime < date_used - EVENT_AUTOMATIC_REFUND_DELAY,
+            Booking.id > after_id,
+        )
+        .order_by(Booking.id)
+        .limit(batch_size)
+        .with_entities(Booking.id)
+        .statement.correlate(None)
+    )
+    statement = (
+        booking_table.update()
+        .where(booking_table.c.id.in_(booking_ids))
+        .values(isUsed=True, dateUsed=date_used)
+        .returning(booking_table.c.id)
+    )
+    return [booking_id for booking_id, in db.session.execute(statement)]
+
+
+def get_user_bookings_version(user_id: int, now: datetime) -> tuple[tuple[int, Optional[datetime], int], datetime]:
+    """Return a summary of the bookings of a user that changes whenever
+    one of them is created or modified, or when one of their events
+    starts.
+
+    Also return the current (UTC) time of the database, which is the
+    clock used to set `Booking.dateModified`.
+    """
+    bookings_count, last_modified, started_events_count, database_now = (
+        db.session.query(
+            func.count(Booking.id),
+            func.max(Booking.dateModified),
+            func.count(Stock.beginningDatetime).filter(Stock.beginningDatetime <= now),
+            func.timezone("UTC", func.clock_timestamp()),
+        )
+        .join(Booking.stock)
+        .filter(Booking.userId == user_id)
+        .one()
+    )
+    return (bookings_count, last_modified, started_events_count), database_now
 
 
 def find_used_by_token(token: str) -> Booking:
@@ -168,38 +249,79 @@ def find_expiring_bookings_ids() -> Query:
     return find_expiring_bookings().order_by(Booking.id).with_entities(Booking.id)
 
 
-def find_soon_to_be_expiring_booking_ordered_by_user(given_date: date = None) -> Query:
+def cancel_expiring_bookings(after_id: int, batch_size: int) -> list[AbstractKeyedTuple]:
+    """Cancel (at most) `batch_size` expiring bookings whose id is
+    greater than `after_id`, with a single UPDATE.
+
+    Return the id, stockId and quantity of cancelled bookings.
+    """
+    booking_table = Booking.__table__
+    expiring_booking_ids = (
+        find_expiring_bookings_ids().filter(Booking.id > after_id).limit(batch_size).statement.correlate(None)
+    )
+    statement = (
+        booking_table.update()
+        .where(booking_table.c.id.in_(expiring_booking_ids))
+        .values(isCancelled=True, cancellationReason=BookingCancellationReasons.EXPIRED)
+        .returning(booking_table.c.id, booking_table.c.stockId, booking_table.c.quantity)
+    )
+    return db.session.execute(statement).fetchall()
+
+
+def find_soon_to_be_expiring_bookings_grouped_by_user(
+    given_date: date = None, after_user_id: int = 0, batch_size: int = 1000
+) -> list[AbstractKeyedTuple]:
+    """Return up to `batch_size` users (with an id greater than
+    `after_user_id`) who have bookings that are about to expire.
+
+    Each row holds the user id, e-mail and first name, and the list of
+    their soon-to-be-expired bookings as `offer_name` and `venue_name`
+    dictionaries, ordered by booking id.
+    """
     given_date = given_date or date.today()
     given_date = datetime.combine(given_date, time(0, 0)) + conf.BOOKINGS_EXPIRY_NOTIFICATION_DELAY
     window = (datetime.combine(given_date, time(0, 0)), datetime.combine(given_date, time(23, 59, 59)))
 
+    booking_info = func.json_build_object(
+        "offer_name",
+        Offer.name,
+        "venue_name",
+        coalesce(func.nullif(Venue.publicName, ""), Venue.name),
+    )
     return (
-        Booking.query.join(Stock)
-        .join(Offer)
+        db.session.query(
+            User.id,
+            User.email,
+            User.firstName,
+            func.json_agg(aggregate_order_by(booking_info, Booking.id)).label("bookings"),
+        )
+        .select_from(Booking)
+        .join(Booking.user)
+        .join(Booking.stock)
+        .join(Stock.offer)
+        .join(Offer.venue)
         .filter(
             ~Booking.isCancelled,
             ~Booking.isUsed,
             (Booking.dateCreated + conf.BOOKINGS_AUTO_EXPIRY_DELAY).between(*window),
             Offer.canExpire,
+            User.id > after_user_id,
         )
-        .order_by(Booking.userId)
+        .group_by(User.id)
+        .order_by(User.id)
+        .limit(batch_size)
+        .all()
     )
 
 
-def generate_booking_token():
-    for _i in range(100):
-        token = random_token()
-        if not token_exists(token):
-            return token
-    raise ValueError("Could not generate new booking token")
-
-
 def find_expired_bookings_ordered_by_user(expired_on: date = None) -> Query:
     expired_on = expired_on or date.today()
     return (
         Booking.query.filter(Booking.isCancelled.is_(True))
         .filter(cast(Booking.cancellationDate, Date) == expired_on)
         .filter(Booking.cancellationReason == BookingCancellationReasons.EXPIRED)
+        .options(joinedload(Booking.user))
+        .options(joinedload(Booking.stock).joinedload(Stock.offer).joinedload(Offer.venue))
         .order_by(Booking.userId)
         .all()
     )
@@ -215,38 +337,18 @@ def find_expired_bookings_ordered_by_offerer(expired_on: date = None) -> Query:
         .filter(Booking.isCancelled.is_(True))
         .filter(cast(Booking.cancellationDate, Date) == expired_on)
         .filter(Booking.cancellationReason == BookingCancellationReasons.EXPIRED)
+        .options(joinedload(Booking.user))
+        .options(
+            contains_eager(Booking.stock)
+            .contains_eager(Stock.offer)
+            .contains_eager(Offer.venue)
+            .contains_eager(Venue.managingOfferer)
+        )
         .order_by(Offerer.id)
         .all()
     )
 
 
-def get_active_bookings_quantity_for_venue(venue_id: int) -> int:
-    # Stock.dnBookedQuantity cannot be used here because we exclude used/confirmed bookings.
-    return (
-        Booking.query.join(Stock)
-        .join(Offer)
-        .filter(
-            venue_id == Offer.venueId,
-            Booking.isUsed.is_(False),
-            Booking.isCancelled.is_(False),
-            Booking.isConfirmed.is_(False),
-        )
-        .with_entities(coalesce(func.sum(Booking.quantity), 0))
-        .one()[0]
-    )
-
-
-def get_validated_bookings_quantity_for_venue(venue_id: int) -> int:
-    return (
-        Booking.query.join(Stock)
-        .join(Offer)
-        .filter(Booking.isCancelled.is_(False), venue_id == Offer.venueId)
-        .filter(or_(Booking.isUsed.is_(True), Booking.isConfirmed.is_(True)))
-        .with_entities(coalesce(func.sum(Booking.quantity), 0))
-        .one()[0]
-    )
-
-
 def find_offers_booked_by_beneficiaries(users: list[User]) -> list[Offer]:
     return (
         Offer.query.distinct(Offer.id)
@@ -373,13 +475,12 @@ def _build_bookings_recap_query(bookings_recap_query: Query) -> Query:
         User.email.label("beneficiaryEmail"),
         User.phoneNumber.label("beneficiaryPhoneNumber"),
         Stock.beginningDatetime.label("stockBeginningDatetime"),
-        Venue.departementCode.label("venueDepartementCode"),
         Offerer.name.label("offererName"),
-        Offerer.postalCode.label("offererPostalCode"),
         Venue.id.label("venueId"),
         Venue.name.label("venueName"),
         Venue.publicName.label("venuePublicName"),
         Venue.isVirtual.label("venueIsVirtual"),
+        Venue.timezone.label("venueTimezone"),
     )
 
 
@@ -394,24 +495,15 @@ def _paginated_bookings_sql_entities_to_bookings_recap(
     )
 
 
-def _apply_departement_timezone(naive_datetime: datetime, departement_code: str) -> datetime:
-    return (
-        naive_datetime.astimezone(tz.gettz(get_department_timezone(departement_code)))
-        if naive_datetime is not None
-        else None
-    )
-
-
-def _serialize_date_with_timezone(date_without_timezone: datetime, booking: AbstractKeyedTuple) -> datetime:
-    if booking.venueDepartementCode:
-        return _apply_departement_timezone(
-            naive_datetime=date_without_timezone, departement_code=booking.venueDepartementCode
-        )
-    offerer_department_code = PostalCode(booking.offererPostalCode).get_departement_code()
-    return _apply_departement_timezone(naive_datetime=date_without_timezone, departement_code=offerer_department_code)
+def _apply_timezone(naive_datetime: Optional[datetime], timezone: tzinfo) -> Optional[datetime]:
+    return naive_datetime.astimezone(timezone) if naive_datetime is not None else None
 
 
 def _serialize_booking_recap(booking: AbstractKeyedTuple) -> BookingRecap:
+    # `ZoneInfo` caches its instances by key: pages hold thousands of
+    # rows but only a handful of distinct timezones. It is used instead
+    # of `dateutil.tz` because its conversions are much faster.
+    timezone = zoneinfo.ZoneInfo(booking.venueTimezone)
     kwargs = {
         "offer_identifier": booking.offerId,
         "offer_name": booking.offerName,
@@ -422,16 +514,16 @@ def _serialize_booking_recap(booking: AbstractKeyedTuple) -> BookingRecap:
         "beneficiary_lastname": booking.beneficiaryLastname,
         "booking_amount": booking.bookingAmount,
         "booking_token": booking.bookingToken,
-        "booking_date": _serialize_date_with_timezone(booking.bookingDate, booking),
+        "booking_date": _apply_timezone(booking.bookingDate, timezone),
         "booking_is_used": booking.isUsed,
         "booking_is_cancelled": booking.isCancelled,
         "booking_is_confirmed": False,
         "booking_is_reimbursed": booking.paymentStatus == TransactionStatus.SENT,
         "booking_is_duo": booking.quantity == DUO_QUANTITY,
         "venue_identifier": booking.venueId,
-        "date_used": _serialize_date_with_timezone(booking.dateUsed, booking),
-        "payment_date": _serialize_date_with_timezone(booking.paymentDate, booking),
-        "cancellation_date": _serialize_date_with_timezone(booking.cancellationDate, booking=booking),
+        "date_used": _apply_timezone(booking.dateUsed, timezone),
+        "payment_date": _apply_timezone(booking.paymentDate, timezone),
+        "cancellation_date": _apply_timezone(booking.cancellationDate, timezone),
         "confirmation_date": None,
         "venue_name": booking.venuePublicName if booking.venuePublicName else booking.venueName,
         "venue_is_virtual": booking.venueIsVirtual,
@@ -440,11 +532,9 @@ def _serialize_booking_recap(booking: AbstractKeyedTuple) -> BookingRecap:
     if booking.stockBeginningDatetime:
         klass = EventBookingRecap
         kwargs.update(
-            event_beginning_datetime=_apply_departement_timezone(
-                booking.stockBeginningDatetime, booking.venueDepartementCode
-            ),
+            event_beginning_datetime=_apply_timezone(booking.stockBeginningDatetime, timezone),
             booking_is_confirmed=booking.isConfirmed,
-            confirmation_date=_serialize_date_with_timezone(booking.confirmationDate, booking),
+            confirmation_date=_apply_timezone(booking.confirmationDate, timezone),
         )
 
     elif booking.offerExtraData and "isbn" in booking.offerExtraData:
@@ -1,5 +1,6 @@
 import datetime
 from decimal import Decimal
+from typing import Optional
 from typing import Union
 
 from pcapi.core.bookings import api
@@ -119,8 +120,12 @@ def check_booking_can_be_cancelled(booking: Booking) -> None:
 # route should have an exception handler that turns it into the
 # desired HTTP-related exception (such as ResourceGone and Forbidden)
 # See also functions below.
-def check_is_usable(booking: Booking) -> None:
-    if payment_queries.has_payment(booking):
+def check_is_usable(booking: Booking, has_payment: Optional[bool] = None) -> None:
+    # `has_payment` may be given by callers that have already fetched
+    # this information for many bookings at once.
+    if has_payment is None:
+        has_payment = payment_queries.has_payment(booking)
+    if has_payment:
         forbidden = api_errors.ForbiddenError()
         forbidden.add_error("payment", "Cette réservation a été remboursée")
         raise forbidden
@@ -10,14 +10,27 @@ from ..models import MailResult
 
 class BaseBackend:
     def send_mail(self, recipients: Iterable[str], data: dict) -> MailResult:
+        self._set_default_data(data)
+        return self._send(recipients=recipients, data=data)
+
+    def send_mails(self, messages: list[tuple[Iterable[str], dict]]) -> list[MailResult]:
+        for _recipients, data in messages:
+            self._set_default_data(data)
+        return self._send_many(messages)
+
+    def _set_default_data(self, data: dict) -> None:
         data.setdefault("FromEmail", settings.SUPPORT_EMAIL_ADDRESS)
         if "Vars" in data:
             data["Vars"].setdefault("env", "" if settings.IS_PROD else f"-{settings.ENV}")
-        return self._send(recipients=recipients, data=data)
 
     def _send(self, recipients: Iterable, data: dict) -> MailResult:
         raise NotImplementedError()
 
+    def _send_many(self, messages: list[tuple[Iterable[str], dict]]) -> list[MailResult]:
+        # Backends that can send many messages in a single call should
+        # override this method.
+        return [self._send(recipients=recipients, data=data) for recipients, data in messages]
+
     def create_contact(self, email: str) -> Response:
         raise NotImplementedError()
 
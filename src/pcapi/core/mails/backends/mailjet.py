@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import logging
 from typing import Iterable
@@ -13,6 +14,10 @@ from .base import BaseBackend
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of messages accepted by Mailjet in the `Messages`
+# array of a single call to the Send API.
+MAX_MESSAGES_PER_CALL = 50
+
 
 def monkey_patch_mailjet_requests():
     # We want the `mailjet_rest` library to use our wrapper around
@@ -39,7 +44,28 @@ class MailjetBackend(BaseBackend):
 
     def _send(self, recipients: Iterable[str], data: dict) -> MailResult:
         data["To"] = ", ".join(recipients)
-
+        return self._post(data)
+
+    def _send_many(self, messages: list[tuple[Iterable[str], dict]]) -> list[MailResult]:
+        chunks = []
+        for start in range(0, len(messages), MAX_MESSAGES_PER_CALL):
+            messages_data = []
+            for recipients, data in messages[start : start + MAX_MESSAGES_PER_CALL]:
+                data["To"] = ", ".join(recipients)
+                messages_data.append(data)
+            chunks.append(messages_data)
+
+        with ThreadPoolExecutor(max_workers=settings.MAILJET_BULK_CONCURRENCY) as executor:
+            chunk_results = executor.map(self._post_many, chunks)
+            return [result for results in chunk_results for result in results]
+
+    def _post_many(self, messages_data: list[dict]) -> list[MailResult]:
+        # Mailjet accepts or rejects all messages of a call at once, but
+        # we return one result per message, like `_send()` does.
+        result = self._post({"Messages": messages_data})
+        return [MailResult(sent_data=data, successful=result.successful) for data in messages_data]
+
+    def _post(self, data: dict) -> MailResult:
         if settings.MAILJET_TEMPLATE_DEBUGGING:
             messages_data = data.get("Messages")
             if messages_data:
@@ -106,17 +132,24 @@ class ToDevMailjetBackend(MailjetBackend):
         )
         data["Html-part"] = notice + data["Html-part"]
 
-    def send_mail(self, recipients: Iterable[str], data: dict) -> MailResult:
+    def _override_recipients(self, recipients: Iterable[str], data: dict) -> Iterable[str]:
         # FIXME (apibrac, 2021-03-17): we can delete this as soon as AppNative's beta test is finished
         # WHITELISTED_EMAIL_RECIPIENTS should be deleted as well
         some_recipients_are_whitelisted = set(recipients) & set(settings.WHITELISTED_EMAIL_RECIPIENTS)
         if some_recipients_are_whitelisted:
-            return super().send_mail(recipients=recipients, data=data)
+            return recipients
 
         self._inject_html_test_notice(recipients, data)
-        recipients = [settings.DEV_EMAIL_ADDRESS]
+        return [settings.DEV_EMAIL_ADDRESS]
+
+    def send_mail(self, recipients: Iterable[str], data: dict) -> MailResult:
+        recipients = self._override_recipients(recipients, data)
         return super().send_mail(recipients=recipients, data=data)
 
+    def send_mails(self, messages: list[tuple[Iterable[str], dict]]) -> list[MailResult]:
+        messages = [(self._override_recipients(recipients, data), data) for recipients, data in messages]
+        return super().send_mails(messages)
+
     def create_contact(self, email: str) -> Response:
         email = settings.DEV_EMAIL_ADDRESS
         return super().create_contact(email)
@@ -3,12 +3,21 @@ from typing import Optional
 
 import bcrypt
 from flask import current_app as app
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import expression
 
 from pcapi import settings
 from pcapi.connectors import redis
+from pcapi.core.bookings.models import Booking
 from pcapi.core.offerers.models import ApiKey
 from pcapi.core.offerers.models import Venue
+from pcapi.core.offerers.models import VenueStats
 from pcapi.core.offerers.models import VenueType
+from pcapi.core.offers.models import Offer
+from pcapi.core.offers.models import OfferStatus
+from pcapi.core.offers.models import Stock
 from pcapi.domain.iris import link_valid_venue_to_irises
 from pcapi.models.db import db
 from pcapi.models.feature import FeatureToggle
@@ -103,6 +112,74 @@ def create_venue(venue_data: PostVenueBodyModel) -> Venue:
     return venue
 
 
+def refresh_venue_stats(venue_ids: Optional[list[int]] = None) -> None:
+    """Recompute the dashboard counters of the given venues (or of all
+    venues) with a single set-based statement, and clear their
+    `isStale` flag.
+
+    The clock refreshes the venues returned by
+    `repository.find_venue_ids_with_stats_changes_since()` every 15
+    minutes, and all venues once a day as a safety net.
+    """
+    bookings_stats = (
+        db.session.query(
+            Offer.venueId.label("venueId"),
+            func.sum(Booking.quantity)
+            .filter(Booking.isUsed.is_(False), Booking.isCancelled.is_(False), Booking.isConfirmed.is_(False))
+            .label("activeBookingsQuantity"),
+            func.sum(Booking.quantity)
+            .filter(Booking.isCancelled.is_(False), or_(Booking.isUsed.is_(True), Booking.isConfirmed.is_(True)))
+            .label("validatedBookingsQuantity"),
+        )
+        .select_from(Booking)
+        .join(Stock)
+        .join(Offer)
+        .group_by(Offer.venueId)
+    )
+    offers_stats = db.session.query(
+        Offer.venueId.label("venueId"),
+        func.count(Offer.id).filter(Offer.status == OfferStatus.ACTIVE.name).label("activeOffersCount"),
+        func.count(Offer.id).filter(Offer.status == OfferStatus.SOLD_OUT.name).label("soldOutOffersCount"),
+    ).group_by(Offer.venueId)
+    venues = db.session.query(Venue.id)
+    if venue_ids is not None:
+        bookings_stats = bookings_stats.filter(Offer.venueId.in_(venue_ids))
+        offers_stats = offers_stats.filter(Offer.venueId.in_(venue_ids))
+        venues = venues.filter(Venue.id.in_(venue_ids))
+    bookings_stats = bookings_stats.subquery()
+    offers_stats = offers_stats.subquery()
+
+    stats = (
+        venues.outerjoin(bookings_stats, bookings_stats.c.venueId == Venue.id)
+        .outerjoin(offers_stats, offers_stats.c.venueId == Venue.id)
+        .with_entities(
+            Venue.id,
+            func.coalesce(bookings_stats.c.activeBookingsQuantity, 0),
+            func.coalesce(bookings_stats.c.validatedBookingsQuantity, 0),
+            func.coalesce(offers_stats.c.activeOffersCount, 0),
+            func.coalesce(offers_stats.c.soldOutOffersCount, 0),
+            expression.false(),
+            func.now(),
+        )
+    )
+    columns = [
+        "venueId",
+        "activeBookingsQuantity",
+        "validatedBookingsQuantity",
+        "activeOffersCount",
+        "soldOutOffersCount",
+        "isStale",
+        "dateUpdated",
+    ]
+    statement = insert(VenueStats).from_select(columns, stats.statement)
+    statement = statement.on_conflict_do_update(
+        index_elements=[VenueStats.venueId],
+        set_={column: statement.excluded[column] for column in columns[1:]},
+    )
+    db.session.execute(statement)
+    db.session.commit()
+
+
 def generate_and_save_api_key(offerer_id: int) -> str:
     if ApiKey.query.filter_by(offererId=offerer_id).count() >= settings.MAX_API_KEY_PER_OFFERER:
         raise ApiKeyCountMaxReached()
@@ -16,10 +16,10 @@ from sqlalchemy import and_
 from sqlalchemy import case
 from sqlalchemy import cast
 from sqlalchemy import func
+from sqlalchemy import inspect
 from sqlalchemy.event import listens_for
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import aliased
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import expression
@@ -45,7 +45,6 @@ from pcapi.models.needs_validation_mixin import NeedsValidationMixin
 from pcapi.models.pc_object import PcObject
 from pcapi.models.providable_mixin import ProvidableMixin
 from pcapi.models.user_offerer import UserOfferer
-from pcapi.utils.date import CUSTOM_TIMEZONES
 from pcapi.utils.date import METROPOLE_TIMEZONE
 from pcapi.utils.date import get_department_timezone
 from pcapi.utils.date import get_postal_code_timezone
@@ -137,9 +136,22 @@ class Venue(PcObject, Model, HasThumbMixin, HasAddressMixin, ProvidableMixin, Ne
 
     dateCreated = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # Stored (rather than computed from the departement code of the venue
+    # or of its offerer) so that queries converting dates to the local
+    # time of venues do not need a subquery per row.
+    timezone = Column(
+        String(50), nullable=False, default=METROPOLE_TIMEZONE, server_default=METROPOLE_TIMEZONE, index=True
+    )
+
     def store_departement_code(self) -> None:
         self.departementCode = PostalCode(self.postalCode).get_departement_code()
 
+    def store_timezone(self) -> None:
+        if self.departementCode is None:
+            self.timezone = get_postal_code_timezone(self.managingOfferer.postalCode)
+        else:
+            self.timezone = get_department_timezone(self.departementCode)
+
     @property
     def bic(self) -> Optional[str]:
         return self.bankInformation.bic if self.bankInformation else None
@@ -162,8 +174,19 @@ class Venue(PcObject, Model, HasThumbMixin, HasAddressMixin, ProvidableMixin, Ne
 
         return self.bankInformation.applicationId
 
+    # Set by `set_offer_counts()` when counts are computed for several
+    # venues at once, see `repository.preload_venues_offer_counts()`.
+    _n_offers = None
+    _n_approved_offers = None
+
+    def set_offer_counts(self, n_offers: int, n_approved_offers: int) -> None:
+        self._n_offers = n_offers
+        self._n_approved_offers = n_approved_offers
+
     @property
     def nOffers(self) -> int:
+        if self._n_offers is not None:
+            return self._n_offers
         return (
             Offer.query.filter(and_(Offer.venueId == self.id, Offer.validation != OfferValidationStatus.DRAFT))
             .with_entities(Offer.id)
@@ -172,33 +195,12 @@ class Venue(PcObject, Model, HasThumbMixin, HasAddressMixin, ProvidableMixin, Ne
 
     @property
     def nApprovedOffers(self) -> int:
-        n_approved_offers = 0
-        n_approved_offers += len([offer for offer in self.offers if offer.validation == OfferValidationStatus.APPROVED])
-        return n_approved_offers
-
-    @hybrid_property
-    def timezone(self) -> str:
-        if self.departementCode is None:
-            return get_postal_code_timezone(self.managingOfferer.postalCode)
-        return get_department_timezone(self.departementCode)
-
-    @timezone.expression
-    def timezone(cls):  # pylint: disable=no-self-argument
-        offerer_alias = aliased(Offerer)
-        return case(
-            [
-                (
-                    cls.departementCode.is_(None),
-                    case(
-                        CUSTOM_TIMEZONES,
-                        value=db.session.query(offerer_alias.departementCode)
-                        .filter(cls.managingOffererId == offerer_alias.id)
-                        .as_scalar(),
-                        else_=METROPOLE_TIMEZONE,
-                    ),
-                )
-            ],
-            else_=case(CUSTOM_TIMEZONES, value=cls.departementCode, else_=METROPOLE_TIMEZONE),
+        if self._n_approved_offers is not None:
+            return self._n_approved_offers
+        return (
+            Offer.query.filter(and_(Offer.venueId == self.id, Offer.validation == OfferValidationStatus.APPROVED))
+            .with_entities(Offer.id)
+            .count()
         )
 
 
@@ -216,14 +218,47 @@ class VenueType(PcObject, Model):
     venue = relationship("Venue")
 
 
+class VenueStats(PcObject, Model):
+    """Counters displayed on the pro dashboard of a venue.
+
+    They are refreshed periodically by `api.refresh_venue_stats()` so
+    that the dashboard does not have to aggregate all bookings and
+    offers of the venue on each request. They may be stale, see there.
+
+    The `offer_mark_venue_stats_stale` trigger sets `isStale` when an
+    offer of the venue changes status (and creates the row of a venue
+    on its first offer).
+    """
+
+    __tablename__ = "venue_stats"
+
+    venueId = Column(BigInteger, ForeignKey("venue.id", ondelete="CASCADE"), nullable=False, unique=True)
+
+    venue = relationship("Venue", foreign_keys=[venueId])
+
+    activeBookingsQuantity = Column(BigInteger, nullable=False, default=0)
+
+    validatedBookingsQuantity = Column(BigInteger, nullable=False, default=0)
+
+    activeOffersCount = Column(BigInteger, nullable=False, default=0)
+
+    soldOutOffersCount = Column(BigInteger, nullable=False, default=0)
+
+    isStale = Column(Boolean, nullable=False, default=False, server_default=expression.false())
+
+    dateUpdated = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
+
+
 @listens_for(Venue, "before_insert")
 def before_insert(mapper, connect, self):
     _fill_departement_code_from_postal_code(self)
+    self.store_timezone()
 
 
 @listens_for(Venue, "before_update")
 def before_update(mapper, connect, self):
     _fill_departement_code_from_postal_code(self)
+    self.store_timezone()
 
 
 def _fill_departement_code_from_postal_code(self):
@@ -362,6 +397,20 @@ offerer_ts_indexes = [
 (Offerer.__ts_vectors__, Offerer.__table_args__) = create_ts_vector_and_table_args(offerer_ts_indexes)
 
 
+@listens_for(Offerer, "after_update")
+def update_virtual_venues_timezone(mapper, connection, self):
+    # The timezone of virtual venues depends on the postal code of their
+    # offerer (see `Venue.store_timezone()`).
+    if not inspect(self).attrs.postalCode.history.has_changes():
+        return
+    connection.execute(
+        Venue.__table__.update()
+        .where(Venue.managingOffererId == self.id)
+        .where(Venue.departementCode.is_(None))
+        .values(timezone=get_postal_code_timezone(self.postalCode))
+    )
+
+
 class ApiKey(PcObject, Model):
     # TODO: remove value colum when legacy keys are migrated
     value = Column(CHAR(64), index=True, nullable=True)
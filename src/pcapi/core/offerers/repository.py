@@ -1,10 +1,21 @@
+from datetime import datetime
+from typing import Iterable
 from typing import Optional
 
+from sqlalchemy import func
+from sqlalchemy import or_
+
+from pcapi.core.bookings.models import Booking
 from pcapi.core.offerers.models import Offerer
 from pcapi.core.offerers.models import Venue
 from pcapi.core.offerers.models import VenueLabel
+from pcapi.core.offerers.models import VenueStats
 from pcapi.core.offerers.models import VenueType
+from pcapi.core.offers.models import Offer
+from pcapi.core.offers.models import OfferValidationStatus
+from pcapi.core.offers.models import Stock
 from pcapi.core.users.models import User
+from pcapi.models.db import db
 from pcapi.models.user_offerer import UserOfferer
 
 
@@ -69,3 +80,64 @@ def get_filtered_venues(
         query = query.filter(Venue.managingOffererId == offerer_id)
 
     return query.order_by(Venue.name).all()
+
+
+def get_venue_stats(venue_id: int) -> Optional[VenueStats]:
+    return VenueStats.query.filter_by(venueId=venue_id).one_or_none()
+
+
+def find_venue_ids_with_stats_changes_since(since: datetime) -> list[int]:
+    """Return the ids of venues whose stats may have changed since
+    `since`: venues whose stats are marked as stale, that have a
+    booking created, modified or confirmed since then, or a stock that
+    has been modified or whose booking limit or beginning date has
+    passed since then.
+    """
+    stale_venue_ids = db.session.query(VenueStats.venueId).filter(VenueStats.isStale.is_(True))
+    booking_venue_ids = (
+        db.session.query(Offer.venueId)
+        .select_from(Booking)
+        .join(Stock)
+        .join(Offer)
+        .filter(
+            or_(
+                Booking.dateModified >= since,
+                Booking.confirmationDate.between(since, func.now()),
+            )
+        )
+    )
+    stock_venue_ids = (
+        db.session.query(Offer.venueId)
+        .select_from(Stock)
+        .join(Offer)
+        .filter(
+            or_(
+                Stock.dateModified >= since,
+                Stock.bookingLimitDatetime.between(since, func.now()),
+                Stock.beginningDatetime.between(since, func.now()),
+            )
+        )
+    )
+    return [venue_id for venue_id, in stale_venue_ids.union(booking_venue_ids, stock_venue_ids)]
+
+
+def preload_venues_offer_counts(venues: Iterable[Venue]) -> None:
+    """Compute `nOffers` and `nApprovedOffers` of all given venues (and
+    thus of their offerers) with a single grouped query, instead of one
+    count query per venue and property.
+    """
+    venues = list(venues)
+    if not venues:
+        return
+    counts = (
+        db.session.query(
+            Offer.venueId,
+            func.count(Offer.id).filter(Offer.validation != OfferValidationStatus.DRAFT),
+            func.count(Offer.id).filter(Offer.validation == OfferValidationStatus.APPROVED),
+        )
+        .filter(Offer.venueId.in_({venue.id for venue in venues}))
+        .group_by(Offer.venueId)
+    )
+    counts_by_venue_id = {venue_id: (n_offers, n_approved_offers) for venue_id, n_offers, n_approved_offers in counts}
+    for venue in venues:
+        venue.set_offer_counts(*counts_by_venue_id.get(venue.id, (0, 0)))
@@ -3,9 +3,11 @@ import logging
 from typing import Optional
 from typing import Union
 
+from flask import abort
 from flask import current_app as app
 import pytz
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql.functions import func
 import yaml
 from yaml.scanner import ScannerError
@@ -24,8 +26,8 @@ from pcapi.core.offers.exceptions import WrongFormatInFraudConfigurationFile
 from pcapi.core.offers.models import OfferValidationConfig
 from pcapi.core.offers.models import OfferValidationStatus
 from pcapi.core.offers.models import Stock
-from pcapi.core.offers.offer_validation import compute_offer_validation_score
-from pcapi.core.offers.offer_validation import parse_offer_validation_config
+from pcapi.core.offers.offer_validation import get_compiled_offer_validation_config
+from pcapi.core.offers.offer_validation import invalidate_compiled_offer_validation_config
 import pcapi.core.offers.repository as offers_repository
 from pcapi.core.offers.validation import KEY_VALIDATION_CONFIG
 from pcapi.core.offers.validation import check_validation_config_parameters
@@ -57,7 +59,6 @@ from pcapi.workers.push_notification_job import send_cancel_booking_notification
 
 from . import validation
 from .exceptions import ThumbnailStorageError
-from .models import ActivationCode
 from .models import Mediation
 
 
@@ -65,6 +66,7 @@ logger = logging.getLogger(__name__)
 
 
 OFFERS_RECAP_LIMIT = 201
+OFFERS_ACTIVE_STATUS_BATCH_SIZE = 1000
 UNCHANGED = object()
 VALIDATION_KEYWORDS_MAPPING = {
     "APPROVED": OfferValidationStatus.APPROVED,
@@ -230,24 +232,35 @@ def update_offer(  # pylint: disable=redefined-builtin
     return offer
 
 
-def update_offers_active_status(query, is_active):
-    offer_ids_tuples = query.filter(Offer.validation == OfferValidationStatus.APPROVED).with_entities(Offer.id)
-
-    offer_ids = [offer_id for offer_id, in offer_ids_tuples]
-    number_of_offers_to_update = len(offer_ids)
-    batch_size = 1000
-    for current_start_index in range(0, number_of_offers_to_update, batch_size):
-        offer_ids_batch = offer_ids[
-            current_start_index : min(current_start_index + batch_size, number_of_offers_to_update)
-        ]
-
-        query_to_update = Offer.query.filter(Offer.id.in_(offer_ids_batch))
-        query_to_update.update({"isActive": is_active}, synchronize_session=False)
+def update_offers_active_status(query, is_active, batch_size=OFFERS_ACTIVE_STATUS_BATCH_SIZE):
+    # Only offers whose status actually changes are updated (and thus
+    # reindexed), by chunks of ids found through keyset pagination.
+    offer_ids_query = (
+        query.filter(Offer.validation == OfferValidationStatus.APPROVED)
+        .filter(Offer.isActive.isnot(is_active))
+        .with_entities(Offer.id)
+        .distinct()
+        .order_by(None)
+        .order_by(Offer.id)
+    )
+    last_id = 0
+    while True:
+        chunk = offer_ids_query.filter(Offer.id > last_id).limit(batch_size).subquery()
+        statement = (
+            Offer.__table__.update()
+            .where(Offer.id.in_(select([chunk.c.id])))
+            .values(isActive=is_active)
+            .returning(Offer.id)
+        )
+        offer_ids = [offer_id for offer_id, in db.session.execute(statement)]
         db.session.commit()
+        if not offer_ids:
+            break
 
+        redis.delete_native_offer_responses(app.redis_client, offer_ids)
         if feature_queries.is_active(FeatureToggle.SYNCHRONIZE_ALGOLIA):
-            for offer_id in offer_ids_batch:
-                redis.add_offer_id(client=app.redis_client, offer_id=offer_id)
+            redis.add_offer_ids(client=app.redis_client, offer_ids=sorted(offer_ids))
+        last_id = max(offer_ids)
 
 
 def _create_stock(
@@ -354,21 +367,30 @@ def _notify_beneficiaries_upon_stock_edit(stock: Stock):
 def upsert_stocks(
     offer_id: int, stock_data_list: list[Union[StockCreationBodyModel, StockEditionBodyModel]], user: User
 ) -> list[Stock]:
-    activation_codes = []
+    activation_codes_by_stock = []
     stocks = []
     edited_stocks = []
     edited_stocks_previous_beginnings = {}
 
     offer = offer_queries.get_offer_by_id(offer_id)
 
+    edited_stock_ids = [
+        stock_data.id for stock_data in stock_data_list if isinstance(stock_data, StockEditionBodyModel)
+    ]
+    existing_stocks = {}
+    if edited_stock_ids:
+        existing_stocks = {
+            stock.id: stock
+            for stock in Stock.queryNotSoftDeleted()
+            .filter(Stock.id.in_(edited_stock_ids))
+            .options(selectinload(Stock.activationCodes))
+        }
+
     for stock_data in stock_data_list:
         if isinstance(stock_data, StockEditionBodyModel):
-            stock = (
-                Stock.queryNotSoftDeleted()
-                .filter_by(id=stock_data.id)
-                .options(joinedload(Stock.activationCodes))
-                .first_or_404()
-            )
+            stock = existing_stocks.get(stock_data.id)
+            if stock is None:
+                abort(404)
             if stock.offerId != offer_id:
                 errors = ApiErrors()
                 errors.add_error(
@@ -395,6 +417,7 @@ def upsert_stocks(
                     stock_data.activation_codes_expiration_datetime,
                     stock_data.booking_limit_datetime,
                 )
+                validation.check_activation_codes_are_unique(stock_data.activation_codes)  # type: ignore[arg-type]
 
             quantity = len(stock_data.activation_codes) if activation_codes_exist else stock_data.quantity  # type: ignore[arg-type]
 
@@ -407,18 +430,21 @@ def upsert_stocks(
             )
 
             if activation_codes_exist:
-                for activation_code in stock_data.activation_codes:  # type: ignore[union-attr]
-                    activation_codes.append(
-                        ActivationCode(
-                            code=activation_code,
-                            expirationDate=stock_data.activation_codes_expiration_datetime,
-                            stock=created_stock,
-                        )
-                    )
+                activation_codes_by_stock.append(
+                    (created_stock, stock_data.activation_codes, stock_data.activation_codes_expiration_datetime)
+                )
 
             stocks.append(created_stock)
 
-    repository.save(*stocks, *activation_codes)
+    if activation_codes_by_stock:
+        # Activation codes are ingested with COPY, which needs the ids
+        # of the new stocks. Everything is committed below.
+        db.session.add_all(stock for stock, _, _ in activation_codes_by_stock)
+        db.session.flush()
+        for stock, codes, expiration_date in activation_codes_by_stock:
+            offers_repository.insert_activation_codes(stock.id, codes, expiration_date)
+
+    repository.save(*stocks)
     logger.info("Stock has been created or updated", extra={"offer": offer_id})
 
     if offer.validation == OfferValidationStatus.DRAFT:
@@ -669,14 +695,12 @@ def set_offer_status_based_on_fraud_criteria(offer: Offer) -> OfferValidationSta
             if keyword in offer.name:
                 return validation_status
 
-    current_config = offers_repository.get_current_offer_validation_config()
+    current_config = get_compiled_offer_validation_config()
     if not current_config:
         return OfferValidationStatus.APPROVED
 
-    minimum_score, validation_rules = parse_offer_validation_config(offer, current_config)
-
-    score = compute_offer_validation_score(validation_rules)
-    if score < minimum_score:
+    score = current_config.compute_score(offer)
+    if score < current_config.minimum_score:
         status = OfferValidationStatus.PENDING
     else:
         status = OfferValidationStatus.APPROVED
@@ -725,6 +749,7 @@ def import_offer_validation_config(config_as_yaml: str, user: User = None) -> Of
 
     config = OfferValidationConfig(specs=config_as_dict, user=user)
     repository.save(config)
+    invalidate_compiled_offer_validation_config()
     return config
 
 
@@ -5,6 +5,8 @@ import enum
 import logging
 from typing import Optional
 
+from flask import current_app
+from flask import has_app_context
 from sqlalchemy import ARRAY
 from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
@@ -27,24 +29,27 @@ from sqlalchemy import exists
 from sqlalchemy import false
 from sqlalchemy import func
 from sqlalchemy import or_
+from sqlalchemy import select
 from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.util import identity_key
 
+from pcapi.connectors import redis
 from pcapi.models.db import Model
 from pcapi.models.db import db
 from pcapi.models.deactivable_mixin import DeactivableMixin
 from pcapi.models.extra_data_mixin import ExtraDataMixin
 from pcapi.models.has_thumb_mixin import HasThumbMixin
 from pcapi.models.offer_type import ALL_OFFER_TYPES_DICT
-from pcapi.models.offer_type import CATEGORIES_LABEL_DICT
 from pcapi.models.offer_type import CategoryType
 from pcapi.models.offer_type import EXPIRABLE_OFFER_TYPES
+from pcapi.models.offer_type import OFFER_TYPES_INFO
 from pcapi.models.offer_type import PERMANENT_OFFER_TYPES
 from pcapi.models.offer_type import ProductType
-from pcapi.models.offer_type import ThingType
 from pcapi.models.pc_object import PcObject
 from pcapi.models.providable_mixin import ProvidableMixin
 from pcapi.models.soft_deletable_mixin import SoftDeletableMixin
@@ -82,7 +87,7 @@ class Stock(PcObject, Model, ProvidableMixin, SoftDeletableMixin):
 
     dateCreated = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
 
-    dateModified = Column(DateTime, nullable=False, default=datetime.utcnow)
+    dateModified = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     beginningDatetime = Column(DateTime, index=True, nullable=True)
 
@@ -94,7 +99,7 @@ class Stock(PcObject, Model, ProvidableMixin, SoftDeletableMixin):
 
     quantity = Column(Integer, nullable=True)
 
-    bookingLimitDatetime = Column(DateTime, nullable=True)
+    bookingLimitDatetime = Column(DateTime, index=True, nullable=True)
 
     dnBookedQuantity = Column(BigInteger, nullable=False, server_default=text("0"))
 
@@ -280,7 +285,6 @@ class Offer(PcObject, Model, ExtraDataMixin, DeactivableMixin, ProvidableMixin):
     type = Column(String(50), CheckConstraint("type != 'None'"), index=True, nullable=False)
 
     name = Column(String(140), nullable=False)
-    Index("idx_offer_trgm_name", name, postgresql_using="gin")
 
     description = Column(Text, nullable=True)
 
@@ -342,6 +346,16 @@ class Offer(PcObject, Model, ExtraDataMixin, DeactivableMixin, ProvidableMixin):
         nullable=True,
     )
 
+    # Maintained by the `offer_update_status` and `stock_update_offer_status`
+    # triggers, and by `repository.update_offers_status_after_dates()`
+    # for transitions that only depend on the passing of time.
+    status = Column(
+        Enum(OfferStatus, native_enum=False, create_constraint=False),
+        nullable=False,
+        server_default=OfferStatus.ACTIVE.name,
+        index=True,
+    )
+
     # FIXME(fseguin, 2021-06-02): make this non-nullable when all offers have a subcategory
     subcategoryId = Column(BigInteger, ForeignKey("offer_subcategory.id"), index=True)
 
@@ -482,7 +496,10 @@ class Offer(PcObject, Model, ExtraDataMixin, DeactivableMixin, ProvidableMixin):
     @property
     def offer_category_name_for_app(self) -> str:
         # offer_types ThingType.OEUVRE_ART, EventType.ACTIVATION and ThingType.ACTIVATION do not have a corresponding Category so return None in this case
-        return CATEGORIES_LABEL_DICT.get(self.offerType["appLabel"])
+        if self.type not in OFFER_TYPES_INFO:
+            raise ValueError(f"Unexpected offer type '{self.type}' for offer {self.id}")
+
+        return OFFER_TYPES_INFO[self.type].app_category
 
     @property
     def category_type(self) -> Optional[str]:
@@ -515,67 +532,216 @@ class Offer(PcObject, Model, ExtraDataMixin, DeactivableMixin, ProvidableMixin):
 
     @property
     def is_offline_only(self) -> bool:
-        offline_thing = [
-            thing_type
-            for thing_type in ThingType
-            if self._is_same_type(thing_type) and self._is_offline_type_only(thing_type)
-        ]
-
-        return len(list(offline_thing)) == 1
-
-    def _is_same_type(self, thing_type) -> bool:
-        return str(thing_type) == self.type
-
-    def _is_offline_type_only(self, thing_type):
-        return thing_type.value["offlineOnly"]
+        info = OFFER_TYPES_INFO.get(self.type)
+        return info is not None and info.is_thing and info.offline_only
 
     def get_label_from_type_string(self):
-        matching_type_thing = next(filter(lambda thing_type: str(thing_type) == self.type, ThingType))
-        return matching_type_thing.value["proLabel"]
-
-    @hybrid_property
-    def status(self) -> OfferStatus:
-        # pylint: disable=too-many-return-statements
-        if self.validation == OfferValidationStatus.REJECTED:
-            return OfferStatus.REJECTED
-
-        if self.validation == OfferValidationStatus.PENDING:
-            return OfferStatus.PENDING
-
-        if self.validation == OfferValidationStatus.DRAFT:
-            return OfferStatus.DRAFT
-
-        if not self.isActive:
-            return OfferStatus.INACTIVE
-
-        if self.validation == OfferValidationStatus.APPROVED:
-            if self.hasBookingLimitDatetimesPassed:  # pylint: disable=using-constant-test
-                return OfferStatus.EXPIRED
-
-            if self.isSoldOut:  # pylint: disable=using-constant-test
-                return OfferStatus.SOLD_OUT
-
-        return OfferStatus.ACTIVE
-
-    @status.expression
-    def status(cls):  # pylint: disable=no-self-argument
-        return case(
-            [
-                (cls.validation == OfferValidationStatus.REJECTED.name, OfferStatus.REJECTED.name),
-                (cls.validation == OfferValidationStatus.PENDING.name, OfferStatus.PENDING.name),
-                (cls.validation == OfferValidationStatus.DRAFT.name, OfferStatus.DRAFT.name),
-                (cls.isActive.is_(False), OfferStatus.INACTIVE.name),
-                (cls.hasBookingLimitDatetimesPassed.is_(True), OfferStatus.EXPIRED.name),
-                (cls.isSoldOut.is_(True), OfferStatus.SOLD_OUT.name),
-            ],
-            else_=OfferStatus.ACTIVE.name,
-        )
+        return OFFER_TYPES_INFO[self.type].pro_label
 
     @property
     def max_price(self) -> float:
         return max(stock.price for stock in self.stocks if not stock.isSoftDeleted)
 
 
+# Mirrors the former `Offer.status` CASE expression. Stocks are read
+# from the table, hence the function must be called after the stocks
+# of the offer have been written.
+Offer.trig_update_status_ddl = """
+    CREATE OR REPLACE FUNCTION compute_offer_status(offer_id BIGINT, validation TEXT, is_active BOOLEAN)
+    RETURNS TEXT AS $$
+    BEGIN
+        IF validation IN ('REJECTED', 'PENDING', 'DRAFT') THEN
+            RETURN validation;
+        END IF;
+        IF NOT is_active THEN
+            RETURN 'INACTIVE';
+        END IF;
+        IF EXISTS (
+            SELECT 1 FROM stock WHERE "offerId" = offer_id AND NOT "isSoftDeleted"
+        ) AND NOT EXISTS (
+            SELECT 1 FROM stock
+            WHERE "offerId" = offer_id
+            AND NOT "isSoftDeleted"
+            AND ("bookingLimitDatetime" IS NULL OR "bookingLimitDatetime" > NOW())
+        ) THEN
+            RETURN 'EXPIRED';
+        END IF;
+        IF NOT EXISTS (
+            SELECT 1 FROM stock
+            WHERE "offerId" = offer_id
+            AND NOT "isSoftDeleted"
+            AND ("beginningDatetime" IS NULL OR "beginningDatetime" > NOW())
+            AND (quantity IS NULL OR quantity - "dnBookedQuantity" > 0)
+        ) THEN
+            RETURN 'SOLD_OUT';
+        END IF;
+        RETURN 'ACTIVE';
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION save_offer_status()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.status = compute_offer_status(NEW.id, NEW.validation::text, NEW."isActive");
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS offer_update_status ON offer;
+
+    CREATE TRIGGER offer_update_status
+    BEFORE INSERT OR UPDATE OF validation, "isActive" ON offer
+    FOR EACH ROW
+    EXECUTE PROCEDURE save_offer_status()
+    """
+
+event.listen(Offer.__table__, "after_create", DDL(Offer.trig_update_status_ddl))
+
+# Changes of the stats of a venue that do not leave a trace that can be
+# looked up cheaply, see `offerers.repository.find_venue_ids_with_stats_changes_since()`.
+Offer.trig_mark_venue_stats_stale_ddl = """
+    CREATE OR REPLACE FUNCTION mark_venue_stats_stale(venue_id BIGINT)
+    RETURNS VOID AS $$
+    BEGIN
+        -- Only write when the stats are not already stale, to avoid
+        -- locking them on each change.
+        UPDATE venue_stats SET "isStale" = true WHERE "venueId" = venue_id AND NOT "isStale";
+        IF NOT FOUND AND NOT EXISTS (SELECT 1 FROM venue_stats WHERE "venueId" = venue_id) THEN
+            INSERT INTO venue_stats (
+                "venueId", "activeBookingsQuantity", "validatedBookingsQuantity",
+                "activeOffersCount", "soldOutOffersCount", "isStale"
+            )
+            VALUES (venue_id, 0, 0, 0, 0, true)
+            ON CONFLICT ("venueId") DO NOTHING;
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION mark_venue_stats_stale_from_offer()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' OR (
+            TG_OP = 'UPDATE' AND (NEW.status IS DISTINCT FROM OLD.status OR NEW."venueId" != OLD."venueId")
+        ) THEN
+            PERFORM mark_venue_stats_stale(OLD."venueId");
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW."venueId" != OLD."venueId") THEN
+            PERFORM mark_venue_stats_stale(NEW."venueId");
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS offer_mark_venue_stats_stale ON offer;
+
+    CREATE TRIGGER offer_mark_venue_stats_stale
+    AFTER INSERT OR UPDATE OR DELETE ON offer
+    FOR EACH ROW
+    EXECUTE PROCEDURE mark_venue_stats_stale_from_offer()
+    """
+
+event.listen(Offer.__table__, "after_create", DDL(Offer.trig_mark_venue_stats_stale_ddl))
+
+# Used by the keyword search of the pro offers list, which must filter
+# on the exact same expression, see `get_offers_by_filters`.
+Offer.trgm_unaccent_name_index_ddl = """
+    CREATE INDEX IF NOT EXISTS idx_offer_trgm_unaccent_name
+    ON offer USING gin (immutable_unaccent(name) gin_trgm_ops);
+"""
+
+event.listen(Offer.__table__, "after_create", DDL(Offer.trgm_unaccent_name_index_ddl))
+
+Stock.trig_update_offer_status_ddl = """
+    CREATE OR REPLACE FUNCTION refresh_offer_status(offer_id BIGINT)
+    RETURNS VOID AS $$
+    BEGIN
+        -- Only write when the status changes, to avoid locking the offer
+        -- on each booking.
+        UPDATE offer
+        SET status = compute_offer_status(id, validation::text, "isActive")
+        WHERE id = offer_id
+        AND status IS DISTINCT FROM compute_offer_status(id, validation::text, "isActive");
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION update_offer_status_from_stock()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM refresh_offer_status(OLD."offerId");
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW."offerId" != OLD."offerId") THEN
+            PERFORM refresh_offer_status(NEW."offerId");
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS stock_update_offer_status ON stock;
+
+    CREATE TRIGGER stock_update_offer_status
+    AFTER INSERT OR DELETE
+    OR UPDATE OF "offerId", quantity, "dnBookedQuantity", "bookingLimitDatetime", "beginningDatetime", "isSoftDeleted"
+    ON stock
+    FOR EACH ROW
+    EXECUTE PROCEDURE update_offer_status_from_stock()
+    """
+
+event.listen(Stock.__table__, "after_create", DDL(Stock.trig_update_offer_status_ddl))
+
+
+def _get_modified_offer_id(session: Session, instance) -> Optional[int]:
+    from pcapi.core.bookings.models import Booking  # avoid import loop
+
+    if isinstance(instance, Offer):
+        return instance.id
+    if isinstance(instance, (Stock, Mediation)):
+        return instance.offerId
+    if isinstance(instance, Booking):
+        # Bookings are usually created with a `stockId` only (see
+        # `bookings.api.book_offer()`), but the stock has been loaded
+        # in the session beforehand. Do not lazy-load it in the middle
+        # of a flush.
+        stock = instance.__dict__.get("stock") or session.identity_map.get(identity_key(Stock, instance.stockId))
+        return stock.offerId if stock else None
+    return None
+
+
+@listens_for(Session, "after_flush")
+def collect_modified_offer_ids(session, flush_context):
+    """Collect offers whose native API response may have changed, to
+    invalidate their cached response once the transaction is committed.
+    """
+    from pcapi.core.bookings.models import Booking  # avoid import loop
+
+    offer_ids = session.info.setdefault("modified_offer_ids", set())
+    unresolved_stock_ids = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        offer_id = _get_modified_offer_id(session, instance)
+        if offer_id:
+            offer_ids.add(offer_id)
+        elif isinstance(instance, Booking) and instance.stockId:
+            unresolved_stock_ids.add(instance.stockId)
+    if unresolved_stock_ids:
+        query = select([Stock.offerId]).where(Stock.id.in_(unresolved_stock_ids))
+        offer_ids.update(offer_id for offer_id, in session.execute(query))
+
+
+@listens_for(Session, "after_commit")
+def invalidate_native_offer_responses(session):
+    offer_ids = session.info.pop("modified_offer_ids", None)
+    if not offer_ids or not has_app_context():
+        return
+    redis_client = getattr(current_app, "redis_client", None)
+    if redis_client:
+        redis.delete_native_offer_responses(redis_client, offer_ids)
+
+
+@listens_for(Session, "after_rollback")
+def forget_modified_offer_ids(session):
+    session.info.pop("modified_offer_ids", None)
+
+
 class ActivationCode(PcObject, Model):
     __tablename__ = "activation_code"
 
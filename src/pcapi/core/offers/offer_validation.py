@@ -1,67 +1,132 @@
 from dataclasses import dataclass
+import operator
+import time
+from typing import Callable
+from typing import Iterable
+from typing import Optional
 
 from pcapi.core.offers.models import Offer
 from pcapi.core.offers.models import OfferValidationConfig
+import pcapi.core.offers.repository as offers_repository
 from pcapi.models import PcObject
 from pcapi.utils.custom_logic import OPERATIONS
+from pcapi.utils.custom_logic import sanitize_list
+from pcapi.utils.custom_logic import sanitize_str
 
 
-@dataclass
-class OfferValidationItem:
-    model: PcObject
-    attribute: str
-    type: list[str]
-    condition: dict
+# The configuration is compiled once into predicates that take an
+# offer, instead of walking the specs for each offer.
 
-    def resolve(self) -> bool:
-        target_attribute = getattr(self.model, self.attribute)
-        return OPERATIONS[self.condition["operator"]](target_attribute, self.condition["comparated"])  # type: ignore[operator]
+Predicate = Callable[[Offer], bool]
 
+_MODEL_GETTERS: dict[str, Callable[[Offer], PcObject]] = {
+    "Offer": lambda offer: offer,
+    "Venue": lambda offer: offer.venue,
+    "Offerer": lambda offer: offer.venue.managingOfferer,
+}
 
-@dataclass
-class OfferValidationRuleItem:
+
+@dataclass(frozen=True)
+class CompiledOfferValidationRule:
     name: str
     factor: float
-    offer_validation_items: list[OfferValidationItem]
-
-    def resolve(self) -> float:
-        if all(item.resolve() for item in self.offer_validation_items):
-            return self.factor
-        return 1.0
-
-
-def parse_offer_validation_config(
-    offer: Offer, config: OfferValidationConfig
-) -> tuple[float, list[OfferValidationRuleItem]]:
-    minimum_score = float(config.specs.pop("minimum_score"))
-    rules = config.specs.pop("rules")
-
-    rule_items = []
-    for rule in rules:
-        validation_items = []
-        for parameter in rule["conditions"]:
-            model = offer
-            if parameter["model"] == "Venue":
-                model = offer.venue
-            elif parameter["model"] == "Offerer":
-                model = offer.venue.managingOfferer
-
-            validation_item = OfferValidationItem(
-                model=model,
-                attribute=parameter["attribute"],
-                type=parameter.get("type"),
-                condition=parameter["condition"],
-            )
-            validation_items.append(validation_item)
-        rule_item = OfferValidationRuleItem(
-            name=rule["name"], factor=rule["factor"], offer_validation_items=validation_items
+    predicates: tuple[Predicate, ...]
+
+    def matches(self, offer: Offer) -> bool:
+        return all(predicate(offer) for predicate in self.predicates)
+
+
+@dataclass(frozen=True)
+class CompiledOfferValidationConfig:
+    config_id: int
+    minimum_score: float
+    rules: tuple[CompiledOfferValidationRule, ...]
+
+    def compute_score(self, offer: Offer) -> float:
+        score = 1.0
+        for rule in self.rules:
+            if rule.matches(offer):
+                score *= rule.factor
+        return score
+
+    def compute_scores(self, offers: Iterable[Offer]) -> list[float]:
+        """Score a batch of offers, rule by rule."""
+        offers = list(offers)
+        scores = [1.0] * len(offers)
+        for rule in self.rules:
+            for index, offer in enumerate(offers):
+                if rule.matches(offer):
+                    scores[index] *= rule.factor
+        return scores
+
+
+def _compile_condition(parameter: dict) -> Predicate:
+    get_model = _MODEL_GETTERS.get(parameter["model"], _MODEL_GETTERS["Offer"])
+    get_attribute = operator.attrgetter(parameter["attribute"])
+    operator_name = parameter["condition"]["operator"]
+    comparated = parameter["condition"]["comparated"]
+
+    # Sanitize the compared values once, instead of for each offer.
+    if operator_name in ("in", "not in") and isinstance(comparated, list):
+        sanitized = sanitize_list(comparated)
+        try:
+            sanitized = frozenset(sanitized)
+        except TypeError:
+            pass
+        if operator_name == "in":
+            return lambda offer: sanitize_str(get_attribute(get_model(offer))) in sanitized
+        return lambda offer: sanitize_str(get_attribute(get_model(offer))) not in sanitized
+
+    operation = OPERATIONS[operator_name]
+    return lambda offer: operation(get_attribute(get_model(offer)), comparated)
+
+
+def compile_offer_validation_config(config: OfferValidationConfig) -> CompiledOfferValidationConfig:
+    rules = tuple(
+        CompiledOfferValidationRule(
+            name=rule["name"],
+            factor=rule["factor"],
+            predicates=tuple(_compile_condition(parameter) for parameter in rule["conditions"]),
         )
-        rule_items.append(rule_item)
-    return minimum_score, rule_items
+        for rule in config.specs["rules"]
+    )
+    return CompiledOfferValidationConfig(
+        config_id=config.id, minimum_score=float(config.specs["minimum_score"]), rules=rules
+    )
+
+
+# How long (in seconds) the id of the current configuration is trusted
+# before being fetched again. A configuration imported by this process
+# is picked up at once; one imported by another process, within that
+# delay.
+CONFIG_ID_CACHE_TTL = 60
+
+_compiled_config: Optional[CompiledOfferValidationConfig] = None
+_config_id_checked_at: Optional[float] = None
+
+
+def get_compiled_offer_validation_config() -> Optional[CompiledOfferValidationConfig]:
+    """Return the current configuration, compiled.
+
+    The id of the current configuration is fetched at most once every
+    ``CONFIG_ID_CACHE_TTL`` seconds, and the configuration is compiled
+    again only when that id changes.
+    """
+    global _compiled_config, _config_id_checked_at  # pylint: disable=global-statement
+    now = time.monotonic()
+    if _config_id_checked_at is not None and now - _config_id_checked_at < CONFIG_ID_CACHE_TTL:
+        return _compiled_config
+    config_id = offers_repository.get_current_offer_validation_config_id()
+    if config_id is None:
+        _compiled_config = None
+    elif _compiled_config is None or _compiled_config.config_id != config_id:
+        config = OfferValidationConfig.query.get(config_id)
+        _compiled_config = compile_offer_validation_config(config)
+    _config_id_checked_at = now
+    return _compiled_config
 
 
-def compute_offer_validation_score(validation_items: list[OfferValidationRuleItem]) -> float:
-    score = 1.0
-    for validation_item in validation_items:
-        score *= validation_item.resolve()
-    return score
+def invalidate_compiled_offer_validation_config() -> None:
+    global _compiled_config, _config_id_checked_at  # pylint: disable=global-statement
+    _compiled_config = None
+    _config_id_checked_at = None
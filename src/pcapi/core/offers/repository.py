@@ -1,15 +1,21 @@
+import csv
 from datetime import datetime
 from datetime import time
 from datetime import timedelta
+import io
 import typing
 from typing import Optional
 
+import pytz
 from sqlalchemy import and_
 from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import text
 from sqlalchemy.orm import Query
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import load_only
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql.functions import coalesce
 
 from pcapi.core.bookings.models import Booking
@@ -35,6 +41,8 @@ from pcapi.models.offer_type import ThingType
 IMPORTED_CREATION_MODE = "imported"
 MANUAL_CREATION_MODE = "manual"
 
+STOCK_CONSISTENCY_BATCH_SIZE = 10_000
+
 
 def get_capped_offers_for_filters(
     user_id: int,
@@ -62,11 +70,38 @@ def get_capped_offers_for_filters(
         period_ending_date=period_ending_date,
     )
 
+    # Only many-to-one relationships are joined: joining stocks or
+    # mediations would multiply the rows by the number of stocks of
+    # each offer. These are fetched by a single extra query each.
     query = (
-        query.options(joinedload(Offer.venue).joinedload(Venue.managingOfferer))
-        .options(joinedload(Offer.stocks))
-        .options(joinedload(Offer.mediations))
-        .options(joinedload(Offer.product))
+        query.options(
+            load_only(
+                Offer.id,
+                Offer.name,
+                Offer.isActive,
+                Offer.type,
+                Offer.extraData,
+                Offer.status,
+                Offer.lastProviderId,
+                Offer.productId,
+                Offer.venueId,
+            )
+        )
+        .options(joinedload(Offer.venue).joinedload(Venue.managingOfferer))
+        .options(joinedload(Offer.product).load_only(Product.id, Product.thumbCount))
+        .options(joinedload(Offer.lastProvider))
+        .options(
+            selectinload(Offer.stocks).load_only(
+                Stock.id,
+                Stock.offerId,
+                Stock.quantity,
+                Stock.dnBookedQuantity,
+                Stock.bookingLimitDatetime,
+                Stock.beginningDatetime,
+                Stock.isSoftDeleted,
+            )
+        )
+        .options(selectinload(Offer.mediations))
         .order_by(Offer.id.desc())
         .limit(offers_limit)
         .all()
@@ -124,7 +159,8 @@ def get_offers_by_filters(
         search = name_keywords
         if len(name_keywords) > 3:
             search = "%{}%".format(name_keywords)
-        query = query.filter(Offer.name.ilike(search))
+        # Accent-insensitive search, served by `idx_offer_trgm_unaccent_name`.
+        query = query.filter(func.immutable_unaccent(Offer.name).ilike(func.immutable_unaccent(search)))
     if status is not None:
         query = _filter_by_status(query, status)
     if period_beginning_date is not None or period_ending_date is not None:
@@ -227,18 +263,6 @@ def get_stocks_by_id_at_providers(id_at_providers: list[str]) -> dict:
     }
 
 
-def get_active_offers_count_for_venue(venue_id) -> int:
-    query = Offer.query.filter(Offer.venueId == venue_id)
-    query = _filter_by_status(query, OfferStatus.ACTIVE.name)
-    return query.distinct(Offer.id).count()
-
-
-def get_sold_out_offers_count_for_venue(venue_id) -> int:
-    query = Offer.query.filter(Offer.venueId == venue_id)
-    query = _filter_by_status(query, OfferStatus.SOLD_OUT.name)
-    return query.distinct(Offer.id).count()
-
-
 def get_and_lock_stock(stock_id: int) -> Stock:
     """Returns `stock_id` stock with a FOR UPDATE lock
     Raises StockDoesNotExist if no stock is found.
@@ -256,17 +280,147 @@ def get_and_lock_stock(stock_id: int) -> Stock:
     return stock
 
 
-def check_stock_consistency() -> list[int]:
-    return [
-        item[0]
-        for item in db.session.query(Stock.id)
+def get_stock_for_booking(stock_id: int) -> Stock:
+    """Returns `stock_id` stock, without locking it.
+    Raises StockDoesNotExist if no stock is found.
+    """
+    # Call `populate_existing()` to make sure we don't use something
+    # older from the SQLAlchemy's session.
+    stock = Stock.query.filter_by(id=stock_id).populate_existing().one_or_none()
+    if not stock:
+        raise StockDoesNotExist()
+    return stock
+
+
+def increment_stock_booked_quantity(stock_id: int, quantity: int) -> Optional[int]:
+    """Atomically add `quantity` to the booked quantity of the stock,
+    only if the stock has enough remaining quantity.
+
+    Returns the new booked quantity, or None if the stock could not
+    be booked.
+    WARNING: the UPDATE locks the stock row until the end of the
+    transaction. Commit (or rollback) as soon as possible.
+    """
+    stock_table = Stock.__table__
+    statement = (
+        stock_table.update()
+        .where(stock_table.c.id == stock_id)
+        .where(
+            or_(
+                stock_table.c.quantity.is_(None),
+                stock_table.c.dnBookedQuantity + quantity <= stock_table.c.quantity,
+            )
+        )
+        .values(dnBookedQuantity=stock_table.c.dnBookedQuantity + quantity)
+        .returning(stock_table.c.dnBookedQuantity)
+    )
+    return db.session.execute(statement).scalar()
+
+
+def decrease_stocks_booked_quantity(quantities_by_stock: dict[int, int]) -> set[int]:
+    """Subtract quantities from the booked quantity of stocks, with a
+    single UPDATE.
+
+    Return the ids of the offers of these stocks.
+    """
+    statement = text(
+        """
+        UPDATE stock
+        SET "dnBookedQuantity" = stock."dnBookedQuantity" - cancelled.quantity
+        FROM (SELECT unnest(:stock_ids) AS stock_id, unnest(:quantities) AS quantity) AS cancelled
+        WHERE stock.id = cancelled.stock_id
+        RETURNING stock."offerId"
+        """
+    )
+    rows = db.session.execute(
+        statement,
+        {"stock_ids": list(quantities_by_stock.keys()), "quantities": list(quantities_by_stock.values())},
+    )
+    return {offer_id for offer_id, in rows}
+
+
+def check_stock_consistency(since: Optional[datetime] = None) -> list[int]:
+    """Return the ids of stocks whose `dnBookedQuantity` does not match
+    the quantity of their non-cancelled bookings.
+
+    If `since` is given, only stocks that have a booking created or
+    modified (cancelled, uncancelled...) or that have been modified
+    since then are checked.
+    Otherwise, all stocks are checked by ranges of ids, so that each
+    query stays short.
+    """
+    query = (
+        db.session.query(Stock.id)
         .outerjoin(Stock.bookings)
         .group_by(Stock.id)
         .having(
             Stock.dnBookedQuantity != func.coalesce(func.sum(Booking.quantity).filter(Booking.isCancelled == False), 0)
         )
-        .all()
-    ]
+    )
+
+    if since:
+        touched_stock_ids = (
+            db.session.query(Booking.stockId)
+            .filter(Booking.dateModified >= since)
+            .union(db.session.query(Stock.id).filter(Stock.dateModified >= since))
+        )
+        return [stock_id for stock_id, in query.filter(Stock.id.in_(touched_stock_ids))]
+
+    min_id, max_id = db.session.query(func.min(Stock.id), func.max(Stock.id)).one()
+    if min_id is None:
+        return []
+    inconsistent_stock_ids = []
+    for start in range(min_id, max_id + 1, STOCK_CONSISTENCY_BATCH_SIZE):
+        batch = query.filter(Stock.id.between(start, start + STOCK_CONSISTENCY_BATCH_SIZE - 1))
+        inconsistent_stock_ids.extend(stock_id for stock_id, in batch)
+    return inconsistent_stock_ids
+
+
+def update_offers_status_after_dates(since: datetime) -> int:
+    """Refresh the status of offers that have a stock whose booking limit
+    or beginning date has passed since `since`. Return the number of
+    offers whose status has changed.
+
+    Other status changes are handled by database triggers, see
+    `Offer.status`.
+    """
+    statement = text(
+        """
+        UPDATE offer
+        SET status = compute_offer_status(offer.id, offer.validation::text, offer."isActive")
+        WHERE offer.id IN (
+            SELECT "offerId" FROM stock
+            WHERE "bookingLimitDatetime" BETWEEN :since AND NOW()
+            OR "beginningDatetime" BETWEEN :since AND NOW()
+        )
+        AND offer.status IS DISTINCT FROM compute_offer_status(offer.id, offer.validation::text, offer."isActive")
+        """
+    )
+    result = db.session.execute(statement, {"since": since})
+    db.session.commit()
+    return result.rowcount
+
+
+def insert_activation_codes(stock_id: int, codes: list[str], expiration_date: Optional[datetime]) -> None:
+    """Insert activation codes with COPY, which is much faster than
+    multi-row INSERTs for large files. The codes are written in the
+    current transaction, which is left uncommitted.
+    """
+    if expiration_date and expiration_date.tzinfo:
+        expiration_date = expiration_date.astimezone(pytz.utc).replace(tzinfo=None)
+    expiration = expiration_date.isoformat() if expiration_date else None
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for code in codes:
+        writer.writerow((code, expiration, stock_id))
+    buffer.seek(0)
+
+    with db.session.connection().connection.cursor() as cursor:
+        cursor.copy_expert(
+            'COPY activation_code (code, "expirationDate", "stockId") FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
 
 
 def find_tomorrow_event_stock_ids() -> set[int]:
@@ -289,6 +443,10 @@ def get_current_offer_validation_config() -> Optional[OfferValidationConfig]:
     return OfferValidationConfig.query.order_by(OfferValidationConfig.id.desc()).first()
 
 
+def get_current_offer_validation_config_id() -> Optional[int]:
+    return db.session.query(func.max(OfferValidationConfig.id)).scalar()
+
+
 def get_expired_offers(interval: [datetime, datetime]) -> Query:
     """Return a query of offers whose latest booking limit occurs within
     the given interval.
@@ -274,6 +274,13 @@ def check_activation_codes_expiration_datetime(
         raise errors
 
 
+def check_activation_codes_are_unique(activation_codes: list[str]) -> None:
+    if len(set(activation_codes)) != len(activation_codes):
+        errors = ApiErrors()
+        errors.add_error("activationCodes", "Le fichier contient des codes d'activation en double")
+        raise errors
+
+
 def check_activation_codes_expiration_datetime_on_stock_edition(
     activation_codes: Optional[list[ActivationCode]],
     booking_limit_datetime: Optional[datetime],
@@ -1,5 +1,7 @@
 from datetime import datetime
+from datetime import timedelta
 import logging
+from typing import IO
 from typing import Optional
 
 from google.cloud.storage import Client
@@ -111,6 +113,32 @@ def store_object(
         raise exception
 
 
+def store_file_object(bucket: str, object_id: str, file: IO[bytes], content_type: Optional[str] = None) -> None:
+    """Upload a file object without loading it in memory."""
+    storage_path = bucket + "/" + object_id
+    try:
+        storage_client_bucket = get_encrypted_gcp_storage_client_bucket()
+        gcp_cloud_blob = storage_client_bucket.blob(storage_path)
+        gcp_cloud_blob.upload_from_file(file, content_type=content_type)
+    except Exception as exception:
+        logger.exception("An error has occured while trying to upload file on encrypted GCP bucket: %s", str(exception))
+        raise exception
+
+
+def generate_signed_url(storage_path: str, expiration: timedelta) -> str:
+    try:
+        storage_client_bucket = get_encrypted_gcp_storage_client_bucket()
+        gcp_cloud_blob = storage_client_bucket.blob(storage_path)
+        return gcp_cloud_blob.generate_signed_url(expiration=expiration, version="v4")
+    except Exception as exception:
+        logger.exception(
+            "An error has occured while trying to sign URL of file with path: %s on encrypted GCP bucket: %s",
+            storage_path,
+            str(exception),
+        )
+        raise exception
+
+
 def delete_object(storage_path: str) -> None:
     try:
         storage_client_bucket = get_encrypted_gcp_storage_client_bucket()
@@ -1,7 +1,9 @@
+from typing import Optional
+
 from pcapi.core.offerers.models import Offerer
 
 
 class PaginatedOfferers:
-    def __init__(self, offerers: list[Offerer], total: int):
+    def __init__(self, offerers: list[Offerer], total: Optional[int]):
         self.offerers = offerers
         self.total = total
@@ -16,5 +16,7 @@ class PaginatedOfferersRepository(ABC):
         only_validated_offerers: bool,
         page: int = 0,
         keywords: Optional[str] = None,
+        after_id: Optional[int] = None,
+        with_total: bool = True,
     ) -> PaginatedOfferers:
         pass
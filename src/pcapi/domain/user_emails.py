@@ -1,5 +1,7 @@
 import logging
 
+from sqlalchemy.util._collections import AbstractKeyedTuple
+
 from pcapi.core import mails
 from pcapi.core.bookings.models import Booking
 from pcapi.core.bookings.models import BookingCancellationReasons
@@ -38,6 +40,7 @@ from pcapi.emails.offerer_bookings_recap_after_deleting_stock import (
     retrieve_offerer_bookings_recap_email_data_after_offerer_cancellation,
 )
 from pcapi.emails.offerer_expired_bookings import build_expired_bookings_recap_email_data_for_offerer
+from pcapi.emails.pro_bookings_recap_export import build_bookings_recap_export_email_data
 from pcapi.emails.pro_reset_password import retrieve_data_for_reset_password_link_to_admin_email
 from pcapi.emails.pro_reset_password import retrieve_data_for_reset_password_pro_email
 from pcapi.emails.user_document_validation import build_data_for_document_verification_error
@@ -160,6 +163,11 @@ def send_expired_bookings_recap_email_to_offerer(offerer: Offerer, bookings: lis
         mails.send(recipients=[offerer_booking_email], data=data)
 
 
+def send_bookings_recap_export_email(user: User, download_url: str) -> None:
+    data = build_bookings_recap_export_email_data(download_url)
+    mails.send(recipients=[user.email], data=data)
+
+
 def send_pro_user_validation_email(user: User) -> None:
     data = make_pro_user_validation_email(user)
     mails.send(recipients=[user.email], data=data)
@@ -170,9 +178,21 @@ def send_admin_user_validation_email(user: User, token: Token) -> None:
     mails.send(recipients=[user.email], data=data)
 
 
-def send_soon_to_be_expired_bookings_recap_email_to_beneficiary(beneficiary: User, bookings: list[Booking]) -> None:
-    data = build_soon_to_be_expired_bookings_recap_email_data_for_beneficiary(beneficiary, bookings)
-    mails.send(recipients=[beneficiary.email], data=data)
+def send_soon_to_be_expired_bookings_recap_emails(users_bookings: list[AbstractKeyedTuple]) -> bool:
+    """Send the recap e-mail to each user returned by
+    `find_soon_to_be_expiring_bookings_grouped_by_user`, in as few calls
+    to the e-mail service as possible.
+    """
+    messages = [
+        (
+            [user_bookings.email],
+            build_soon_to_be_expired_bookings_recap_email_data_for_beneficiary(
+                user_bookings.firstName, user_bookings.bookings
+            ),
+        )
+        for user_bookings in users_bookings
+    ]
+    return mails.send_many(messages=messages)
 
 
 def send_activation_email(
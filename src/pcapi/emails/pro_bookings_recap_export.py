@@ -0,0 +1,9 @@
+from flask import render_template
+
+
+def build_bookings_recap_export_email_data(download_url: str) -> dict:
+    return {
+        "FromName": "pass Culture Pro",
+        "Subject": "[pass Culture pro] Votre export de réservations est prêt",
+        "Html-part": render_template("mails/bookings_recap_export_email.html", download_url=download_url),
+    }
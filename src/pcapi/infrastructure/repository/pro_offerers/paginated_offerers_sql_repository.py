@@ -1,12 +1,19 @@
 from typing import Optional
 
+from sqlalchemy import and_
 from sqlalchemy import not_
+from sqlalchemy import or_
+from sqlalchemy import true
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 
 from pcapi.core.offerers.models import Offerer
 from pcapi.domain.pro_offerers.paginated_offerers import PaginatedOfferers
 from pcapi.domain.pro_offerers.paginated_offerers_repository import PaginatedOfferersRepository
 from pcapi.models import UserOfferer
 from pcapi.models import Venue
+from pcapi.models.db import db
 from pcapi.repository.offerer_queries import filter_offerers_with_keywords_string
 
 
@@ -20,11 +27,22 @@ class PaginatedOfferersSQLRepository(PaginatedOfferersRepository):
         is_filtered_by_offerer_status: bool,
         page: int = 0,
         keywords: Optional[str] = None,
+        after_id: Optional[int] = None,
+        with_total: bool = True,
     ) -> PaginatedOfferers:
-        query = Offerer.query.distinct().filter(Offerer.isActive.is_(True))
-
-        if not user_is_admin:
-            query = query.join(UserOfferer, UserOfferer.offererId == Offerer.id).filter(UserOfferer.userId == user_id)
+        # Admin users have access to all offerers. Other users have
+        # access to offerers whose link has been validated, which is
+        # fetched along with the offerer instead of loading all links
+        # of each offerer.
+        if user_is_admin:
+            query = db.session.query(Offerer, true())
+        else:
+            query = (
+                db.session.query(Offerer, UserOfferer.validationToken.is_(None))
+                .join(UserOfferer, UserOfferer.offererId == Offerer.id)
+                .filter(UserOfferer.userId == user_id)
+            )
+        query = query.filter(Offerer.isActive.is_(True))
 
         if is_filtered_by_offerer_status:
             if only_validated_offerers:
@@ -36,13 +54,31 @@ class PaginatedOfferersSQLRepository(PaginatedOfferersRepository):
             query = query.join(Venue, Venue.managingOffererId == Offerer.id)
             query = filter_offerers_with_keywords_string(query, keywords)
 
-        query = query.order_by(Offerer.name)
-        query = query.paginate(page, per_page=int(pagination_limit), error_out=False)
-        offerers = query.items
+        query = query.distinct()
+        total = query.order_by(None).count() if with_total else None
+
+        if after_id is not None:
+            # Keyset pagination on (name, id): the cursor is the id of
+            # the last offerer of the previous page.
+            cursor = aliased(Offerer)
+            cursor_name = db.session.query(cursor.name).filter(cursor.id == after_id).as_scalar()
+            query = query.filter(
+                or_(Offerer.name > cursor_name, and_(Offerer.name == cursor_name, Offerer.id > after_id))
+            )
+        else:
+            query = query.offset((max(page, 1) - 1) * pagination_limit)
 
-        for offerer in offerers:
-            offerer.append_user_has_access_attribute(user_id=user_id, is_admin=user_is_admin)
+        rows = (
+            query.options(joinedload(Offerer.bankInformation))
+            .options(selectinload(Offerer.managedVenues).joinedload(Venue.bankInformation))
+            .order_by(Offerer.name, Offerer.id)
+            .limit(pagination_limit)
+            .all()
+        )
 
-        total = query.total
+        offerers = []
+        for offerer, user_has_access in rows:
+            offerer.userHasAccess = user_has_access
+            offerers.append(offerer)
 
         return PaginatedOfferers(offerers, total)
@@ -4,6 +4,8 @@ from pcapi.models.db import db
 def install_database_extensions(app):
     with app.app_context():
         _create_text_search_configuration_if_not_exists()
+        _create_immutable_unaccent_function()
+        _create_trigram_extension()
         _create_index_btree_gist_extension()
         _create_postgis_extension()
         _create_pgcrypto_extension()
@@ -23,6 +25,21 @@ def _create_text_search_configuration_if_not_exists():
         )
 
 
+def _create_immutable_unaccent_function():
+    # `unaccent()` is only STABLE (its result depends on the dictionary
+    # found in the search path), so it cannot be used in an index
+    # expression. This wrapper pins the dictionary and can be indexed.
+    db.engine.execute(
+        "CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS"
+        " $$ SELECT public.unaccent('public.unaccent', $1) $$"
+        " LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;"
+    )
+
+
+def _create_trigram_extension():
+    db.engine.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+
 def _create_index_btree_gist_extension():
     db.engine.execute("CREATE EXTENSION IF NOT EXISTS btree_gist;")
 
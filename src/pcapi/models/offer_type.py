@@ -1,4 +1,8 @@
+from dataclasses import dataclass
 from enum import Enum
+from types import MappingProxyType
+from typing import Mapping
+from typing import Optional
 
 
 class CategoryType(Enum):
@@ -317,11 +321,8 @@ PERMANENT_OFFER_TYPES = {str(offer_type) for offer_type in ThingType if not offe
 class ProductType:
     @classmethod
     def is_thing(cls, name: str) -> bool:
-        for possible_type in list(ThingType):
-            if str(possible_type) == name:
-                return True
-
-        return False
+        info = OFFER_TYPES_INFO.get(name)
+        return info is not None and info.is_thing
 
     @classmethod
     def is_book(cls, typ: str) -> bool:
@@ -329,11 +330,8 @@ class ProductType:
 
     @classmethod
     def is_event(cls, name: str) -> bool:
-        for possible_type in list(EventType):
-            if str(possible_type) == name:
-                return True
-
-        return False
+        info = OFFER_TYPES_INFO.get(name)
+        return info is not None and info.is_event
 
 
 class Category(Enum):
@@ -359,3 +357,46 @@ class Category(Enum):
 CategoryNameEnum = Enum("CategoryNameEnum", {category.name: category.name for category in list(Category)})
 
 CATEGORIES_LABEL_DICT = {label: category.name for category in list(Category) for label in category.value}
+
+
+@dataclass(frozen=True)
+class OfferTypeInfo:
+    value: str
+    category_type: str
+    pro_label: str
+    app_label: str
+    sublabel: str
+    offline_only: bool
+    online_only: bool
+    can_expire: bool
+    # Name of the `Category` the app displays, if any.
+    app_category: Optional[str]
+
+    @property
+    def is_event(self) -> bool:
+        return self.category_type == CategoryType.EVENT.value
+
+    @property
+    def is_thing(self) -> bool:
+        return self.category_type == CategoryType.THING.value
+
+
+def _build_offer_type_info(offer_type: Enum) -> OfferTypeInfo:
+    category_type = CategoryType.EVENT if isinstance(offer_type, EventType) else CategoryType.THING
+    return OfferTypeInfo(
+        value=str(offer_type),
+        category_type=category_type.value,
+        pro_label=offer_type.value["proLabel"],
+        app_label=offer_type.value["appLabel"],
+        sublabel=offer_type.value["sublabel"],
+        offline_only=offer_type.value.get("offlineOnly", False),
+        online_only=offer_type.value.get("onlineOnly", False),
+        can_expire=offer_type.value.get("canExpire", False),
+        app_category=CATEGORIES_LABEL_DICT.get(offer_type.value["appLabel"]),
+    )
+
+
+# Read-only index of offer types, keyed by the string stored in `Offer.type`.
+OFFER_TYPES_INFO: Mapping[str, OfferTypeInfo] = MappingProxyType(
+    {str(t): _build_offer_type_info(t) for t in list(ThingType) + list(EventType)}
+)
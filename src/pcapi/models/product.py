@@ -4,10 +4,12 @@ from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import CheckConstraint
 from sqlalchemy import Column
+from sqlalchemy import DDL
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Text
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import false
@@ -16,8 +18,8 @@ from sqlalchemy.sql.expression import true
 from pcapi.models.db import Model
 from pcapi.models.extra_data_mixin import ExtraDataMixin
 from pcapi.models.has_thumb_mixin import HasThumbMixin
-from pcapi.models.offer_type import EventType
-from pcapi.models.offer_type import ThingType
+from pcapi.models.offer_type import ALL_OFFER_TYPES_DICT
+from pcapi.models.offer_type import OFFER_TYPES_INFO
 from pcapi.models.pc_object import PcObject
 from pcapi.models.providable_mixin import ProvidableMixin
 
@@ -61,10 +63,8 @@ class Product(PcObject, Model, ExtraDataMixin, HasThumbMixin, ProvidableMixin):
 
     @property
     def offerType(self):
-        all_types = list(ThingType) + list(EventType)
-        for possible_type in all_types:
-            if str(possible_type) == self.type:
-                return possible_type.as_dict()
+        if self.type in ALL_OFFER_TYPES_DICT:
+            return ALL_OFFER_TYPES_DICT[self.type]
         # FIXME (dbaty, 2020-12-03): shouldn't we raise an error such as
         #     raise ValueError(f"Unexpected offer type '{self.type}'")
         # instead of returning None?
@@ -75,10 +75,21 @@ class Product(PcObject, Model, ExtraDataMixin, HasThumbMixin, ProvidableMixin):
         return self.url is not None and self.url != ""
 
     def is_offline_only(self):
-        offline_only_products = filter(lambda product_type: product_type.value["offlineOnly"], ThingType)
-        offline_only_types_for_products = map(lambda x: x.__str__(), offline_only_products)
-        return self.type in offline_only_types_for_products
+        info = OFFER_TYPES_INFO.get(self.type)
+        return info is not None and info.is_thing and info.offline_only
 
     def get_label_from_type_string(self):
-        matching_type_product = next(filter(lambda product_type: product_type.__str__() == self.type, ThingType))
-        return matching_type_product.value["proLabel"]
+        return OFFER_TYPES_INFO[self.type].pro_label
+
+
+# Products are looked up by ISBN (books) and visa (movies), see
+# `Product.extraData["isbn"].astext == ...` filters. `extraData` is a
+# JSON column, hence partial expression indexes.
+Product.extra_data_indexes_ddl = """
+    CREATE INDEX IF NOT EXISTS ix_product_isbn ON product (("extraData" ->> 'isbn'))
+    WHERE "extraData" ->> 'isbn' IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS ix_product_visa ON product (("extraData" ->> 'visa'))
+    WHERE "extraData" ->> 'visa' IS NOT NULL;
+"""
+
+event.listen(Product.__table__, "after_create", DDL(Product.extra_data_indexes_ddl))
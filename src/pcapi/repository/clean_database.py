@@ -1,8 +1,10 @@
 from pcapi import settings
+from pcapi.core.bookings.models import BookingSideEffect
 from pcapi.core.mails.models import Email
 from pcapi.core.offerers.models import ApiKey
 from pcapi.core.offerers.models import Offerer
 from pcapi.core.offerers.models import VenueLabel
+from pcapi.core.offerers.models import VenueStats
 from pcapi.core.offerers.models import VenueType
 from pcapi.core.offers.models import ActivationCode
 from pcapi.core.offers.models import Mediation
@@ -53,6 +55,7 @@ def clean_all_database(*args, **kwargs):
     PaymentStatus.query.delete()
     Payment.query.delete()
     PaymentMessage.query.delete()
+    BookingSideEffect.query.delete()
     Booking.query.delete()
     Stock.query.delete()
     Favorite.query.delete()
@@ -64,6 +67,7 @@ def clean_all_database(*args, **kwargs):
     BankInformation.query.delete()
     IrisVenues.query.delete()
     IrisFrance.query.delete()
+    VenueStats.query.delete()
     Venue.query.delete()
     UserOfferer.query.delete()
     ApiKey.query.delete()
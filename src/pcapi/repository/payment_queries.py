@@ -28,6 +28,11 @@ def has_payment(booking: Booking) -> Optional[Payment]:
     return db.session.query(Payment.query.filter_by(bookingId=booking.id).exists()).scalar()
 
 
+def get_paid_booking_ids(booking_ids: Iterable[int]) -> set[int]:
+    query = db.session.query(Payment.bookingId).filter(Payment.bookingId.in_(booking_ids)).distinct()
+    return {booking_id for booking_id, in query}
+
+
 def find_not_processable_with_bank_information() -> list[Payment]:
     most_recent_payment_status = (
         PaymentStatus.query.with_entities(PaymentStatus.id)
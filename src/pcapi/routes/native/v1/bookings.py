@@ -1,10 +1,19 @@
 from datetime import datetime
+from datetime import timedelta
+import hashlib
 import logging
 
+from flask import Response
+from flask import after_this_request
+from flask import make_response
+from flask import request
+import pytz
+from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
 
 import pcapi.core.bookings.api as bookings_api
 import pcapi.core.bookings.exceptions as exceptions
+import pcapi.core.bookings.repository as bookings_repository
 from pcapi.core.bookings.models import Booking
 from pcapi.core.offerers.models import Venue
 from pcapi.core.offers.exceptions import StockDoesNotExist
@@ -22,6 +31,7 @@ from pcapi.routes.native.v1.serialization.bookings import BookOfferRequest
 from pcapi.routes.native.v1.serialization.bookings import BookOfferResponse
 from pcapi.routes.native.v1.serialization.bookings import BookingDisplayStatusRequest
 from pcapi.routes.native.v1.serialization.bookings import BookingReponse
+from pcapi.routes.native.v1.serialization.bookings import BookingsRequest
 from pcapi.routes.native.v1.serialization.bookings import BookingsResponse
 from pcapi.serialization.decorator import spectree_serialize
 
@@ -31,6 +41,10 @@ logger = logging.getLogger(__name__)
 from . import blueprint
 
 
+# Longer than any transaction that modifies bookings should last.
+BOOKINGS_SYNC_SAFETY_MARGIN = timedelta(minutes=5)
+
+
 @blueprint.native_v1.route("/bookings", methods=["POST"])
 @spectree_serialize(api=blueprint.api, response_model=BookOfferResponse, on_error_statuses=[400])
 @authenticated_user_required
@@ -73,10 +87,38 @@ def book_offer(user: User, body: BookOfferRequest) -> BookOfferResponse:
 @blueprint.native_v1.route("/bookings", methods=["GET"])
 @spectree_serialize(api=blueprint.api, response_model=BookingsResponse)
 @authenticated_user_required
-def get_bookings(user: User) -> BookingsResponse:
+def get_bookings(user: User, query: BookingsRequest) -> BookingsResponse:
+    now = datetime.utcnow()
+    version, database_now = bookings_repository.get_user_bookings_version(user.id, now)
+    if query.modified_since:
+        # The version only changes with the bookings themselves, not
+        # with their offers, stocks or venues: only delta syncs, that do
+        # not return such changes anyway, may be answered with a 304.
+        # Full syncs always return everything.
+        etag = hashlib.md5(repr((version, query.modified_since)).encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+            response.set_etag(etag)
+            return response
+
+        @after_this_request
+        def set_etag(response: Response) -> Response:
+            response.set_etag(etag)
+            return response
+
+    bookings_query = Booking.query.filter_by(userId=user.id)
+    if query.modified_since:
+        # Also return bookings whose event started since the last sync,
+        # as they may have moved from ongoing to ended bookings.
+        modified_since = query.modified_since
+        if modified_since.tzinfo:
+            modified_since = modified_since.astimezone(pytz.utc).replace(tzinfo=None)
+        bookings_query = bookings_query.join(Booking.stock).filter(
+            or_(Booking.dateModified > modified_since, Stock.beginningDatetime.between(modified_since, now))
+        )
+
     bookings = (
-        Booking.query.filter_by(userId=user.id)
-        .options(joinedload(Booking.stock).load_only(Stock.id, Stock.beginningDatetime))
+        bookings_query.options(joinedload(Booking.stock).load_only(Stock.id, Stock.beginningDatetime))
         .options(
             joinedload(Booking.stock)
             .joinedload(Stock.offer)
@@ -115,6 +157,10 @@ def get_bookings(user: User) -> BookingsResponse:
             booking.qrCodeData = bookings_api.get_qr_code_data(booking.token)
 
     result = BookingsResponse(
+        # `dateModified` is set to the start time of the transaction that
+        # modifies a booking, which may commit later: go back in time so
+        # that the next sync does not miss it.
+        next_modified_since=database_now - BOOKINGS_SYNC_SAFETY_MARGIN,
         ended_bookings=[
             BookingReponse.from_orm(booking)
             for booking in sorted(
@@ -1,5 +1,12 @@
+import hashlib
+
+from flask import Response
+from flask import current_app as app
+from flask import make_response
+from flask import request
 from sqlalchemy.orm import joinedload
 
+from pcapi.connectors import redis
 from pcapi.core.offerers.models import Offerer
 from pcapi.core.offerers.models import Venue
 from pcapi.core.offers.models import Offer
@@ -19,21 +26,36 @@ from .serialization import offers as serializers
 @spectree_serialize(
     response_model=serializers.OfferResponse, api=blueprint.api, on_error_statuses=[404]
 )  # type: ignore
-def get_offer(offer_id: str) -> serializers.OfferResponse:
-    offer = (
-        Offer.query.options(joinedload(Offer.stocks).joinedload(Stock.activationCodes))
-        .options(
-            joinedload(Offer.venue)
-            .joinedload(Venue.managingOfferer)
-            .load_only(Offerer.name, Offerer.validationToken, Offerer.isActive)
+def get_offer(offer_id: int) -> Response:
+    # The body is cached already serialized, along with its strong ETag, so
+    # that hot offers are neither loaded nor serialized on every request.
+    cached = redis.get_native_offer_response(app.redis_client, offer_id)
+    if cached:
+        etag, body = cached
+    else:
+        offer = (
+            Offer.query.options(joinedload(Offer.stocks).joinedload(Stock.activationCodes))
+            .options(
+                joinedload(Offer.venue)
+                .joinedload(Venue.managingOfferer)
+                .load_only(Offerer.name, Offerer.validationToken, Offerer.isActive)
+            )
+            .options(joinedload(Offer.mediations))
+            .options(joinedload(Offer.product).load_only(Product.id, Product.thumbCount))
+            .filter(Offer.id == offer_id)
+            .first_or_404()
         )
-        .options(joinedload(Offer.mediations))
-        .options(joinedload(Offer.product).load_only(Product.id, Product.thumbCount))
-        .filter(Offer.id == offer_id)
-        .first_or_404()
-    )
+        body = serializers.OfferResponse.from_orm(offer).json(by_alias=True)
+        etag = hashlib.md5(body.encode()).hexdigest()
+        redis.set_native_offer_response(app.redis_client, offer_id, etag, body)
 
-    return serializers.OfferResponse.from_orm(offer)
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        response = make_response(body, 200)
+        response.mimetype = "application/json"
+    response.set_etag(etag)
+    return response
 
 
 @blueprint.native_v1.route("/send_offer_webapp_link_by_email/<int:offer_id>", methods=["POST"])
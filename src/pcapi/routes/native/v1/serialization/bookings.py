@@ -123,7 +123,17 @@ class BookingReponse(BaseModel):
         allow_population_by_field_name = True
 
 
+class BookingsRequest(BaseModel):
+    # Only return bookings that changed since then (delta sync)
+    modified_since: Optional[datetime]
+
+    class Config:
+        alias_generator = to_camel
+
+
 class BookingsResponse(BaseModel):
+    # To be sent as `modifiedSince` on the next (delta) sync
+    next_modified_since: datetime
     ended_bookings: list[BookingReponse]
     ongoing_bookings: list[BookingReponse]
 
@@ -9,10 +9,12 @@ import pcapi.core.bookings.api as bookings_api
 from pcapi.core.bookings.models import Booking
 import pcapi.core.bookings.repository as booking_repository
 import pcapi.core.bookings.validation as bookings_validation
+from pcapi.core.users.models import User
 from pcapi.domain.users import UnauthorizedForAdminUser
 from pcapi.domain.users import check_is_authorized_to_access_bookings_recap
 from pcapi.flask_app import private_api
 from pcapi.flask_app import public_api
+from pcapi.models import ApiErrors
 from pcapi.models import EventType
 from pcapi.models.feature import FeatureToggle
 from pcapi.models.offer_type import ProductType
@@ -20,6 +22,10 @@ from pcapi.repository import feature_queries
 from pcapi.routes.serialization import serialize
 from pcapi.routes.serialization import serialize_booking
 from pcapi.routes.serialization.bookings_recap_serialize import serialize_bookings_recap_paginated
+from pcapi.routes.serialization.bookings_serialize import BookingUseResultModel
+from pcapi.routes.serialization.bookings_serialize import PatchBookingsUseBodyModel
+from pcapi.routes.serialization.bookings_serialize import PatchBookingsUseResponseModel
+from pcapi.serialization.decorator import spectree_serialize
 from pcapi.utils.human_ids import dehumanize
 from pcapi.utils.human_ids import humanize
 from pcapi.utils.rest import check_user_has_access_to_offerer
@@ -32,6 +38,7 @@ from pcapi.validation.routes.users_authorizations import check_api_key_allows_to
 from pcapi.validation.routes.users_authorizations import check_api_key_allows_to_validate_booking
 from pcapi.validation.routes.users_authorizations import check_user_can_validate_bookings
 from pcapi.validation.routes.users_authorizations import check_user_can_validate_bookings_v2
+from pcapi.workers.export_bookings_recap_job import export_bookings_recap_job
 
 
 # @debt api-migration
@@ -74,34 +81,11 @@ def patch_booking_by_token(token: str):
 @login_required
 def get_all_bookings():
     page = request.args.get("page", 1)
-    venue_id = dehumanize(request.args.get("venueId", None))
-    event_date = (
-        datetime.fromisoformat(request.args.get("eventDate").replace("Z", "+00:00")).date()
-        if request.args.get("eventDate")
-        else None
-    )
-    booking_period_beginning_date = (
-        datetime.fromisoformat(request.args.get("bookingPeriodBeginningDate").replace("Z", "+00:00")).date()
-        if request.args.get("bookingPeriodBeginningDate")
-        else None
-    )
-    booking_period_ending_date = (
-        datetime.fromisoformat(request.args.get("bookingPeriodEndingDate").replace("Z", "+00:00")).date()
-        if request.args.get("bookingPeriodEndingDate")
-        else None
-    )
+    filters = _get_bookings_recap_filters()
 
     check_page_format_is_number(page)
 
-    check_is_authorized_to_access_bookings_recap(current_user)
-
-    # FIXME: due to generalisation, the performance issue has led to DDOS many
-    # users checking the many bookings of these offerers
-    temporarily_banned_sirens = ["334473352", "434001954", "343282380"]
-    if feature_queries.is_active(FeatureToggle.DISABLE_BOOKINGS_RECAP_FOR_SOME_PROS):
-        if any(offerer.siren in temporarily_banned_sirens for offerer in current_user.offerers):
-            # Here we use the same process as for admins
-            raise UnauthorizedForAdminUser()
+    _check_can_access_bookings_recap(current_user)
 
     # FIXME: rewrite this route. The repository function should return
     # a bare SQLAlchemy query, and the route should handle the
@@ -109,16 +93,31 @@ def get_all_bookings():
     # that is only used here.
     bookings_recap_paginated = booking_repository.find_by_pro_user_id(
         user_id=current_user.id,
-        event_date=event_date,
-        venue_id=venue_id,
-        booking_period_beginning_date=booking_period_beginning_date,
-        booking_period_ending_date=booking_period_ending_date,
         page=int(page),
+        **filters,
     )
 
     return serialize_bookings_recap_paginated(bookings_recap_paginated), 200
 
 
+# @debt api-migration
+@private_api.route("/bookings/pro/export", methods=["POST"])
+@login_required
+def export_all_bookings():
+    """Let a pro user request an export of all their bookings.
+
+    The export is built asynchronously and the user receives an email
+    with a download link when it is ready.
+    """
+    filters = _get_bookings_recap_filters()
+
+    _check_can_access_bookings_recap(current_user)
+
+    export_bookings_recap_job.delay(current_user.id, filters)
+
+    return "", 202
+
+
 # @debt api-migration
 @public_api.route("/v2/bookings/token/<token>", methods=["GET"])
 @login_or_api_key_required
@@ -159,6 +158,54 @@ def patch_booking_use_by_token(token: str):
     return "", 204
 
 
+@public_api.route("/v2/bookings/use/tokens", methods=["PATCH"])
+@login_or_api_key_required
+@spectree_serialize(response_model=PatchBookingsUseResponseModel)  # type: ignore
+def patch_bookings_use_by_tokens(body: PatchBookingsUseBodyModel) -> PatchBookingsUseResponseModel:
+    """Let a pro user mark many bookings as used at once.
+
+    Rights are checked once per offerer and all usable bookings are
+    marked as used in a single transaction. Each token gets its own
+    result, so that an invalid token does not prevent the others from
+    being used.
+    """
+    tokens = list(dict.fromkeys(token.upper() for token in body.tokens))
+    bookings_by_token = {booking.token: booking for booking in booking_repository.find_by_tokens(tokens)}
+
+    allowed_offerer_ids = set()
+    for offerer_id in {booking.stock.offer.venue.managingOffererId for booking in bookings_by_token.values()}:
+        try:
+            if current_user.is_authenticated:
+                check_user_can_validate_bookings_v2(current_user, offerer_id)
+            if current_api_key:
+                check_api_key_allows_to_validate_booking(current_api_key, offerer_id)
+        except ApiErrors:
+            continue
+        allowed_offerer_ids.add(offerer_id)
+
+    errors_by_token = {}
+    usable_bookings = []
+    for token in tokens:
+        booking = bookings_by_token.get(token)
+        if booking is None:
+            errors_by_token[token] = {"global": ["Cette contremarque n'a pas été trouvée"]}
+        elif booking.stock.offer.venue.managingOffererId not in allowed_offerer_ids:
+            errors_by_token[token] = {
+                "user": ["Vous n'avez pas les droits suffisants pour valider cette contremarque."]
+            }
+        else:
+            usable_bookings.append(booking)
+
+    errors_by_token.update(bookings_api.mark_many_as_used(usable_bookings))
+
+    return PatchBookingsUseResponseModel(
+        results=[
+            BookingUseResultModel(token=token, isUsed=token not in errors_by_token, errors=errors_by_token.get(token))
+            for token in tokens
+        ]
+    )
+
+
 # @debt api-migration
 @private_api.route("/v2/bookings/cancel/token/<token>", methods=["PATCH"])
 @login_or_api_key_required
@@ -198,6 +245,34 @@ def patch_booking_keep_by_token(token: str):
     return "", 204
 
 
+def _get_date_from_request_args(name: str):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+
+
+def _get_bookings_recap_filters() -> dict:
+    return {
+        "venue_id": dehumanize(request.args.get("venueId", None)),
+        "event_date": _get_date_from_request_args("eventDate"),
+        "booking_period_beginning_date": _get_date_from_request_args("bookingPeriodBeginningDate"),
+        "booking_period_ending_date": _get_date_from_request_args("bookingPeriodEndingDate"),
+    }
+
+
+def _check_can_access_bookings_recap(user: User) -> None:
+    check_is_authorized_to_access_bookings_recap(user)
+
+    # FIXME: due to generalisation, the performance issue has led to DDOS many
+    # users checking the many bookings of these offerers
+    temporarily_banned_sirens = ["334473352", "434001954", "343282380"]
+    if feature_queries.is_active(FeatureToggle.DISABLE_BOOKINGS_RECAP_FOR_SOME_PROS):
+        if any(offerer.siren in temporarily_banned_sirens for offerer in user.offerers):
+            # Here we use the same process as for admins
+            raise UnauthorizedForAdminUser()
+
+
 def _create_response_to_get_booking_by_token(booking: Booking) -> dict:
     offer_name = booking.stock.offer.product.name
     date = None
@@ -4,13 +4,17 @@ from flask import jsonify
 from flask import request
 from flask_login import current_user
 from flask_login import login_required
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 
 from pcapi.core.offerers.api import create_digital_venue
 from pcapi.core.offerers.api import generate_and_save_api_key
 from pcapi.core.offerers.exceptions import ApiKeyCountMaxReached
 from pcapi.core.offerers.exceptions import ApiKeyPrefixGenerationError
 from pcapi.core.offerers.models import Offerer
+from pcapi.core.offerers.models import Venue
 from pcapi.core.offerers.repository import get_all_offerers_for_user
+from pcapi.core.offerers.repository import preload_venues_offer_counts
 from pcapi.domain.admin_emails import maybe_send_offerer_validation_email
 from pcapi.flask_app import private_api
 from pcapi.infrastructure.container import list_offerers_for_pro_user
@@ -31,7 +35,6 @@ from pcapi.utils.includes import OFFERER_INCLUDES
 from pcapi.utils.mailing import MailServiceException
 from pcapi.utils.rest import check_user_has_access_to_offerer
 from pcapi.utils.rest import expect_json_data
-from pcapi.utils.rest import load_or_404
 
 
 logger = logging.getLogger(__name__)
@@ -44,6 +47,7 @@ def get_dict_offerer(offerer: Offerer) -> dict:
 
 
 def get_dict_offerers(offerers: list[Offerer]) -> list:
+    preload_venues_offer_counts(venue for offerer in offerers for venue in offerer.managedVenues)
     return [as_dict(offerer, includes=OFFERER_INCLUDES) for offerer in offerers]
 
 
@@ -64,6 +68,19 @@ def get_offerers():
 
         only_validated_offerers = only_validated_offerers.lower() == "true"
 
+    # Counting all matching offerers is expensive for admin users, who
+    # have access to all of them: clients may opt out with `count=false`.
+    with_total = request.args.get("count", "true")
+    if with_total.lower() not in ("true", "false"):
+        errors = ApiErrors()
+        errors.add_error("count", "Le paramètre 'count' doit être 'true' ou 'false'")
+        raise errors
+    with_total = with_total.lower() == "true"
+
+    # `after` is the id of the last offerer of the previous page, to
+    # paginate without scanning (and skipping) previous pages.
+    after_id = dehumanize(request.args.get("after"))
+
     offerers_request_parameters = OfferersRequestParameters(
         user_id=current_user.id,
         user_is_admin=current_user.isAdmin,
@@ -72,13 +89,16 @@ def get_offerers():
         keywords=keywords,
         pagination_limit=request.args.get("paginate", "10"),
         page=request.args.get("page", "0"),
+        after_id=after_id,
+        with_total=with_total,
     )
 
     paginated_offerers = list_offerers_for_pro_user.execute(offerers_request_parameters=offerers_request_parameters)
 
     response = jsonify(get_dict_offerers(paginated_offerers.offerers))
-    response.headers["Total-Data-Count"] = paginated_offerers.total
-    response.headers["Access-Control-Expose-Headers"] = "Total-Data-Count"
+    if paginated_offerers.total is not None:
+        response.headers["Total-Data-Count"] = paginated_offerers.total
+        response.headers["Access-Control-Expose-Headers"] = "Total-Data-Count"
 
     return response, 200
 
@@ -105,7 +125,13 @@ def list_offerers_names(query: GetOfferersNamesQueryModel) -> GetOfferersNamesRe
 @spectree_serialize(response_model=GetOffererResponseModel)
 def get_offerer(offerer_id: str) -> GetOffererResponseModel:
     check_user_has_access_to_offerer(current_user, dehumanize(offerer_id))
-    offerer = load_or_404(Offerer, offerer_id)
+    offerer = (
+        Offerer.query.options(joinedload(Offerer.bankInformation))
+        .options(selectinload(Offerer.managedVenues).joinedload(Venue.bankInformation))
+        .filter(Offerer.id == dehumanize(offerer_id))
+        .first_or_404()
+    )
+    preload_venues_offer_counts(offerer.managedVenues)
 
     return GetOffererResponseModel.from_orm(offerer)
 
@@ -115,7 +141,13 @@ def get_offerer(offerer_id: str) -> GetOffererResponseModel:
 @spectree_serialize(response_model=GenerateOffererApiKeyResponse)
 def generate_api_key_route(offerer_id: str) -> GenerateOffererApiKeyResponse:
     check_user_has_access_to_offerer(current_user, dehumanize(offerer_id))
-    offerer = load_or_404(Offerer, offerer_id)
+    offerer = (
+        Offerer.query.options(joinedload(Offerer.bankInformation))
+        .options(selectinload(Offerer.managedVenues).joinedload(Venue.bankInformation))
+        .filter(Offerer.id == dehumanize(offerer_id))
+        .first_or_404()
+    )
+    preload_venues_offer_counts(offerer.managedVenues)
     try:
         clear_key = generate_and_save_api_key(offerer.id)
     except ApiKeyCountMaxReached:
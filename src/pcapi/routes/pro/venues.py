@@ -1,13 +1,9 @@
 from flask_login import current_user
 from flask_login import login_required
 
-from pcapi.core.bookings.repository import get_active_bookings_quantity_for_venue
-from pcapi.core.bookings.repository import get_validated_bookings_quantity_for_venue
 from pcapi.core.offerers import api as offerers_api
 from pcapi.core.offerers import repository as offerers_repository
 from pcapi.core.offerers.models import Venue
-from pcapi.core.offers.repository import get_active_offers_count_for_venue
-from pcapi.core.offers.repository import get_sold_out_offers_count_for_venue
 from pcapi.flask_app import private_api
 from pcapi.routes.serialization.venues_serialize import EditVenueBodyModel
 from pcapi.routes.serialization.venues_serialize import GetVenueListResponseModel
@@ -92,14 +88,19 @@ def get_venue_stats(humanized_venue_id: str) -> VenueStatsResponseModel:
     venue = load_or_404(Venue, humanized_venue_id)
     check_user_has_access_to_offerer(current_user, venue.managingOffererId)
 
-    active_bookings_quantity = get_active_bookings_quantity_for_venue(venue.id)
-    validated_bookings_count = get_validated_bookings_quantity_for_venue(venue.id)
-    active_offers_count = get_active_offers_count_for_venue(venue.id)
-    sold_out_offers_count = get_sold_out_offers_count_for_venue(venue.id)
+    stats = offerers_repository.get_venue_stats(venue.id)
+    if stats is None:
+        # The row is created along with the first offer of the venue.
+        return VenueStatsResponseModel(
+            activeBookingsQuantity=0,
+            validatedBookingsQuantity=0,
+            activeOffersCount=0,
+            soldOutOffersCount=0,
+        )
 
     return VenueStatsResponseModel(
-        activeBookingsQuantity=active_bookings_quantity,
-        validatedBookingsQuantity=validated_bookings_count,
-        activeOffersCount=active_offers_count,
-        soldOutOffersCount=sold_out_offers_count,
+        activeBookingsQuantity=stats.activeBookingsQuantity,
+        validatedBookingsQuantity=stats.validatedBookingsQuantity,
+        activeOffersCount=stats.activeOffersCount,
+        soldOutOffersCount=stats.soldOutOffersCount,
     )
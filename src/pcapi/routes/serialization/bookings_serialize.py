@@ -2,7 +2,9 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel
+from pydantic import conlist
 
+from pcapi.core.bookings import conf
 from pcapi.models import Booking
 from pcapi.models import EventType
 from pcapi.models import ThingType
@@ -123,3 +125,17 @@ class PostBookingResponseModel(BaseModel):
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
+
+
+class PatchBookingsUseBodyModel(BaseModel):
+    tokens: conlist(str, min_items=1, max_items=conf.MAX_TOKENS_PER_BULK_USE)  # type: ignore
+
+
+class BookingUseResultModel(BaseModel):
+    token: str
+    isUsed: bool
+    errors: Optional[dict[str, list[str]]]
+
+
+class PatchBookingsUseResponseModel(BaseModel):
+    results: list[BookingUseResultModel]
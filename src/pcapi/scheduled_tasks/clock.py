@@ -2,6 +2,7 @@
     isort:skip_file
 """
 from datetime import date
+from datetime import datetime
 from datetime import timedelta
 import logging
 
@@ -11,10 +12,15 @@ from flask import Flask
 # FIXME (xordoquy, 2021-03-01): this is to prevent circular imports when importing pcapi.core.users.api
 import pcapi.models  # pylint: disable=unused-import
 from pcapi import settings
+from pcapi.core.bookings.api import process_booking_side_effects
+from pcapi.core.bookings.api import recompute_dnBookedQuantity
 from pcapi.core.logging import install_logging
+from pcapi.core.offerers.api import refresh_venue_stats
+from pcapi.core.offerers.repository import find_venue_ids_with_stats_changes_since
 from pcapi.core.offers.repository import check_stock_consistency
 from pcapi.core.offers.repository import delete_past_draft_offers
 from pcapi.core.offers.repository import find_tomorrow_event_stock_ids
+from pcapi.core.offers.repository import update_offers_status_after_dates
 from pcapi.core.providers.repository import get_provider_by_local_class
 from pcapi.core.users import api as users_api
 from pcapi.core.users.repository import get_newly_eligible_users
@@ -22,6 +28,7 @@ from pcapi.domain.user_emails import send_newly_eligible_user_email
 from pcapi.local_providers.provider_api import provider_api_stocks
 from pcapi.local_providers.provider_manager import synchronize_venue_providers_for_provider
 from pcapi.models.beneficiary_import import BeneficiaryImportSources
+from pcapi.models.db import db
 from pcapi.models.feature import FeatureToggle
 from pcapi.repository.user_queries import find_most_recent_beneficiary_creation_date_for_source
 from pcapi.scheduled_tasks import utils
@@ -39,6 +46,10 @@ install_logging()
 
 logger = logging.getLogger(__name__)
 
+STOCK_CONSISTENCY_CHECK_WINDOW = timedelta(days=2)
+OFFERS_STATUS_UPDATE_WINDOW = timedelta(hours=1)
+VENUE_STATS_REFRESH_WINDOW = timedelta(hours=1)
+
 
 @log_cron
 @cron_context
@@ -106,6 +117,14 @@ def pc_handle_expired_bookings(app: Flask) -> None:
     handle_expired_bookings()
 
 
+@log_cron
+@cron_context
+def pc_process_booking_side_effects(app: Flask) -> None:
+    # Side effects are normally processed by a job enqueued right after
+    # each booking. This catches up with those whose job was lost.
+    process_booking_side_effects()
+
+
 @log_cron
 @cron_context
 def pc_notify_soon_to_be_expired_bookings(app: Flask) -> None:
@@ -131,9 +150,15 @@ def pc_clean_expired_tokens(app: Flask) -> None:
 @log_cron
 @cron_context
 def pc_check_stock_quantity_consistency(app: Flask) -> None:
-    inconsistent_stocks = check_stock_consistency()
+    # Only check stocks touched since the previous run. The window is
+    # larger than the period of the job, so that a missed run is caught
+    # up by the next one.
+    since = datetime.utcnow() - STOCK_CONSISTENCY_CHECK_WINDOW
+    inconsistent_stocks = check_stock_consistency(since=since)
     if inconsistent_stocks:
         logger.error("Found inconsistent stocks: %s", ", ".join([str(stock_id) for stock_id in inconsistent_stocks]))
+        recompute_dnBookedQuantity(inconsistent_stocks)
+        db.session.commit()
 
 
 @log_cron
@@ -150,6 +175,34 @@ def pc_clean_past_draft_offers(app: Flask) -> None:
     delete_past_draft_offers()
 
 
+@log_cron
+@cron_context
+def pc_update_offers_status_after_dates(app: Flask) -> None:
+    # As for the stock consistency check, the window is larger than the
+    # period of the job so that a missed run is caught up by the next one.
+    since = datetime.utcnow() - OFFERS_STATUS_UPDATE_WINDOW
+    updated = update_offers_status_after_dates(since)
+    logger.info("Updated status of %d offers after booking limit or beginning dates", updated)
+
+
+@log_cron
+@cron_context
+def pc_refresh_venue_stats(app: Flask) -> None:
+    # As for the stock consistency check, the window is larger than the
+    # period of the job so that a missed run is caught up by the next one.
+    since = datetime.utcnow() - VENUE_STATS_REFRESH_WINDOW
+    venue_ids = find_venue_ids_with_stats_changes_since(since)
+    if venue_ids:
+        refresh_venue_stats(venue_ids)
+    logger.info("Refreshed stats of %d venues", len(venue_ids))
+
+
+@log_cron
+@cron_context
+def pc_refresh_all_venue_stats(app: Flask) -> None:
+    refresh_venue_stats()
+
+
 def main() -> None:
     from pcapi.flask_app import app
 
@@ -176,6 +229,8 @@ def main() -> None:
         hour="5",
     )
 
+    scheduler.add_job(pc_process_booking_side_effects, "cron", [app], minute="*/5")
+
     scheduler.add_job(
         pc_notify_soon_to_be_expired_bookings,
         "cron",
@@ -195,6 +250,12 @@ def main() -> None:
 
     scheduler.add_job(pc_clean_past_draft_offers, "cron", [app], day="*", hour="20")
 
+    scheduler.add_job(pc_update_offers_status_after_dates, "cron", [app], minute="*/10")
+
+    scheduler.add_job(pc_refresh_venue_stats, "cron", [app], minute="*/15")
+
+    scheduler.add_job(pc_refresh_all_venue_stats, "cron", [app], day="*", hour="4")
+
     scheduler.start()
 
 
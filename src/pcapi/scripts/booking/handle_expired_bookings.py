@@ -1,16 +1,20 @@
+from collections import defaultdict
 import datetime
 from itertools import groupby
 import logging
 from operator import attrgetter
 
+from flask import current_app as app
+
 from pcapi import settings
-from pcapi.core.bookings.api import recompute_dnBookedQuantity
-from pcapi.core.bookings.models import Booking
-from pcapi.core.bookings.models import BookingCancellationReasons
+from pcapi.connectors import redis
 import pcapi.core.bookings.repository as bookings_repository
+import pcapi.core.offers.repository as offers_repository
 from pcapi.domain.user_emails import send_expired_bookings_recap_email_to_beneficiary
 from pcapi.domain.user_emails import send_expired_bookings_recap_email_to_offerer
 from pcapi.models import db
+from pcapi.models.feature import FeatureToggle
+from pcapi.repository import feature_queries
 
 
 logger = logging.getLogger(__name__)
@@ -45,49 +49,33 @@ def handle_expired_bookings() -> None:
 def cancel_expired_bookings(batch_size: int = 500) -> None:
     logger.info("[cancel_expired_bookings] Start")
 
-    expiring_bookings_count = bookings_repository.find_expiring_bookings().count()
-    logger.info("[cancel_expired_bookings] %d expiring bookings to cancel", expiring_bookings_count)
-    if expiring_bookings_count == 0:
-        logger.info("[cancel_expired_bookings] End")
-        return
-
+    synchronize_algolia = feature_queries.is_active(FeatureToggle.SYNCHRONIZE_ALGOLIA)
     updated_total = 0
-    expiring_booking_ids = bookings_repository.find_expiring_bookings_ids().limit(batch_size).all()
-    max_id = expiring_booking_ids[-1][0]
-    stocks_to_recompute = [
-        row[0]
-        for row in db.session.query(Booking.stockId).filter(Booking.id.in_(expiring_booking_ids)).distinct().all()
-    ]
-
-    # we commit here to make sure there is no unexpected objects in SQLA cache before the update,
-    # as we use synchronize_session=False
-    db.session.commit()
-
-    while expiring_booking_ids:
-        updated = (
-            Booking.query.filter(Booking.id <= max_id)
-            .filter(Booking.id.in_(expiring_booking_ids))
-            .update(
-                {"isCancelled": True, "cancellationReason": BookingCancellationReasons.EXPIRED},
-                synchronize_session=False,
-            )
-        )
+    last_id = 0
+    while True:
+        # Bookings are cancelled and their stocks updated in the same
+        # transaction, so that `dnBookedQuantity` stays consistent
+        # even if the script is interrupted.
+        cancelled_bookings = bookings_repository.cancel_expiring_bookings(after_id=last_id, batch_size=batch_size)
+        if not cancelled_bookings:
+            break
+
+        quantities_by_stock = defaultdict(int)
+        for booking_id, stock_id, quantity in cancelled_bookings:
+            quantities_by_stock[stock_id] += quantity
+            last_id = max(last_id, booking_id)
+        offer_ids = offers_repository.decrease_stocks_booked_quantity(quantities_by_stock)
         db.session.commit()
 
-        updated_total += updated
-        expiring_booking_ids = bookings_repository.find_expiring_bookings_ids().limit(batch_size).all()
-        if expiring_booking_ids:
-            max_id = expiring_booking_ids[-1][0]
+        if synchronize_algolia:
+            redis.add_offer_ids(client=app.redis_client, offer_ids=sorted(offer_ids))
+
+        updated_total += len(cancelled_bookings)
         logger.info(
             "[cancel_expired_bookings] %d Bookings have been cancelled in this batch",
-            updated,
+            len(cancelled_bookings),
         )
 
-    # Recompute denormalized stock quantity
-    if stocks_to_recompute:
-        recompute_dnBookedQuantity(stocks_to_recompute)
-        db.session.commit()
-
     logger.info(
         "[cancel_expired_bookings] %d Bookings have been cancelled",
         updated_total,
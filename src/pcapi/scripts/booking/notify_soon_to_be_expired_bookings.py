@@ -1,11 +1,9 @@
 import datetime
-from itertools import groupby
 import logging
-from operator import attrgetter
 
 from pcapi import settings
 import pcapi.core.bookings.repository as bookings_repository
-from pcapi.domain.user_emails import send_soon_to_be_expired_bookings_recap_email_to_beneficiary
+from pcapi.domain.user_emails import send_soon_to_be_expired_bookings_recap_emails
 
 
 logger = logging.getLogger(__name__)
@@ -20,24 +18,28 @@ def notify_soon_to_be_expired_bookings() -> None:
     logger.info("[notify_soon_to_be_expired_bookings] End")
 
 
-def notify_users_of_soon_to_be_expired_bookings(given_date: datetime.date = None) -> None:
+def notify_users_of_soon_to_be_expired_bookings(given_date: datetime.date = None, batch_size: int = 1000) -> None:
     logger.info("[notify_users_of_soon_to_be_expired_bookings] Start")
-    bookings_ordered_by_user = bookings_repository.find_soon_to_be_expiring_booking_ordered_by_user(given_date)
 
-    expired_bookings_grouped_by_user = dict()
-    for user, booking in groupby(bookings_ordered_by_user, attrgetter("user")):
-        expired_bookings_grouped_by_user[user] = list(booking)
-
-    notified_users = []
-
-    for user, bookings in expired_bookings_grouped_by_user.items():
-        send_soon_to_be_expired_bookings_recap_email_to_beneficiary(user, bookings)
-        notified_users.append(user)
+    notified_users_count = 0
+    last_user_id = 0
+    while True:
+        users_bookings = bookings_repository.find_soon_to_be_expiring_bookings_grouped_by_user(
+            given_date, after_user_id=last_user_id, batch_size=batch_size
+        )
+        if not users_bookings:
+            break
+
+        send_soon_to_be_expired_bookings_recap_emails(users_bookings)
+        user_ids = [user_bookings.id for user_bookings in users_bookings]
+        logger.info(
+            "[notify_users_of_soon_to_be_expired_bookings] %d Users have been notified: %s",
+            len(user_ids),
+            user_ids,
+        )
+        notified_users_count += len(user_ids)
+        last_user_id = user_ids[-1]
 
     logger.info(
-        "[notify_users_of_soon_to_be_expired_bookings] %d Users have been notified: %s",
-        len(notified_users),
-        notified_users,
+        "[notify_users_of_soon_to_be_expired_bookings] End: %d Users have been notified", notified_users_count
     )
-
-    logger.info("[notify_users_of_soon_to_be_expired_bookings] End")
@@ -1,27 +1,34 @@
 from datetime import datetime
+import logging
 
 import pcapi.core.bookings.repository as booking_repository
+from pcapi.models import db
 from pcapi.models.feature import FeatureToggle
 from pcapi.repository import feature_queries
-from pcapi.repository import repository
 
 
-def update_booking_used_after_stock_occurrence():
+logger = logging.getLogger(__name__)
+
+
+def update_booking_used_after_stock_occurrence(batch_size: int = 1000) -> None:
     if not feature_queries.is_active(FeatureToggle.UPDATE_BOOKING_USED):
         raise ValueError("This function is behind a deactivated feature flag.")
 
-    bookings_to_process = booking_repository.find_not_used_and_not_cancelled()
-    bookings_id_errors = []
-
-    for booking in bookings_to_process:
-        if booking.stock.beginningDatetime:
-            now = datetime.utcnow()
-            if not booking.stock.isEventDeletable:
-                booking.isUsed = True
-                booking.dateUsed = now
-                try:
-                    repository.save(booking)
-                except Exception:  # pylint: disable=broad-except
-                    bookings_id_errors.append(booking.id)
-
-    print("Bookings id in error %s" % bookings_id_errors)
+    now = datetime.utcnow()
+    updated_total = 0
+    last_id = 0
+    while True:
+        booking_ids = booking_repository.mark_as_used_bookings_of_past_events(
+            after_id=last_id, batch_size=batch_size, date_used=now
+        )
+        if not booking_ids:
+            break
+        db.session.commit()
+
+        # Payments are generated from `dateUsed`, log ids to be able to
+        # trace which bookings have been marked as used automatically.
+        logger.info("Automatically marked bookings as used after event", extra={"bookings": booking_ids})
+        updated_total += len(booking_ids)
+        last_id = max(booking_ids)
+
+    logger.info("Automatically marked %d bookings as used after event", updated_total)
@@ -105,6 +105,9 @@ def spectree_serialize(  # pylint: disable=dangerous-default-value
                 kwargs["form"] = form_in_kwargs(**form)
 
             result = route(*args, **kwargs)
+            if isinstance(result, Response):
+                # e.g. a "304 Not Modified" response to a conditional request
+                return result
             return _make_json_response(
                 content=result, status_code=on_success_status, by_alias=response_by_alias, exclude_none=exclude_none
             )
@@ -165,6 +165,7 @@ MAILJET_API_SECRET = os.environ.get("MAILJET_API_SECRET", "")
 MAILJET_TEMPLATE_DEBUGGING = os.environ.get("MAILJET_TEMPLATE_DEBUGGING", not IS_PROD)
 MAILJET_NOT_YET_ELIGIBLE_LIST_ID = os.environ.get("MAILJET_NOT_YET_ELIGIBLE_LIST_ID")
 MAILJET_HTTP_TIMEOUT = int(os.environ.get("MAILJET_HTTP_TIMEOUT", 5))
+MAILJET_BULK_CONCURRENCY = int(os.environ.get("MAILJET_BULK_CONCURRENCY", 4))
 
 
 # JWT
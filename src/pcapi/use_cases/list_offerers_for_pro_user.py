@@ -14,6 +14,8 @@ class OfferersRequestParameters:
         pagination_limit: str = "10",
         keywords: Optional[str] = None,
         page: str = "0",
+        after_id: Optional[int] = None,
+        with_total: bool = True,
     ):
         self.only_validated_offerers = only_validated_offerers
         self.is_filtered_by_offerer_status = is_filtered_by_offerer_status
@@ -22,6 +24,8 @@ class OfferersRequestParameters:
         self.pagination_limit = int(pagination_limit)
         self.keywords = keywords
         self.page = int(page)
+        self.after_id = after_id
+        self.with_total = with_total
 
 
 class ListOfferersForProUser:
@@ -37,4 +41,6 @@ class ListOfferersForProUser:
             only_validated_offerers=offerers_request_parameters.only_validated_offerers,
             is_filtered_by_offerer_status=offerers_request_parameters.is_filtered_by_offerer_status,
             keywords=offerers_request_parameters.keywords,
+            after_id=offerers_request_parameters.after_id,
+            with_total=offerers_request_parameters.with_total,
         )
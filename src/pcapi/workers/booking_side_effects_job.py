@@ -0,0 +1,16 @@
+from rq.decorators import job
+
+from pcapi.workers import worker
+from pcapi.workers.decorators import job_context
+from pcapi.workers.decorators import log_job
+
+
+@job(worker.default_queue, connection=worker.conn)
+@job_context
+@log_job
+def process_booking_side_effects_job() -> None:
+    # Imported here to avoid a circular import, since the bookings API
+    # enqueues this job.
+    from pcapi.core.bookings.api import process_booking_side_effects
+
+    process_booking_side_effects()
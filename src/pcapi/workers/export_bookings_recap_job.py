@@ -0,0 +1,30 @@
+import logging
+
+from rq.decorators import job
+
+import pcapi.core.bookings.api as bookings_api
+from pcapi.core.users.models import User
+from pcapi.domain.user_emails import send_bookings_recap_export_email
+from pcapi.utils.mailing import MailServiceException
+from pcapi.workers import worker
+from pcapi.workers.decorators import job_context
+from pcapi.workers.decorators import log_job
+
+
+logger = logging.getLogger(__name__)
+
+
+@job(worker.low_queue, connection=worker.conn)
+@job_context
+@log_job
+def export_bookings_recap_job(user_id: int, filters: dict) -> None:
+    user = User.query.get(user_id)
+    if not user:
+        logger.error("No user with id=%s found to export bookings recap", user_id)
+        return
+
+    download_url = bookings_api.export_bookings_recap(user.id, **filters)
+    try:
+        send_bookings_recap_export_email(user, download_url)
+    except MailServiceException as error:
+        logger.exception("Could not send bookings recap export email to user=%s: %s", user.id, error)
@@ -11,6 +11,7 @@ import pcapi.core.offers.factories as offers_factories
 from pcapi.core.offers.factories import VenueFactory
 from pcapi.core.offers.models import OfferValidationConfig
 from pcapi.core.offers.models import OfferValidationStatus
+from pcapi.core.offers.offer_validation import CompiledOfferValidationConfig
 from pcapi.core.testing import override_settings
 import pcapi.core.users.factories as users_factories
 from pcapi.models import Offer
@@ -460,6 +461,33 @@ class GetOfferValidationViewTest:
         assert response.status_code == 200
         assert mocked_get_offerer_legal_category.call_count == 1
 
+    @clean_database
+    @patch.object(CompiledOfferValidationConfig, "compute_score")
+    def test_offer_validation_list_scores_offers_in_batch(self, mocked_compute_score, app):
+        config_yaml = """
+                    minimum_score: 0.6
+                    rules:
+                       - name: "check venue name"
+                         factor: 0.5
+                         conditions:
+                           - model: "Venue"
+                             attribute: "name"
+                             condition:
+                                operator: "contains"
+                                comparated:
+                                  - "fraud"
+                    """
+        import_offer_validation_config(config_yaml)
+        users_factories.UserFactory(email="admin@example.com", isAdmin=True)
+        offers_factories.OfferFactory(validation=OfferValidationStatus.PENDING, venue__name="Fraud & co")
+        offers_factories.OfferFactory(validation=OfferValidationStatus.PENDING, venue__name="Librairie")
+        client = TestClient(app.test_client()).with_auth("admin@example.com")
+
+        response = client.get("/pc/back-office/validation/")
+
+        assert response.status_code == 200
+        mocked_compute_score.assert_not_called()
+
 
 class OfferViewTest:
     @clean_database
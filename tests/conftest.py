@@ -19,6 +19,7 @@ from pcapi import settings
 from pcapi.admin.install import install_admin_views
 import pcapi.core.mails.testing as mails_testing
 import pcapi.core.object_storage.testing as object_storage_testing
+from pcapi.core.offers.offer_validation import invalidate_compiled_offer_validation_config
 import pcapi.core.testing
 from pcapi.flask_app import admin
 from pcapi.install_database_extensions import install_database_extensions
@@ -100,6 +101,16 @@ def clear_outboxes():
         sms_notifications_testing.reset_requests()
 
 
+@pytest.fixture(autouse=True)
+def clear_offer_validation_config_cache():
+    # The configuration saved by a test is rolled back with the test
+    # data, but its compiled version would outlive it.
+    try:
+        yield
+    finally:
+        invalidate_compiled_offer_validation_config()
+
+
 @pytest.fixture()
 def clear_tests_assets_bucket():
     try:
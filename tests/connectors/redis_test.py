@@ -5,6 +5,7 @@ import redis
 
 from pcapi import settings
 from pcapi.connectors.redis import add_offer_id
+from pcapi.connectors.redis import add_offer_ids
 from pcapi.connectors.redis import add_offer_ids_in_error
 from pcapi.connectors.redis import add_to_indexed_offers
 from pcapi.connectors.redis import add_venue_id
@@ -45,6 +46,19 @@ class AddOfferIdTest:
         client.rpush.assert_called_once_with("offer_ids", 1)
 
 
+class AddOfferIdsTest:
+    def test_should_add_offer_ids(self):
+        # Given
+        client = MagicMock()
+        client.rpush = MagicMock()
+
+        # When
+        add_offer_ids(client=client, offer_ids=[1, 2])
+
+        # Then
+        client.rpush.assert_called_once_with("offer_ids", 1, 2)
+
+
 class AddVenueIdTest:
     def test_should_add_venue_id_when_algolia_feature_is_enabled(self):
         # Given
@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
+import os
+import threading
+import time
 from unittest import mock
 
 from freezegun import freeze_time
@@ -21,6 +25,7 @@ import pcapi.core.payments.factories as payments_factories
 from pcapi.core.testing import assert_num_queries
 from pcapi.core.testing import override_features
 import pcapi.core.users.factories as users_factories
+from pcapi.core.users.models import User
 from pcapi.models import api_errors
 from pcapi.models.db import db
 import pcapi.notifications.push.testing as push_testing
@@ -48,6 +53,96 @@ class BookOfferConcurrencyTest:
         assert models.Booking.query.count() == 0
         assert offers_models.Stock.query.filter_by(id=stock.id, dnBookedQuantity=5).count() == 1
 
+    @clean_database
+    def test_create_bookings_concurrently_on_hot_stock(self, app):
+        stock = offers_factories.StockFactory(price=10, quantity=5, dnBookedQuantity=0)
+        stock_id = stock.id
+        user_ids = [user.id for user in users_factories.UserFactory.create_batch(10)]
+        results = []
+
+        def book(user_id):
+            with app.app_context():
+                user = User.query.get(user_id)
+                try:
+                    api.book_offer(beneficiary=user, stock_id=stock_id, quantity=1)
+                    results.append("booked")
+                except exceptions.StockIsNotBookable:
+                    results.append("not bookable")
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=book, args=(user_id,)) for user_id in user_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results) == ["booked"] * 5 + ["not bookable"] * 5
+        assert models.Booking.query.count() == 5
+        assert offers_models.Stock.query.get(stock_id).dnBookedQuantity == 5
+
+    @pytest.mark.skipif(
+        not os.environ.get("RUN_BOOKING_BENCHMARK"), reason="Benchmark, set RUN_BOOKING_BENCHMARK=1 to run it"
+    )
+    @clean_database
+    def test_benchmark_concurrent_bookings_on_hot_stock(self, app, capsys):
+        bookings_count = int(os.environ.get("BOOKING_BENCHMARK_SIZE", 200))
+        concurrency = int(os.environ.get("BOOKING_BENCHMARK_CONCURRENCY", 10))
+        stock_id = offers_factories.StockFactory(price=1, quantity=bookings_count, dnBookedQuantity=0).id
+        user_ids = [user.id for user in users_factories.UserFactory.create_batch(bookings_count)]
+
+        def book(user_id):
+            with app.app_context():
+                try:
+                    api.book_offer(beneficiary=User.query.get(user_id), stock_id=stock_id, quantity=1)
+                finally:
+                    db.session.remove()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(book, user_ids))
+        elapsed = time.perf_counter() - start
+
+        with capsys.disabled():
+            print(
+                f"\n{bookings_count} bookings on one stock with {concurrency} threads: "
+                f"{elapsed:.2f}s, {bookings_count / elapsed:.1f} bookings/s"
+            )
+        assert models.Booking.query.count() == bookings_count
+        assert offers_models.Stock.query.get(stock_id).dnBookedQuantity == bookings_count
+
+    @clean_database
+    def test_create_bookings_concurrently_for_same_beneficiary(self, app):
+        user_id = users_factories.UserFactory().id
+        stock = offers_factories.StockFactory(price=10, quantity=10)
+        stock_id = stock.id
+        expensive_stock_ids = [stock.id for stock in offers_factories.StockFactory.create_batch(4, price=200)]
+        results = []
+
+        def book(stock_id):
+            with app.app_context():
+                user = User.query.get(user_id)
+                try:
+                    api.book_offer(beneficiary=user, stock_id=stock_id, quantity=1)
+                    results.append("booked")
+                except (exceptions.OfferIsAlreadyBooked, exceptions.UserHasInsufficientFunds) as error:
+                    results.append(error.__class__.__name__)
+                finally:
+                    db.session.remove()
+
+        # The same offer 3 times, and 4 offers of which only 2 fit in the
+        # remaining credit.
+        stock_ids = [stock_id] * 3 + expensive_stock_ids
+        threads = [threading.Thread(target=book, args=(stock_id,)) for stock_id in stock_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results) == ["OfferIsAlreadyBooked"] * 2 + ["UserHasInsufficientFunds"] * 2 + ["booked"] * 3
+        assert models.Booking.query.filter_by(stockId=stock_id).count() == 1
+        assert models.Booking.query.count() == 3
+
     @clean_database
     def test_cancel_booking(self, app):
         booking = factories.BookingFactory(stock__dnBookedQuantity=1)
@@ -105,8 +200,8 @@ class BookOfferConcurrencyTest:
 
 @pytest.mark.usefixtures("db_session")
 class BookOfferTest:
-    @mock.patch("pcapi.connectors.redis.add_offer_id")
-    def test_create_booking(self, mocked_add_offer_id, app):
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_create_booking(self, mocked_add_offer_ids, app):
         user = users_factories.UserFactory()
         stock = offers_factories.StockFactory(price=10, dnBookedQuantity=5, offer__bookingEmail="offerer@example.com")
 
@@ -116,15 +211,16 @@ class BookOfferTest:
         # updated attributes
         assert len(push_testing.requests) == 1
 
-        data = push_testing.requests[0]
-        assert data["attribute_values"]["u.credit"] == 49_000  # values in cents
-        assert data["attribute_values"]["ut.booking_categories"] == [stock.offer.type]
+        data = push_testing.requests[0][0]
+        assert data.user_id == str(user.id)
+        assert data.attributes["u.credit"] == 49_000  # values in cents
+        assert data.attributes["ut.booking_categories"] == [stock.offer.type]
 
         expected_date = booking.dateCreated.strftime(BATCH_DATETIME_FORMAT)
-        assert data["attribute_values"]["date(u.last_booking_date)"] == expected_date
+        assert data.attributes["date(u.last_booking_date)"] == expected_date
 
         expected_date = booking.dateCreated.strftime(BATCH_DATETIME_FORMAT)
-        assert data["attribute_values"]["date(u.last_booking_date)"] == expected_date
+        assert data.attributes["date(u.last_booking_date)"] == expected_date
 
         assert booking.quantity == 1
         assert booking.amount == 10
@@ -135,7 +231,7 @@ class BookOfferTest:
         assert booking.confirmationDate is None
         assert stock.dnBookedQuantity == 6
 
-        mocked_add_offer_id.assert_called_once_with(client=app.redis_client, offer_id=stock.offer.id)
+        mocked_add_offer_ids.assert_called_once_with(client=app.redis_client, offer_ids=[stock.offer.id])
 
         assert len(mails_testing.outbox) == 2
         email_data1 = mails_testing.outbox[0].sent_data
@@ -161,12 +257,12 @@ class BookOfferTest:
         # updated attributes
         assert len(push_testing.requests) == 1
 
-        data = push_testing.requests[0]
+        data = push_testing.requests[0][0]
         expected_date = booking.dateCreated.strftime(BATCH_DATETIME_FORMAT)
-        assert data["attribute_values"]["date(u.last_booking_date)"] == expected_date
+        assert data.attributes["date(u.last_booking_date)"] == expected_date
 
         expected_categories = ["ThingType.AUDIOVISUEL", "ThingType.CINEMA_ABO"]
-        assert sorted(data["attribute_values"]["ut.booking_categories"]) == expected_categories
+        assert sorted(data.attributes["ut.booking_categories"]) == expected_categories
 
     @override_features(AUTO_ACTIVATE_DIGITAL_BOOKINGS=True, ENABLE_ACTIVATION_CODES=True)
     def test_booking_on_digital_offer_with_activation_stock(self):
@@ -199,11 +295,11 @@ class BookOfferTest:
         # updated attributes
         assert len(push_testing.requests) == 1
 
-        data = push_testing.requests[0]
-        assert data["attribute_values"]["u.credit"] == 49_000  # values in cents
+        data = push_testing.requests[0][0]
+        assert data.attributes["u.credit"] == 49_000  # values in cents
 
         expected_date = booking.dateCreated.strftime(BATCH_DATETIME_FORMAT)
-        assert data["attribute_values"]["date(u.last_booking_date)"] == expected_date
+        assert data.attributes["date(u.last_booking_date)"] == expected_date
 
         two_days_after_booking = booking.dateCreated + timedelta(days=2)
         assert booking.quantity == 1
@@ -216,13 +312,39 @@ class BookOfferTest:
         assert booking.confirmationDate == two_days_after_booking
 
     @override_features(SYNCHRONIZE_ALGOLIA=False)
-    @mock.patch("pcapi.connectors.redis.add_offer_id")
-    def test_do_not_sync_algolia_if_feature_is_disabled(self, mocked_add_offer_id):
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_do_not_sync_algolia_if_feature_is_disabled(self, mocked_add_offer_ids):
         user = users_factories.UserFactory()
         stock = offers_factories.StockFactory()
 
         api.book_offer(beneficiary=user, stock_id=stock.id, quantity=1)
-        mocked_add_offer_id.assert_not_called()
+        mocked_add_offer_ids.assert_not_called()
+
+    @mock.patch("pcapi.core.bookings.api.random_token")
+    def test_retry_with_another_token_on_collision(self, mocked_random_token):
+        factories.BookingFactory(token="AAAAAA")
+        mocked_random_token.side_effect = ["AAAAAA", "BBBBBB"]
+        user = users_factories.UserFactory()
+        stock = offers_factories.StockFactory(dnBookedQuantity=5)
+
+        booking = api.book_offer(beneficiary=user, stock_id=stock.id, quantity=1)
+
+        assert booking.token == "BBBBBB"
+        assert stock.dnBookedQuantity == 6
+        assert models.Booking.query.count() == 2
+
+    @mock.patch("pcapi.core.bookings.api.random_token", return_value="AAAAAA")
+    def test_raise_if_no_free_token_is_found(self, mocked_random_token):
+        factories.BookingFactory(token="AAAAAA")
+        user = users_factories.UserFactory()
+        stock = offers_factories.StockFactory(dnBookedQuantity=5)
+
+        with pytest.raises(api_errors.ApiErrors):
+            api.book_offer(beneficiary=user, stock_id=stock.id, quantity=1)
+
+        assert mocked_random_token.call_count == api.BOOKING_TOKEN_MAX_ATTEMPTS
+        assert models.Booking.query.count() == 1
+        assert offers_models.Stock.query.get(stock.id).dnBookedQuantity == 5
 
     def test_raise_if_is_admin(self):
         user = users_factories.UserFactory(isAdmin=True)
@@ -247,6 +369,19 @@ class BookOfferTest:
                 quantity=1,
             )
 
+    @mock.patch("pcapi.core.bookings.validation.check_stock_is_bookable")
+    def test_raise_if_stock_was_booked_since_checks(self, _mocked_check_stock_is_bookable):
+        # The pre-check is bypassed to simulate a concurrent booking
+        # that took the last place after the checks were done.
+        stock = offers_factories.StockFactory(quantity=1, dnBookedQuantity=1)
+        user = users_factories.UserFactory()
+
+        with pytest.raises(exceptions.StockIsNotBookable):
+            api.book_offer(beneficiary=user, stock_id=stock.id, quantity=1)
+
+        assert models.Booking.query.count() == 0
+        assert offers_models.Stock.query.get(stock.id).dnBookedQuantity == 1
+
     def test_raise_if_user_has_already_booked(self):
         booking = factories.BookingFactory()
         with pytest.raises(exceptions.OfferIsAlreadyBooked):
@@ -349,15 +484,15 @@ class CancelByBeneficiaryTest:
         # 2: select user
         # 3: select stock for update
         # 4: refresh booking
-        # 5->7: update stock ; update booking ; release savepoint
-        # 8->14: (TODO: optimize): select booking ; user ; deposit ; user.bookings ; feature.SYNCHRONIZE_ALGOLIA, stock, offer
-        # 15-16: insert email ; release savepoint
-        # 17->20: (TODO: optimize) select booking ; stock ; offer ; user
-        # 21: select bookings of same stock with users joinedloaded to avoid N+1 requests
-        # 22-23: select venue ; offerer
-        # 24-25: insert email ; release savepoint
-        with assert_num_queries(25):
-            api.cancel_booking_by_beneficiary(booking.user, booking)
+        # 5->8: insert side effect ; update stock ; update booking ; release savepoint
+        # 9: select booking (for logging)
+        with mock.patch("pcapi.core.bookings.api.process_booking_side_effects_job"):
+            with assert_num_queries(9):
+                api.cancel_booking_by_beneficiary(booking.user, booking)
+        assert models.BookingSideEffect.query.one().type == models.BookingSideEffectType.CANCELLED_BY_BENEFICIARY
+
+        api.process_booking_side_effects()
+        assert models.BookingSideEffect.query.count() == 0
 
         # cancellation can trigger more than one request to Batch
         assert len(push_testing.requests) >= 1
@@ -391,11 +526,11 @@ class CancelByBeneficiaryTest:
         assert booking.stock.dnBookedQuantity == (initial_quantity - 1)
 
     @override_features(SYNCHRONIZE_ALGOLIA=False)
-    @mock.patch("pcapi.connectors.redis.add_offer_id")
-    def test_do_not_sync_algolia_if_feature_is_disabled(self, mocked_add_offer_id):
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_do_not_sync_algolia_if_feature_is_disabled(self, mocked_add_offer_ids):
         booking = factories.BookingFactory()
         api.cancel_booking_by_beneficiary(booking.user, booking)
-        mocked_add_offer_id.assert_not_called()
+        mocked_add_offer_ids.assert_not_called()
 
     def test_raise_if_booking_is_already_used(self):
         booking = factories.BookingFactory(isUsed=True)
@@ -546,6 +681,105 @@ class CancelForFraudTest:
         assert booking.cancellationReason == BookingCancellationReasons.FRAUD
 
 
+@pytest.mark.usefixtures("db_session")
+class ProcessBookingSideEffectsTest:
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_process_side_effects(self, mocked_add_offer_ids, app):
+        stock = offers_factories.StockFactory(offer__bookingEmail="offerer@example.com")
+        booked = factories.BookingFactory(stock=stock)
+        cancelled = factories.BookingFactory(
+            isCancelled=True, cancellationReason=BookingCancellationReasons.OFFERER, user=booked.user
+        )
+        db.session.add(models.BookingSideEffect(booking=booked, type=models.BookingSideEffectType.BOOKED))
+        db.session.add(models.BookingSideEffect(booking=cancelled, type=models.BookingSideEffectType.CANCELLED))
+        db.session.commit()
+
+        api.process_booking_side_effects()
+
+        assert models.BookingSideEffect.query.count() == 0
+        mocked_add_offer_ids.assert_called_once_with(
+            client=app.redis_client, offer_ids=sorted([stock.offerId, cancelled.stock.offerId])
+        )
+        assert len(mails_testing.outbox) == 2  # booking confirmation to offerer and beneficiary
+        assert len(push_testing.requests) == 1
+        [data] = push_testing.requests[0]
+        assert data.user_id == str(booked.userId)
+        assert "u.is_beneficiary" in data.attributes
+        assert "date(u.last_booking_date)" in data.attributes
+
+    @mock.patch("pcapi.core.bookings.api._send_booking_confirmation_emails")
+    def test_failing_side_effect_does_not_abort_batch(self, mocked_send_emails):
+        failing = factories.BookingFactory()
+        booked = factories.BookingFactory()
+        db.session.add(models.BookingSideEffect(booking=failing, type=models.BookingSideEffectType.BOOKED))
+        db.session.add(models.BookingSideEffect(booking=booked, type=models.BookingSideEffectType.BOOKED))
+        db.session.commit()
+
+        def send_emails(booking):
+            if booking.id == failing.id:
+                raise ValueError("Mailjet is down")
+
+        mocked_send_emails.side_effect = send_emails
+
+        api.process_booking_side_effects()
+        # The failed side effect is only retried after a delay.
+        api.process_booking_side_effects()
+
+        assert mocked_send_emails.call_count == 2
+        side_effect = models.BookingSideEffect.query.one()
+        assert side_effect.bookingId == failing.id
+        assert side_effect.attempts == 1
+        assert "Mailjet is down" in side_effect.lastError
+
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    @mock.patch("pcapi.core.bookings.api._send_booking_confirmation_emails")
+    def test_all_side_effects_failing(self, mocked_send_emails, mocked_add_offer_ids):
+        booking = factories.BookingFactory()
+        db.session.add(models.BookingSideEffect(booking=booking, type=models.BookingSideEffectType.BOOKED))
+        db.session.commit()
+        mocked_send_emails.side_effect = ValueError("Mailjet is down")
+
+        api.process_booking_side_effects()
+
+        mocked_add_offer_ids.assert_not_called()
+        assert push_testing.requests == []
+        assert models.BookingSideEffect.query.one().attempts == 1
+
+    @mock.patch("pcapi.core.bookings.api._send_booking_confirmation_emails")
+    def test_retry_failed_side_effect_after_delay(self, mocked_send_emails):
+        booking = factories.BookingFactory()
+        db.session.add(
+            models.BookingSideEffect(
+                booking=booking,
+                type=models.BookingSideEffectType.BOOKED,
+                attempts=1,
+                dateLastAttempt=datetime.utcnow() - api.BOOKING_SIDE_EFFECT_RETRY_DELAY,
+                lastError="ValueError('Mailjet is down')",
+            )
+        )
+        db.session.add(
+            models.BookingSideEffect(
+                booking=booking,
+                type=models.BookingSideEffectType.BOOKED,
+                attempts=api.BOOKING_SIDE_EFFECT_MAX_ATTEMPTS,
+                dateLastAttempt=datetime.utcnow() - api.BOOKING_SIDE_EFFECT_RETRY_DELAY,
+            )
+        )
+        db.session.commit()
+
+        api.process_booking_side_effects()
+
+        mocked_send_emails.assert_called_once()
+        side_effect = models.BookingSideEffect.query.one()  # given up
+        assert side_effect.attempts == api.BOOKING_SIDE_EFFECT_MAX_ATTEMPTS
+
+    def test_no_side_effect(self):
+        api.process_booking_side_effects()
+
+        assert mails_testing.outbox == []
+        assert push_testing.requests == []
+
+
 @pytest.mark.usefixtures("db_session")
 class MarkAsUsedTest:
     def test_mark_as_used(self):
@@ -589,6 +823,35 @@ class MarkAsUsedTest:
         assert not booking.isUsed
 
 
+@pytest.mark.usefixtures("db_session")
+class MarkManyAsUsedTest:
+    def test_mark_many_as_used(self):
+        booking1 = factories.BookingFactory()
+        booking2 = factories.BookingFactory()
+
+        errors = api.mark_many_as_used([booking1, booking2])
+
+        assert errors == {}
+        assert booking1.isUsed
+        assert booking1.dateUsed is not None
+        assert booking2.isUsed
+
+    def test_return_errors_of_unusable_bookings(self):
+        usable = factories.BookingFactory()
+        cancelled = factories.BookingFactory(isCancelled=True)
+        reimbursed = factories.BookingFactory(isUsed=True)
+        payments_factories.PaymentFactory(booking=reimbursed)
+
+        errors = api.mark_many_as_used([usable, cancelled, reimbursed])
+
+        assert errors == {
+            cancelled.token: {"booking": ["Cette réservation a été annulée"]},
+            reimbursed.token: {"payment": ["Cette réservation a été remboursée"]},
+        }
+        assert usable.isUsed
+        assert not cancelled.isUsed
+
+
 @pytest.mark.usefixtures("db_session")
 class MarkAsUnusedTest:
     def test_mark_as_unused(self):
@@ -633,6 +896,9 @@ class MarkAsUnusedTest:
         assert booking.isUsed
 
 
+@pytest.mark.usefixtures("app")
+@mock.patch("pcapi.connectors.redis.get_booking_qr_code", lambda client, token: None)
+@mock.patch("pcapi.connectors.redis.set_booking_qr_code", lambda client, token, qr_code: None)
 class GenerateQrCodeTest:
     @mock.patch("qrcode.QRCode")
     def test_correct_technical_parameters(self, build_qr_code):
@@ -676,6 +942,16 @@ class GenerateQrCodeTest:
         )
 
 
+class CachedQrCodeTest:
+    @mock.patch("pcapi.core.bookings.api._render_qr_code", return_value="data:image/png;base64,qr")
+    def test_qr_code_is_rendered_once(self, mocked_render_qr_code, app):
+        token = random_token()
+
+        assert api.generate_qr_code(token) == "data:image/png;base64,qr"
+        assert api.generate_qr_code(token) == "data:image/png;base64,qr"
+        mocked_render_qr_code.assert_called_once_with(token)
+
+
 @pytest.mark.parametrize(
     "booking_date",
     [datetime(2020, 7, 14, 15, 30), datetime(2020, 10, 25, 1, 45), datetime.now()],
@@ -754,3 +1030,45 @@ class UpdateConfirmationDatesTest:
         # Then
         assert updated_bookings == [recent_booking, old_booking]
         assert recent_booking.confirmationDate == old_booking.confirmationDate == datetime(2020, 11, 19, 15)
+
+
+@pytest.mark.usefixtures("db_session")
+class ExportBookingsRecapTest:
+    @mock.patch("pcapi.core.users.utils.generate_signed_url", return_value="https://example.com/signed")
+    @mock.patch("pcapi.core.users.utils.store_file_object")
+    def test_export_all_bookings_of_pro_user(self, mocked_store_file_object, mocked_generate_signed_url):
+        uploaded_content = []
+        mocked_store_file_object.side_effect = lambda **kwargs: uploaded_content.append(kwargs["file"].read())
+        user_offerer = offers_factories.UserOffererFactory()
+        venue = offers_factories.VenueFactory(managingOfferer=user_offerer.offerer, name="Le lieu")
+        factories.BookingFactory(
+            stock__offer__venue=venue,
+            stock__offer__name="Le livre",
+            stock__price=10,
+            token="ABCDEF",
+            user__email="beneficiary@example.com",
+            quantity=2,
+            isUsed=True,
+            dateUsed=datetime(2020, 5, 3, 12, 0, 0),
+        )
+        factories.BookingFactory(stock__offer__name="Une autre offre")
+
+        url = api.export_bookings_recap(user_offerer.user.id)
+
+        mocked_store_file_object.assert_called_once()
+        kwargs = mocked_store_file_object.call_args[1]
+        assert kwargs["bucket"] == "exports"
+        assert kwargs["content_type"] == "text/csv"
+        mocked_generate_signed_url.assert_called_once_with(
+            f"exports/{kwargs['object_id']}", expiration=api.BOOKINGS_RECAP_EXPORT_URL_EXPIRATION
+        )
+        assert url == "https://example.com/signed"
+        assert uploaded_content[0].startswith(b"\xef\xbb\xbf")  # BOM, for Excel
+        lines = uploaded_content[0].decode("utf-8-sig").splitlines()
+        assert len(lines) == 3  # header and one line per duo place
+        assert lines[0].startswith('"Lieu";"Nom de l’offre"')
+        assert '"Le lieu";"Le livre"' in lines[1]
+        assert '"beneficiary@example.com"' in lines[1]
+        assert '"ABCDEF"' in lines[1]
+        assert '"validé"' in lines[1]
+        assert "Une autre offre" not in lines[2]
@@ -350,21 +350,6 @@ class SaveBookingTest:
         assert api_errors.value.errors["global"] == ["La quantité disponible pour cette offre est atteinte."]
 
 
-class FindAllNotUsedAndNotCancelledTest:
-    @pytest.mark.usefixtures("db_session")
-    def test_find_not_used_and_not_cancelled(self):
-        # Given
-        booking = bookings_factories.BookingFactory()
-        bookings_factories.BookingFactory(isCancelled=True)
-        bookings_factories.BookingFactory(isUsed=True)
-
-        # When
-        bookings = booking_repository.find_not_used_and_not_cancelled()
-
-        # Then
-        assert bookings == [booking]
-
-
 class FindByTokenTest:
     @pytest.mark.usefixtures("db_session")
     def test_should_return_a_booking_when_valid_token_is_given(self, app: fixture):
@@ -837,6 +822,25 @@ class FindByProUserIdTest:
         expected_booking_recap = bookings_recap_paginated.bookings_recap[0]
         assert expected_booking_recap.booking_date == booking_date.astimezone(tz.gettz("America/Cayenne"))
 
+    @pytest.mark.usefixtures("db_session")
+    def test_should_return_event_beginning_datetime_with_offerer_timezone_when_venue_is_digital(self, app: fixture):
+        # Given
+        user_offerer = offers_factories.UserOffererFactory(offerer__postalCode="97300")
+        venue = offers_factories.VirtualVenueFactory(managingOfferer=user_offerer.offerer)
+        beginning_datetime = datetime(2020, 3, 1, 20, 0, 0)
+        stock = offers_factories.EventStockFactory(offer__venue=venue, beginningDatetime=beginning_datetime)
+        bookings_factories.BookingFactory(stock=stock, dateCreated=datetime(2020, 1, 1, 10, 0, 0))
+
+        # When
+        bookings_recap_paginated = find_by_pro_user_id(user_id=user_offerer.user.id)
+
+        # Then
+        expected_booking_recap = bookings_recap_paginated.bookings_recap[0]
+        assert isinstance(expected_booking_recap, EventBookingRecap)
+        assert expected_booking_recap.event_beginning_datetime == beginning_datetime.astimezone(
+            tz.gettz("America/Cayenne")
+        )
+
     @pytest.mark.usefixtures("db_session")
     def test_should_return_booking_isbn_when_information_is_available(self, app: fixture):
         # Given
@@ -1147,133 +1151,62 @@ class FindSoonToBeExpiredBookingsTest:
         )
 
         # When
-        expired_bookings = booking_repository.find_soon_to_be_expiring_booking_ordered_by_user().all()
-
-        # Then
-        assert expired_bookings == [expected_booking]
-
-
-class GetActiveBookingsQuantityForVenueTest:
-    @pytest.mark.usefixtures("db_session")
-    def test_return_bookings_quantity_for_venue(self):
-        # Given
-        booking = bookings_factories.BookingFactory(quantity=2)
-        venue = booking.stock.offer.venue
-        bookings_factories.BookingFactory(stock__offer__venue=venue)
-
-        # When
-        active_bookings_quantity = booking_repository.get_active_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert active_bookings_quantity == 3
-
-    @pytest.mark.usefixtures("db_session")
-    def test_return_0_when_no_bookings_exist(self):
-        # Given
-        venue = offers_factories.VenueFactory()
-
-        # When
-        active_bookings_quantity = booking_repository.get_active_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert active_bookings_quantity == 0
-
-    @pytest.mark.usefixtures("db_session")
-    def test_excludes_confirmed_used_or_cancelled_bookings(self):
-        # Given
-        booking = bookings_factories.BookingFactory()
-        venue = booking.stock.offer.venue
-        bookings_factories.BookingFactory(isUsed=True, stock__offer__venue=venue)
-        bookings_factories.BookingFactory(isCancelled=True, stock__offer__venue=venue)
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        bookings_factories.BookingFactory(confirmation_date=yesterday, quantity=2, stock__offer__venue=venue)
-
-        # When
-        active_bookings_quantity = booking_repository.get_active_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert active_bookings_quantity == 1
-
-    @pytest.mark.usefixtures("db_session")
-    def test_excludes_other_venues_bookings(self):
-        # Given
-        booking = bookings_factories.BookingFactory()
-        venue = booking.stock.offer.venue
-        another_venue = offers_factories.VenueFactory(managingOfferer=venue.managingOfferer)
-        bookings_factories.BookingFactory(stock__offer__venue=another_venue)
-
-        # When
-        active_bookings_quantity = booking_repository.get_active_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert active_bookings_quantity == 1
-
-
-class GetValidatedBookingsQuantityForVenueTest:
-    @pytest.mark.usefixtures("db_session")
-    def test_return_used_bookings_quantity_for_venue(self):
-        # Given
-        booking = bookings_factories.BookingFactory(isUsed=True, quantity=2)
-        venue = booking.stock.offer.venue
-        bookings_factories.BookingFactory(isUsed=True, stock__offer__venue=venue)
-
-        # When
-        validated_bookings_quantity = booking_repository.get_validated_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert validated_bookings_quantity == 3
-
-    @pytest.mark.usefixtures("db_session")
-    def test_return_confirmed_bookings_quantity_for_venue(self):
-        # Given
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        booking = bookings_factories.BookingFactory(confirmation_date=yesterday, quantity=2)
-        venue = booking.stock.offer.venue
-
-        # When
-        validated_bookings_quantity = booking_repository.get_validated_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert validated_bookings_quantity == 2
-
-    @pytest.mark.usefixtures("db_session")
-    def test_return_0_when_no_bookings_exist(self):
-        # Given
-        venue = offers_factories.VenueFactory()
-
-        # When
-        validated_bookings_quantity = booking_repository.get_validated_bookings_quantity_for_venue(venue.id)
-
-        # Then
-        assert validated_bookings_quantity == 0
-
-    @pytest.mark.usefixtures("db_session")
-    def test_excludes_unused_or_cancelled_bookings(self):
-        # Given
-        booking = bookings_factories.BookingFactory(isUsed=True)
-        venue = booking.stock.offer.venue
-        bookings_factories.BookingFactory(isUsed=False, stock__offer__venue=venue)
-        bookings_factories.BookingFactory(isCancelled=True, isUsed=True, stock__offer__venue=venue)
-
-        # When
-        validated_bookings_quantity = booking_repository.get_validated_bookings_quantity_for_venue(venue.id)
+        users_bookings = booking_repository.find_soon_to_be_expiring_bookings_grouped_by_user()
 
         # Then
-        assert validated_bookings_quantity == 1
+        assert [user_bookings.id for user_bookings in users_bookings] == [expected_booking.userId]
 
     @pytest.mark.usefixtures("db_session")
-    def test_excludes_other_venues_bookings(self):
+    def test_should_group_bookings_by_user(self, app: fixture):
         # Given
-        booking = bookings_factories.BookingFactory(isUsed=True)
-        venue = booking.stock.offer.venue
-        another_venue = offers_factories.VenueFactory(managingOfferer=venue.managingOfferer)
-        bookings_factories.BookingFactory(isUsed=True, stock__offer__venue=another_venue)
+        creation_date = datetime.combine(date.today() - timedelta(days=23), time(12, 34, 17))
+        user1 = users_factories.UserFactory(firstName="Isaac")
+        user2 = users_factories.UserFactory(firstName="Hari")
+        bookings_factories.BookingFactory(
+            user=user2,
+            dateCreated=creation_date,
+            stock__offer__product__type=str(ThingType.AUDIOVISUEL),
+            stock__offer__name="Fondation",
+            stock__offer__venue__name="Trantor",
+            stock__offer__venue__publicName=None,
+        )
+        bookings_factories.BookingFactory(
+            user=user1,
+            dateCreated=creation_date,
+            stock__offer__product__type=str(ThingType.AUDIOVISUEL),
+            stock__offer__name="Fondation et Empire",
+            stock__offer__venue__name="Terminus",
+            stock__offer__venue__publicName="Seconde Fondation",
+        )
+        bookings_factories.BookingFactory(
+            user=user1,
+            dateCreated=creation_date,
+            stock__offer__product__type=str(ThingType.AUDIOVISUEL),
+            stock__offer__name="Seconde Fondation",
+            stock__offer__venue__name="Kalgan",
+            stock__offer__venue__publicName=None,
+        )
 
         # When
-        validated_bookings_quantity = booking_repository.get_validated_bookings_quantity_for_venue(venue.id)
+        first_batch = booking_repository.find_soon_to_be_expiring_bookings_grouped_by_user(batch_size=1)
+        second_batch = booking_repository.find_soon_to_be_expiring_bookings_grouped_by_user(
+            after_user_id=first_batch[-1].id, batch_size=1
+        )
+        third_batch = booking_repository.find_soon_to_be_expiring_bookings_grouped_by_user(
+            after_user_id=second_batch[-1].id, batch_size=1
+        )
 
         # Then
-        assert validated_bookings_quantity == 1
+        assert [(row.id, row.email, row.firstName) for row in first_batch + second_batch] == [
+            (user1.id, user1.email, "Isaac"),
+            (user2.id, user2.email, "Hari"),
+        ]
+        assert first_batch[0].bookings == [
+            {"offer_name": "Fondation et Empire", "venue_name": "Seconde Fondation"},
+            {"offer_name": "Seconde Fondation", "venue_name": "Kalgan"},
+        ]
+        assert second_batch[0].bookings == [{"offer_name": "Fondation", "venue_name": "Trantor"}]
+        assert third_batch == []
 
 
 class GetOffersBookedByFraudulentUsersTest:
@@ -53,6 +53,42 @@ class SendTest:
             assert posted.last_request.json() == expected
         assert successful
 
+    def test_send_many(self):
+        messages = [(["recipient1@example.com"], {"key": "value1"}), (["recipient2@example.com"], {"key": "value2"})]
+        successful = mails.send_many(messages=messages)
+        assert successful
+        emails = Email.query.order_by(Email.id).all()
+        assert [email.status for email in emails] == [EmailStatus.SENT, EmailStatus.SENT]
+        assert [email.content["To"] for email in emails] == ["recipient1@example.com", "recipient2@example.com"]
+
+    @override_settings(EMAIL_BACKEND="pcapi.core.mails.backends.mailjet.MailjetBackend")
+    def test_send_many_with_mailjet(self):
+        messages = [([f"recipient{i}@example.com"], {"key": f"value{i}"}) for i in range(60)]
+        with requests_mock.Mocker() as mock:
+            posted = mock.post("https://api.eu.mailjet.com/v3/send")
+            successful = mails.send_many(messages=messages)
+
+        assert successful
+        assert posted.call_count == 2
+        sent_messages = [message for request in posted.request_history for message in request.json()["Messages"]]
+        assert sorted(message["To"] for message in sent_messages) == sorted(
+            f"recipient{i}@example.com" for i in range(60)
+        )
+        emails = Email.query.order_by(Email.id).all()
+        assert [email.status for email in emails] == [EmailStatus.SENT] * 60
+        assert [email.content["To"] for email in emails] == [f"recipient{i}@example.com" for i in range(60)]
+
+    @override_settings(EMAIL_BACKEND="pcapi.core.mails.backends.mailjet.MailjetBackend")
+    def test_send_many_with_mailjet_error(self):
+        messages = [([f"recipient{i}@example.com"], {"key": f"value{i}"}) for i in range(2)]
+        with requests_mock.Mocker() as mock:
+            mock.post("https://api.eu.mailjet.com/v3/send", status_code=400)
+            successful = mails.send_many(messages=messages)
+
+        assert not successful
+        emails = Email.query.order_by(Email.id).all()
+        assert [email.status for email in emails] == [EmailStatus.ERROR, EmailStatus.ERROR]
+
 
 class MailingListFunctionsTest:
     @override_settings(EMAIL_BACKEND="pcapi.core.mails.backends.mailjet.MailjetBackend")
@@ -134,6 +170,47 @@ class MailjetBackendTest:
             result = backend.send_mail(recipients=self.recipients, data=self.data)
         assert not result.successful
 
+    def test_send_mails(self):
+        backend = self._get_backend()
+        messages = [(["recipient1@example.com"], {"key": "value1"}), (["recipient2@example.com"], {"key": "value2"})]
+        with requests_mock.Mocker() as mock:
+            posted = mock.post("https://api.eu.mailjet.com/v3/send")
+            results = backend.send_mails(messages)
+
+        assert posted.call_count == 1
+        assert posted.last_request.json() == {
+            "Messages": [
+                {
+                    "FromEmail": "support@example.com",
+                    "To": "recipient1@example.com",
+                    "key": "value1",
+                    "MJ-TemplateErrorReporting": "dev@example.com",
+                },
+                {
+                    "FromEmail": "support@example.com",
+                    "To": "recipient2@example.com",
+                    "key": "value2",
+                    "MJ-TemplateErrorReporting": "dev@example.com",
+                },
+            ]
+        }
+        assert [result.successful for result in results] == [True]
+
+    @patch("pcapi.core.mails.backends.mailjet.MAX_MESSAGES_PER_CALL", 2)
+    def test_send_mails_in_chunks(self):
+        backend = self._get_backend()
+        messages = [([f"recipient{i}@example.com"], {"key": f"value{i}"}) for i in range(5)]
+        with requests_mock.Mocker() as mock:
+            posted = mock.post(
+                "https://api.eu.mailjet.com/v3/send",
+                [{"status_code": 200}, {"status_code": 400}, {"status_code": 200}],
+            )
+            results = backend.send_mails(messages)
+
+        assert posted.call_count == 3
+        assert sorted(len(request.json()["Messages"]) for request in posted.request_history) == [1, 2, 2]
+        assert sorted(result.successful for result in results) == [False, True, True]
+
     def test_create_contact(self):
         backend = self._get_backend()
         with requests_mock.Mocker() as mock:
@@ -214,6 +291,16 @@ class ToDevMailjetBackendTest:
         assert posted.last_request.json() == self.expected_sent_data
         assert result.successful
 
+    def test_send_mails_overrides_recipients(self):
+        backend = self._get_backend()
+        messages = [(["real1@example.com"], {"key": "value1"}), (["real2@example.com"], {"key": "value2"})]
+        with requests_mock.Mocker() as mock:
+            posted = mock.post("https://api.eu.mailjet.com/v3/send")
+            backend.send_mails(messages)
+
+        sent_messages = posted.last_request.json()["Messages"]
+        assert [message["To"] for message in sent_messages] == ["dev@example.com", "dev@example.com"]
+
     def test_send_mail_inject_preamble_in_html(self):
         backend = self._get_backend()
         data = copy.deepcopy(self.data)
@@ -2,8 +2,10 @@ from unittest.mock import patch
 
 import pytest
 
+import pcapi.core.bookings.factories as bookings_factories
 from pcapi.core.offerers import api as offerers_api
 from pcapi.core.offerers.models import ApiKey
+from pcapi.core.offerers.models import VenueStats
 import pcapi.core.offers.factories as offers_factories
 from pcapi.models import api_errors
 from pcapi.utils.token import random_token
@@ -209,3 +211,57 @@ class ApiKeyTest:
     def test_no_key_found(self):
         assert not offerers_api.find_api_key("legacy-key")
         assert not offerers_api.find_api_key("development_prefix_value")
+
+
+@pytest.mark.usefixtures("db_session")
+class RefreshVenueStatsTest:
+    def test_refresh_all_venues(self):
+        booking = bookings_factories.BookingFactory()
+        venue = booking.stock.offer.venue
+        bookings_factories.BookingFactory(stock=booking.stock, isUsed=True, quantity=2)
+        bookings_factories.BookingFactory(stock=booking.stock, isCancelled=True)
+        offers_factories.OfferFactory(venue=venue)  # without stock, hence sold out
+        empty_venue = offers_factories.VenueFactory()
+
+        offerers_api.refresh_venue_stats()
+
+        stats = VenueStats.query.filter_by(venueId=venue.id).one()
+        assert stats.activeBookingsQuantity == 1
+        assert stats.validatedBookingsQuantity == 2
+        assert stats.activeOffersCount == 1
+        assert stats.soldOutOffersCount == 1
+        empty_stats = VenueStats.query.filter_by(venueId=empty_venue.id).one()
+        assert empty_stats.activeBookingsQuantity == 0
+        assert empty_stats.validatedBookingsQuantity == 0
+        assert empty_stats.activeOffersCount == 0
+        assert empty_stats.soldOutOffersCount == 0
+
+    def test_update_existing_stats(self):
+        booking = bookings_factories.BookingFactory()
+        venue = booking.stock.offer.venue
+        offerers_api.refresh_venue_stats()
+        bookings_factories.BookingFactory(stock=booking.stock)
+
+        offerers_api.refresh_venue_stats()
+
+        stats = VenueStats.query.filter_by(venueId=venue.id).one()
+        assert stats.activeBookingsQuantity == 2
+
+    def test_refresh_given_venues_only(self):
+        booking = bookings_factories.BookingFactory()
+        other_venue = offers_factories.VenueFactory()
+
+        offerers_api.refresh_venue_stats([booking.stock.offer.venueId])
+
+        assert VenueStats.query.filter_by(venueId=booking.stock.offer.venueId).one().activeBookingsQuantity == 1
+        assert VenueStats.query.filter_by(venueId=other_venue.id).count() == 0
+
+    def test_clear_stale_flag(self):
+        offer = offers_factories.OfferFactory()
+        assert VenueStats.query.filter_by(venueId=offer.venueId).one().isStale
+
+        offerers_api.refresh_venue_stats([offer.venueId])
+
+        stats = VenueStats.query.filter_by(venueId=offer.venueId).one()
+        assert not stats.isStale
+        assert stats.soldOutOffersCount == 1
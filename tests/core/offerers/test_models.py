@@ -3,10 +3,13 @@ from unittest.mock import patch
 import pytest
 
 from pcapi.connectors.api_entreprises import ApiEntrepriseException
+from pcapi.core.offerers import api as offerers_api
 from pcapi.core.offerers.models import Offerer
 from pcapi.core.offerers.models import Venue
+from pcapi.core.offerers.models import VenueStats
 from pcapi.core.offers import factories as offers_factories
 from pcapi.core.offers.models import OfferValidationStatus
+from pcapi.models import db
 
 
 @pytest.mark.usefixtures("db_session")
@@ -50,6 +53,24 @@ class VenueTimezoneSqlQueryTest:
 
         assert len(query_result) == 1
 
+    def test_timezone_is_updated_with_postal_code(self):
+        venue = offers_factories.VenueFactory(postalCode="75000")
+
+        venue.postalCode = "97300"
+        db.session.commit()
+
+        assert Venue.query.filter(Venue.timezone == "America/Cayenne").one() == venue
+
+    def test_virtual_venue_timezone_is_updated_with_managing_offerer_postal_code(self):
+        venue = offers_factories.VirtualVenueFactory(managingOfferer__postalCode="75000")
+        physical_venue = offers_factories.VenueFactory(managingOfferer=venue.managingOfferer, postalCode="75000")
+
+        venue.managingOfferer.postalCode = "97300"
+        db.session.commit()
+
+        assert Venue.query.filter(Venue.timezone == "America/Cayenne").one() == venue
+        assert physical_venue.timezone == "Europe/Paris"
+
 
 @pytest.mark.usefixtures("db_session")
 class OffererDepartementCodePropertyTest:
@@ -153,3 +174,37 @@ class OffererLegalCategoryTest:
         assert offerer.legal_category == "5202"
         assert offerer.legal_category == "5202"
         assert mocked_get_offerer_legal_category.call_count == 1
+
+
+@pytest.mark.usefixtures("db_session")
+class VenueStatsStaleTriggerTest:
+    def test_first_offer_creates_stale_stats(self):
+        venue = offers_factories.VenueFactory()
+        assert VenueStats.query.filter_by(venueId=venue.id).count() == 0
+
+        offers_factories.OfferFactory(venue=venue)
+
+        stats = VenueStats.query.filter_by(venueId=venue.id).one()
+        assert stats.isStale
+        assert stats.activeOffersCount == 0
+
+    def test_offer_status_change_marks_stats_stale(self):
+        offer = offers_factories.OfferFactory()
+        offerers_api.refresh_venue_stats([offer.venueId])
+        stats = VenueStats.query.filter_by(venueId=offer.venueId).one()
+        assert not stats.isStale
+
+        offer.isActive = False
+        db.session.commit()
+
+        db.session.refresh(stats)
+        assert stats.isStale
+
+    def test_other_offer_change_leaves_stats_fresh(self):
+        offer = offers_factories.OfferFactory()
+        offerers_api.refresh_venue_stats([offer.venueId])
+
+        offer.name = "Nouveau nom"
+        db.session.commit()
+
+        assert not VenueStats.query.filter_by(venueId=offer.venueId).one().isStale
@@ -1,11 +1,23 @@
+from datetime import datetime
+from datetime import timedelta
+
 import pytest
 
+import pcapi.core.bookings.factories as bookings_factories
+from pcapi.core.bookings.models import Booking
+from pcapi.core.offerers import api as offerers_api
 import pcapi.core.offerers.factories as offerers_factories
+from pcapi.core.offerers.repository import find_venue_ids_with_stats_changes_since
 from pcapi.core.offerers.repository import get_all_offerers_for_user
 from pcapi.core.offerers.repository import get_all_venue_labels
 from pcapi.core.offerers.repository import get_all_venue_types
+from pcapi.core.offerers.repository import preload_venues_offer_counts
 import pcapi.core.offers.factories as offers_factories
+from pcapi.core.offers.models import OfferValidationStatus
+from pcapi.core.offers.models import Stock
+from pcapi.core.testing import assert_num_queries
 from pcapi.core.users import factories as users_factories
+from pcapi.models.db import db
 
 
 @pytest.mark.usefixtures("db_session")
@@ -225,3 +237,73 @@ class GetAllOfferersForUserTest:
             offerers_ids = [offerer.id for offerer in offerers]
             assert validated_pro_offerer_attachment.offerer.id not in offerers_ids
             assert unvalidated_pro_offerer_attachment.offerer.id in offerers_ids
+
+
+@pytest.mark.usefixtures("db_session")
+class PreloadVenuesOfferCountsTest:
+    def test_counts_offers_of_all_venues_in_one_query(self):
+        offerer = offers_factories.OffererFactory()
+        venue1 = offers_factories.VenueFactory(managingOfferer=offerer)
+        venue2 = offers_factories.VenueFactory(managingOfferer=offerer)
+        venue_without_offer = offers_factories.VenueFactory(managingOfferer=offerer)
+        offers_factories.OfferFactory.create_batch(2, venue=venue1, validation=OfferValidationStatus.APPROVED)
+        offers_factories.OfferFactory(venue=venue1, validation=OfferValidationStatus.DRAFT)
+        offers_factories.OfferFactory(venue=venue2, validation=OfferValidationStatus.PENDING)
+        venues = [venue1, venue2, venue_without_offer]
+
+        with assert_num_queries(1):
+            preload_venues_offer_counts(venues)
+            n_offers = [venue.nOffers for venue in venues]
+            n_approved_offers = [venue.nApprovedOffers for venue in venues]
+
+        assert n_offers == [2, 1, 0]
+        assert n_approved_offers == [2, 0, 0]
+
+    def test_without_venues(self):
+        with assert_num_queries(0):
+            preload_venues_offer_counts([])
+
+
+@pytest.mark.usefixtures("db_session")
+class FindVenueIdsWithStatsChangesSinceTest:
+    def test_find_venues_with_changes(self):
+        long_ago = datetime.utcnow() - timedelta(days=10)
+        an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        new_booking = bookings_factories.BookingFactory()
+        old_booking = bookings_factories.BookingFactory()
+        confirmed_booking = bookings_factories.BookingFactory(
+            confirmation_date=datetime.utcnow() - timedelta(minutes=5)
+        )
+        bookings_factories.BookingFactory(confirmation_date=datetime.utcnow() + timedelta(days=1))
+        modified_stock = offers_factories.StockFactory()
+        expired_stock = offers_factories.StockFactory(bookingLimitDatetime=datetime.utcnow() - timedelta(minutes=5))
+        started_stock = offers_factories.EventStockFactory(beginningDatetime=datetime.utcnow() - timedelta(minutes=5))
+        offers_factories.StockFactory(bookingLimitDatetime=long_ago)
+        offers_factories.EventStockFactory(beginningDatetime=datetime.utcnow() + timedelta(days=1))
+        # The triggers set `dateModified` on INSERT, unless an UPDATE
+        # sets it explicitly.
+        Booking.query.filter(Booking.id != new_booking.id).update({"dateModified": long_ago}, synchronize_session=False)
+        Stock.query.filter(Stock.id != modified_stock.id).update({"dateModified": long_ago}, synchronize_session=False)
+        # Offer creations have marked the stats of all venues as stale.
+        offerers_api.refresh_venue_stats()
+
+        venue_ids = find_venue_ids_with_stats_changes_since(an_hour_ago)
+
+        assert set(venue_ids) == {
+            new_booking.stock.offer.venueId,
+            confirmed_booking.stock.offer.venueId,
+            modified_stock.offer.venueId,
+            expired_stock.offer.venueId,
+            started_stock.offer.venueId,
+        }
+        assert old_booking.stock.offer.venueId not in venue_ids
+
+    def test_find_venues_with_stale_stats(self):
+        offer = offers_factories.OfferFactory()
+        offerers_api.refresh_venue_stats()
+        assert find_venue_ids_with_stats_changes_since(datetime.utcnow()) == []
+
+        offer.isActive = False
+        db.session.commit()
+
+        assert find_venue_ids_with_stats_changes_since(datetime.utcnow()) == [offer.venueId]
@@ -16,6 +16,7 @@ import pcapi.core.offerers.factories as offerers_factories
 from pcapi.core.offers import api
 from pcapi.core.offers import exceptions
 from pcapi.core.offers import factories
+from pcapi.core.offers import offer_validation
 from pcapi.core.offers.api import _load_product_by_isbn_and_check_is_gcu_compatible_or_raise_error
 from pcapi.core.offers.api import add_criteria_to_offers
 from pcapi.core.offers.api import deactivate_inappropriate_products
@@ -37,10 +38,9 @@ from pcapi.core.offers.models import Offer
 from pcapi.core.offers.models import OfferValidationConfig
 from pcapi.core.offers.models import OfferValidationStatus
 from pcapi.core.offers.models import Stock
-from pcapi.core.offers.offer_validation import OfferValidationItem
-from pcapi.core.offers.offer_validation import OfferValidationRuleItem
-from pcapi.core.offers.offer_validation import compute_offer_validation_score
-from pcapi.core.offers.offer_validation import parse_offer_validation_config
+from pcapi.core.offers.offer_validation import compile_offer_validation_config
+from pcapi.core.offers.offer_validation import get_compiled_offer_validation_config
+from pcapi.core.testing import assert_num_queries
 from pcapi.core.testing import override_features
 import pcapi.core.users.factories as users_factories
 from pcapi.models import ApiErrors
@@ -341,6 +341,53 @@ class UpsertStocksTest:
             ],
         }
 
+    def test_create_stock_with_activation_codes(self):
+        # Given
+        user = users_factories.UserFactory()
+        offer = factories.DigitalOfferFactory()
+        created_stock_data = StockCreationBodyModel(
+            price=0,
+            bookingLimitDatetime=datetime(2021, 6, 15),
+            activationCodesExpirationDatetime=datetime(2021, 6, 22),
+            activationCodes=["ABC", "DEF", "GHI"],
+        )
+
+        # When
+        stocks = api.upsert_stocks(offer_id=offer.id, stock_data_list=[created_stock_data], user=user)
+
+        # Then
+        stock = Stock.query.get(stocks[0].id)
+        assert stock.quantity == 3
+        assert [code.code for code in stock.activationCodes] == ["ABC", "DEF", "GHI"]
+        assert {code.expirationDate for code in stock.activationCodes} == {datetime(2021, 6, 22)}
+
+    def test_does_not_allow_duplicated_activation_codes(self):
+        # Given
+        user = users_factories.UserFactory()
+        offer = factories.DigitalOfferFactory()
+        created_stock_data = StockCreationBodyModel(price=0, activationCodes=["ABC", "DEF", "ABC"])
+
+        # When
+        with pytest.raises(api_errors.ApiErrors) as error:
+            api.upsert_stocks(offer_id=offer.id, stock_data_list=[created_stock_data], user=user)
+
+        # Then
+        assert error.value.errors == {"activationCodes": ["Le fichier contient des codes d'activation en double"]}
+        assert Stock.query.count() == 0
+
+    def test_edit_several_stocks(self):
+        # Given
+        user = users_factories.UserFactory()
+        offer = factories.ThingOfferFactory()
+        stocks = factories.StockFactory.create_batch(3, offer=offer, price=10)
+        edited_stocks_data = [StockEditionBodyModel(id=stock.id, price=20) for stock in stocks]
+
+        # When
+        api.upsert_stocks(offer_id=offer.id, stock_data_list=edited_stocks_data, user=user)
+
+        # Then
+        assert {stock.price for stock in Stock.query.all()} == {20}
+
     def test_validate_booking_limit_datetime_with_expiration_datetime_on_edition(self):
         # Given
         user = users_factories.UserFactory()
@@ -1144,8 +1191,8 @@ class UpdateOfferTest:
 
 @pytest.mark.usefixtures("db_session")
 class UpdateOffersActiveStatusTest:
-    @mock.patch("pcapi.connectors.redis.add_offer_id")
-    def test_activate(self, mocked_add_offer_id):
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_activate(self, mocked_add_offer_ids):
         offer1 = factories.OfferFactory(isActive=False)
         offer2 = factories.OfferFactory(isActive=False)
         offer3 = factories.OfferFactory(isActive=False)
@@ -1162,13 +1209,8 @@ class UpdateOffersActiveStatusTest:
         assert not models.Offer.query.get(offer3.id).isActive
         assert not models.Offer.query.get(rejected_offer.id).isActive
         assert not models.Offer.query.get(pending_offer.id).isActive
-        assert mocked_add_offer_id.call_count == 2
-        mocked_add_offer_id.assert_has_calls(
-            [
-                mock.call(client=app.redis_client, offer_id=offer1.id),
-                mock.call(client=app.redis_client, offer_id=offer2.id),
-            ],
-            any_order=True,
+        mocked_add_offer_ids.assert_called_once_with(
+            client=app.redis_client, offer_ids=sorted([offer1.id, offer2.id])
         )
 
     def test_deactivate(self):
@@ -1183,6 +1225,22 @@ class UpdateOffersActiveStatusTest:
         assert not models.Offer.query.get(offer2.id).isActive
         assert models.Offer.query.get(offer3.id).isActive
 
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def test_update_by_batches_and_reindex_changed_offers_only(self, mocked_add_offer_ids):
+        offers = factories.OfferFactory.create_batch(3, isActive=False)
+        already_active_offer = factories.OfferFactory()
+
+        query = models.Offer.query.filter(
+            models.Offer.id.in_([offer.id for offer in offers] + [already_active_offer.id])
+        )
+        api.update_offers_active_status(query, is_active=True, batch_size=2)
+
+        assert models.Offer.query.filter(models.Offer.isActive.is_(False)).count() == 0
+        assert mocked_add_offer_ids.call_args_list == [
+            mock.call(client=app.redis_client, offer_ids=[offers[0].id, offers[1].id]),
+            mock.call(client=app.redis_client, offer_ids=[offers[2].id]),
+        ]
+
 
 class UpdateOfferAndStockIdAtProvidersTest:
     @pytest.mark.usefixtures("db_session")
@@ -1508,10 +1566,10 @@ class ImportOfferValidationConfigTest:
 
 
 @pytest.mark.usefixtures("db_session")
-class ParseOfferValidationConfigTest:
+class CompileOfferValidationConfigTest:
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
-    def test_parse_offer_validation_config(self):
-        offer = OfferFactory(name="REJECTED")
+    def test_compile_offer_validation_config(self):
+        offer = OfferFactory(name="REJECTED", withdrawalDetails="Envoi par la poste")
         config_yaml = """
         minimum_score: 0.6
         rules:
@@ -1529,13 +1587,102 @@ class ParseOfferValidationConfigTest:
                  - "Envoi"
             """
         offer_validation_config = import_offer_validation_config(config_yaml)
-        min_score, validation_rules = parse_offer_validation_config(offer, offer_validation_config)
-        assert min_score == 0.6
-        assert len(validation_rules) == 1
-        assert validation_rules[0].factor == 0
-        assert validation_rules[0].name == "modalités de retrait"
-        assert validation_rules[0].offer_validation_items[0].model == offer
-        assert validation_rules[0].offer_validation_items[0].attribute == "withdrawalDetails"
+        compiled_config = compile_offer_validation_config(offer_validation_config)
+        assert compiled_config.config_id == offer_validation_config.id
+        assert compiled_config.minimum_score == 0.6
+        assert len(compiled_config.rules) == 1
+        assert compiled_config.rules[0].factor == 0
+        assert compiled_config.rules[0].name == "modalités de retrait"
+        assert len(compiled_config.rules[0].predicates) == 1
+        assert compiled_config.rules[0].matches(offer)
+
+
+@pytest.mark.usefixtures("db_session")
+class CompiledOfferValidationConfigTest:
+    config_yaml = """
+        minimum_score: 0.6
+        rules:
+         - name: "nom de l'offre"
+           factor: 0.5
+           conditions:
+            - model: "Offer"
+              attribute: "name"
+              condition:
+                operator: "in"
+                comparated:
+                 - "Suspicious"
+                 - "Rejected"
+         - name: "nom du lieu"
+           factor: 0.4
+           conditions:
+            - model: "Venue"
+              attribute: "name"
+              condition:
+                operator: "contains"
+                comparated:
+                 - "fraud"
+        """
+
+    def test_compute_score(self):
+        import_offer_validation_config(self.config_yaml)
+        offers = [
+            OfferFactory(name="Rejected", venue__name="Fraud & co"),
+            OfferFactory(name="rejected", venue__name="Librairie"),
+            OfferFactory(name="Un livre", venue__name="Librairie"),
+        ]
+
+        config = get_compiled_offer_validation_config()
+
+        assert config.minimum_score == 0.6
+        assert [config.compute_score(offer) for offer in offers] == [pytest.approx(0.2), 0.5, 1.0]
+
+    def test_compile_once_per_config(self):
+        first_config = import_offer_validation_config(self.config_yaml)
+
+        compiled_config = get_compiled_offer_validation_config()
+        assert compiled_config.config_id == first_config.id
+        assert get_compiled_offer_validation_config() is compiled_config
+
+        second_config = import_offer_validation_config(self.config_yaml)
+        assert get_compiled_offer_validation_config().config_id == second_config.id
+
+    def test_compute_scores(self):
+        import_offer_validation_config(self.config_yaml)
+        offers = [
+            OfferFactory(name="Rejected", venue__name="Fraud & co"),
+            OfferFactory(name="rejected", venue__name="Librairie"),
+            OfferFactory(name="Un livre", venue__name="Librairie"),
+        ]
+
+        config = get_compiled_offer_validation_config()
+
+        assert config.compute_scores(offers) == [pytest.approx(0.2), 0.5, 1.0]
+
+    @mock.patch("pcapi.core.offers.offer_validation.time.monotonic")
+    def test_current_config_id_is_cached(self, mocked_monotonic):
+        mocked_monotonic.return_value = 1000.0
+        first_config = import_offer_validation_config(self.config_yaml)
+        get_compiled_offer_validation_config()
+
+        # A configuration saved by another process, which does not
+        # invalidate the cache of this one.
+        second_config = OfferValidationConfig(specs=first_config.specs)
+        models.db.session.add(second_config)
+        models.db.session.flush()
+
+        with assert_num_queries(0):
+            assert get_compiled_offer_validation_config().config_id == first_config.id
+
+        mocked_monotonic.return_value = 1000.0 + offer_validation.CONFIG_ID_CACHE_TTL
+        assert get_compiled_offer_validation_config().config_id == second_config.id
+
+    def test_no_config(self):
+        assert get_compiled_offer_validation_config() is None
+
+
+def _compute_score(offer, rules):
+    config = OfferValidationConfig(specs={"minimum_score": 0.6, "rules": rules})
+    return compile_offer_validation_config(config).compute_score(offer)
 
 
 @pytest.mark.usefixtures("db_session")
@@ -1543,14 +1690,15 @@ class ComputeOfferValidationScoreTest:
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_with_one_item_config_with_in(self):
         offer = OfferFactory(name="REJECTED")
-        validation_item = OfferValidationItem(
-            model=offer, attribute="name", type=["str"], condition={"operator": "in", "comparated": ["REJECTED"]}
-        )
-        validation_rules = OfferValidationRuleItem(
-            name="nom de l'offre", factor=0.2, offer_validation_items=[validation_item]
-        )
+        validation_rule = {
+            "name": "nom de l'offre",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "name", "condition": {"operator": "in", "comparated": ["REJECTED"]}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rules])
+        score = _compute_score(offer, [validation_rule])
 
         assert score == 0.2
 
@@ -1558,24 +1706,30 @@ class ComputeOfferValidationScoreTest:
     def test_offer_validation_with_one_item_config_with_greater_than(self):
         offer = OfferFactory(name="REJECTED")
         StockFactory(offer=offer, price=12)
-        validation_item = OfferValidationItem(
-            model=offer, attribute="max_price", type=["int"], condition={"operator": ">", "comparated": 10}
-        )
-        validation_rule = OfferValidationRuleItem(name="prix max", factor=0.2, offer_validation_items=[validation_item])
+        validation_rule = {
+            "name": "prix max",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": ">", "comparated": 10}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
 
         assert score == 0.2
 
     def test_offer_validation_with_one_item_config_with_less_than(self):
         offer = OfferFactory(name="REJECTED")
         StockFactory(offer=offer, price=8)
-        validation_item = OfferValidationItem(
-            model=offer, attribute="max_price", type=["int"], condition={"operator": "<", "comparated": 10}
-        )
-        validation_rule = OfferValidationRuleItem(name="prix max", factor=0.2, offer_validation_items=[validation_item])
+        validation_rule = {
+            "name": "prix max",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": "<", "comparated": 10}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
 
         assert score == 0.2
 
@@ -1583,24 +1737,30 @@ class ComputeOfferValidationScoreTest:
     def test_offer_validation_with_one_item_config_with_greater_or_equal_than(self):
         offer = OfferFactory(name="REJECTED")
         StockFactory(offer=offer, price=12)
-        validation_item = OfferValidationItem(
-            model=offer, attribute="max_price", type=["int"], condition={"operator": ">=", "comparated": 10}
-        )
-        validation_rule = OfferValidationRuleItem(name="prix max", factor=0.2, offer_validation_items=[validation_item])
+        validation_rule = {
+            "name": "prix max",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": ">=", "comparated": 10}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
 
         assert score == 0.2
 
     def test_offer_validation_with_one_item_config_with_less_or_equal_than(self):
         offer = OfferFactory(name="REJECTED")
         StockFactory(offer=offer, price=8)
-        validation_item = OfferValidationItem(
-            model=offer, attribute="max_price", type=["int"], condition={"operator": "<=", "comparated": 10}
-        )
-        validation_rule = OfferValidationRuleItem(name="prix max", factor=0.2, offer_validation_items=[validation_item])
+        validation_rule = {
+            "name": "prix max",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": "<=", "comparated": 10}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
 
         assert score == 0.2
 
@@ -1608,112 +1768,104 @@ class ComputeOfferValidationScoreTest:
     def test_offer_validation_with_one_item_config_with_equal(self):
         offer = OfferFactory(name="test offer")
         StockFactory(offer=offer, price=15)
-        validation_item = OfferValidationItem(
-            model=offer,
-            attribute="name",
-            type=["str"],
-            condition={"operator": "==", "comparated": "test offer"},
-        )
-        validation_rule = OfferValidationRuleItem(
-            name="nom de l'offre", factor=0.3, offer_validation_items=[validation_item]
-        )
-        score = compute_offer_validation_score([validation_rule])
+        validation_rule = {
+            "name": "nom de l'offre",
+            "factor": 0.3,
+            "conditions": [
+                {"model": "Offer", "attribute": "name", "condition": {"operator": "==", "comparated": "test offer"}}
+            ],
+        }
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.3
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_with_one_item_config_with_not_in(self):
         offer = OfferFactory(name="rejected")
-        validation_item = OfferValidationItem(
-            model=offer,
-            attribute="name",
-            type=["str"],
-            condition={"operator": "not in", "comparated": "[approved]"},
-        )
-        validation_rule = OfferValidationRuleItem(
-            name="nom de l'offre", factor=0.3, offer_validation_items=[validation_item]
-        )
-        score = compute_offer_validation_score([validation_rule])
+        validation_rule = {
+            "name": "nom de l'offre",
+            "factor": 0.3,
+            "conditions": [
+                {"model": "Offer", "attribute": "name", "condition": {"operator": "not in", "comparated": "[approved]"}}
+            ],
+        }
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.3
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_with_multiple_item_config(self):
         offer = OfferFactory(name="test offer")
         StockFactory(offer=offer, price=15)
-        validation_item_1 = OfferValidationItem(
-            model=offer,
-            attribute="name",
-            type=["str"],
-            condition={"operator": "==", "comparated": "test offer"},
-        )
-        validation_item_2 = OfferValidationItem(
-            model=offer, attribute="max_price", type=["str"], condition={"operator": ">", "comparated": 10}
-        )
-        validation_rule_1 = OfferValidationRuleItem(
-            name="nom de l'offre", factor=0.3, offer_validation_items=[validation_item_1]
-        )
-        validation_rule_2 = OfferValidationRuleItem(
-            name="prix de l'offre", factor=0.2, offer_validation_items=[validation_item_2]
-        )
+        validation_rule_1 = {
+            "name": "nom de l'offre",
+            "factor": 0.3,
+            "conditions": [
+                {"model": "Offer", "attribute": "name", "condition": {"operator": "==", "comparated": "test offer"}}
+            ],
+        }
+        validation_rule_2 = {
+            "name": "prix de l'offre",
+            "factor": 0.2,
+            "conditions": [
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": ">", "comparated": 10}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule_1, validation_rule_2])
+        score = _compute_score(offer, [validation_rule_1, validation_rule_2])
         assert score == 0.06
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_rule_with_multiple_conditions(self):
         offer = OfferFactory(name="Livre")
         StockFactory(offer=offer, price=75)
-        validation_item_1 = OfferValidationItem(
-            model=offer,
-            attribute="name",
-            type=["str"],
-            condition={"operator": "==", "comparated": "Livre"},
-        )
-        validation_item_2 = OfferValidationItem(
-            model=offer, attribute="max_price", type=["str"], condition={"operator": ">", "comparated": 70}
-        )
-
-        validation_rule = OfferValidationRuleItem(
-            name="prix d'un livre", factor=0.5, offer_validation_items=[validation_item_1, validation_item_2]
-        )
+        validation_rule = {
+            "name": "prix d'un livre",
+            "factor": 0.5,
+            "conditions": [
+                {"model": "Offer", "attribute": "name", "condition": {"operator": "==", "comparated": "Livre"}},
+                {"model": "Offer", "attribute": "max_price", "condition": {"operator": ">", "comparated": 70}},
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.5
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_with_emails_blacklist(self):
-
         venue = VenueFactory(siret="12345678912345", bookingEmail="fake@yopmail.com")
         offer = OfferFactory(name="test offer", venue=venue)
         StockFactory(offer=offer, price=15)
-        validation_item_1 = OfferValidationItem(
-            model=venue,
-            attribute="bookingEmail",
-            type=["str"],
-            condition={"operator": "contains", "comparated": ["yopmail.com", "suspect.com"]},
-        )
-
-        validation_rule = OfferValidationRuleItem(
-            name="adresses mail", factor=0.3, offer_validation_items=[validation_item_1]
-        )
+        validation_rule = {
+            "name": "adresses mail",
+            "factor": 0.3,
+            "conditions": [
+                {
+                    "model": "Venue",
+                    "attribute": "bookingEmail",
+                    "condition": {"operator": "contains", "comparated": ["yopmail.com", "suspect.com"]},
+                }
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.3
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
     def test_offer_validation_with_description_rule_and_offer_without_description(self):
         offer = OfferFactory(name="test offer", description=None)
         StockFactory(offer=offer, price=15)
-        validation_item_1 = OfferValidationItem(
-            model=offer,
-            attribute="description",
-            type=["str"],
-            condition={"operator": "contains", "comparated": ["suspect", "fake"]},
-        )
-        validation_rule = OfferValidationRuleItem(
-            name="description de l'offre", factor=0.3, offer_validation_items=[validation_item_1]
-        )
+        validation_rule = {
+            "name": "description de l'offre",
+            "factor": 0.3,
+            "conditions": [
+                {
+                    "model": "Offer",
+                    "attribute": "description",
+                    "condition": {"operator": "contains", "comparated": ["suspect", "fake"]},
+                }
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
         assert score == 1
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
@@ -1721,17 +1873,15 @@ class ComputeOfferValidationScoreTest:
         offer = OfferFactory(name="test offer", description=None)
         assert offer.idAtProviders is None
         StockFactory(offer=offer, price=15)
-        validation_item_1 = OfferValidationItem(
-            model=offer,
-            attribute="idAtProviders",
-            type=["None"],
-            condition={"operator": "==", "comparated": None},
-        )
-        validation_rule = OfferValidationRuleItem(
-            name="offre non synchro", factor=0.3, offer_validation_items=[validation_item_1]
-        )
+        validation_rule = {
+            "name": "offre non synchro",
+            "factor": 0.3,
+            "conditions": [
+                {"model": "Offer", "attribute": "idAtProviders", "condition": {"operator": "==", "comparated": None}}
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.3
 
     @override_features(OFFER_VALIDATION_MOCK_COMPUTATION=False)
@@ -1739,17 +1889,19 @@ class ComputeOfferValidationScoreTest:
         offer = OfferFactory(name="test offer", description=None)
         assert offer.idAtProviders is None
         StockFactory(offer=offer, price=15)
-        validation_item_1 = OfferValidationItem(
-            model=offer,
-            attribute="name",
-            type=["str"],
-            condition={"operator": "contains-exact", "comparated": ["test"]},
-        )
-        validation_rule = OfferValidationRuleItem(
-            name="offer name contains exact words", factor=0.3, offer_validation_items=[validation_item_1]
-        )
+        validation_rule = {
+            "name": "offer name contains exact words",
+            "factor": 0.3,
+            "conditions": [
+                {
+                    "model": "Offer",
+                    "attribute": "name",
+                    "condition": {"operator": "contains-exact", "comparated": ["test"]},
+                }
+            ],
+        }
 
-        score = compute_offer_validation_score([validation_rule])
+        score = _compute_score(offer, [validation_rule])
         assert score == 0.3
 
 
@@ -10,7 +10,9 @@ from pcapi.core.offers.models import Offer
 from pcapi.core.offers.models import OfferStatus
 from pcapi.core.offers.models import OfferValidationStatus
 from pcapi.core.offers.models import Stock
+from pcapi.models.db import db
 from pcapi.models.offer_type import ThingType
+from pcapi.repository import repository
 from pcapi.utils.date import DateTimes
 
 
@@ -295,6 +297,28 @@ class OfferStatusTest:
         assert Offer.query.filter(Offer.status == OfferStatus.SOLD_OUT.name).all() == [offer]
         assert Offer.query.filter(Offer.status != OfferStatus.SOLD_OUT.name).count() == 0
 
+    def test_status_follows_bookings(self):
+        offer = factories.OfferFactory(product__type=str(ThingType.INSTRUMENT))
+        stock = factories.StockFactory(offer=offer, quantity=1)
+        assert Offer.query.get(offer.id).status == OfferStatus.ACTIVE
+
+        booking = BookingFactory(stock=stock)
+        db.session.expire(offer)
+        assert offer.status == OfferStatus.SOLD_OUT
+
+        booking.isCancelled = True
+        repository.save(booking)
+        db.session.expire(offer)
+        assert offer.status == OfferStatus.ACTIVE
+
+    def test_status_follows_deactivation(self):
+        offer = factories.StockFactory().offer
+
+        offer.isActive = False
+        repository.save(offer)
+
+        assert offer.status == OfferStatus.INACTIVE
+
 
 @pytest.mark.usefixtures("db_session")
 class StockBookingsQuantityTest:
@@ -1,11 +1,13 @@
 from datetime import datetime
 from datetime import timedelta
+from unittest import mock
 
 from freezegun import freeze_time
 import pytest
 
 import pcapi.core.bookings.factories as bookings_factories
 from pcapi.core.bookings.factories import BookingFactory
+from pcapi.core.bookings.models import Booking
 import pcapi.core.offers.factories as offers_factories
 from pcapi.core.offers.factories import EventStockFactory
 from pcapi.core.offers.models import Offer
@@ -14,11 +16,10 @@ from pcapi.core.offers.models import OfferValidationStatus
 from pcapi.core.offers.repository import check_stock_consistency
 from pcapi.core.offers.repository import delete_past_draft_offers
 from pcapi.core.offers.repository import find_tomorrow_event_stock_ids
-from pcapi.core.offers.repository import get_active_offers_count_for_venue
 from pcapi.core.offers.repository import get_capped_offers_for_filters
 from pcapi.core.offers.repository import get_expired_offers
 from pcapi.core.offers.repository import get_offers_by_ids
-from pcapi.core.offers.repository import get_sold_out_offers_count_for_venue
+from pcapi.core.offers.repository import update_offers_status_after_dates
 from pcapi.core.users import factories as users_factories
 from pcapi.domain.pro_offers.offers_recap import OffersRecap
 from pcapi.model_creators.generic_creators import create_offerer
@@ -28,6 +29,7 @@ from pcapi.model_creators.generic_creators import create_user_offerer
 from pcapi.model_creators.generic_creators import create_venue
 from pcapi.model_creators.specific_creators import create_offer_with_thing_product
 from pcapi.models import ThingType
+from pcapi.models.db import db
 from pcapi.repository import repository
 from pcapi.utils.date import utc_datetime_to_department_timezone
 
@@ -56,6 +58,28 @@ class GetCappedOffersForFiltersTest:
         assert len(offers.offers) == 1
         assert offers.offers[0].id == expected_offer.id
 
+    @pytest.mark.usefixtures("db_session")
+    def should_not_depend_on_the_number_of_stocks_and_mediations(self, assert_num_queries):
+        # Given
+        user_offerer = offers_factories.UserOffererFactory()
+        venue = offers_factories.VenueFactory(managingOfferer=user_offerer.offerer)
+        for _ in range(2):
+            offer = offers_factories.EventOfferFactory(venue=venue)
+            offers_factories.EventStockFactory.create_batch(5, offer=offer)
+            offers_factories.MediationFactory.create_batch(2, offer=offer)
+        user_id = user_offerer.user.id
+
+        # When
+        n_queries = 1  # offers, with their venue, offerer, product and provider
+        n_queries += 1  # stocks
+        n_queries += 1  # mediations
+        with assert_num_queries(n_queries):
+            offers = get_capped_offers_for_filters(user_id=user_id, user_is_admin=False, offers_limit=1)
+
+        # Then
+        assert len(offers.offers) == 1
+        assert len(offers.offers[0].stocks) == 5
+
     @pytest.mark.usefixtures("db_session")
     def should_return_offers_sorted_by_id_desc(self):
         # Given
@@ -479,25 +503,29 @@ class GetCappedOffersForFiltersTest:
             assert len(offers.offers) == 2
 
         @pytest.mark.usefixtures("db_session")
-        def should_be_accent_sensitive(self, app):
+        def should_be_accent_insensitive(self, app):
             # given
             user_offerer = offers_factories.UserOffererFactory()
             expected_offer = offers_factories.OfferFactory(name="ocean", venue__managingOfferer=user_offerer.offerer)
-            other_offer = offers_factories.OfferFactory(name="océan", venue__managingOfferer=user_offerer.offerer)
+            another_expected_offer = offers_factories.OfferFactory(
+                name="océan", venue__managingOfferer=user_offerer.offerer
+            )
+            other_offer = offers_factories.OfferFactory(name="ocelot", venue__managingOfferer=user_offerer.offerer)
 
             # when
             offers = get_capped_offers_for_filters(
                 user_id=user_offerer.user.id,
                 user_is_admin=user_offerer.user.isAdmin,
                 offers_limit=10,
-                name_keywords="ocean",
+                name_keywords="océan",
             )
 
             # then
             offers_id = [offer.id for offer in offers.offers]
             assert expected_offer.id in offers_id
+            assert another_expected_offer.id in offers_id
             assert other_offer.id not in offers_id
-            assert len(offers.offers) == 1
+            assert len(offers.offers) == 2
 
     class StatusFiltersTest:
         def init_test_data(self):
@@ -1028,73 +1056,6 @@ class GetOffersByIdsTest:
         assert query.count() == 2
 
 
-@pytest.mark.usefixtures("db_session")
-class GetActiveOffersCountForVenueTest:
-    def test_counts_active_offers_for_venue(self):
-        # Given
-        venue = offers_factories.VenueFactory()
-
-        active_offer = offers_factories.ThingOfferFactory(venue=venue)
-        offers_factories.StockFactory(offer=active_offer)
-        other_active_offer = offers_factories.EventOfferFactory(venue=venue)
-        offers_factories.EventStockFactory(offer=other_active_offer)
-        offers_factories.EventStockFactory(offer=other_active_offer)
-
-        sold_out_offer = offers_factories.ThingOfferFactory(venue=venue)
-        sold_out_stock = offers_factories.StockFactory(quantity=1, offer=sold_out_offer)
-        bookings_factories.BookingFactory(stock=sold_out_stock)
-
-        expired_offer = offers_factories.EventOfferFactory(venue=venue)
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        offers_factories.EventStockFactory(offer=expired_offer, bookingLimitDatetime=yesterday)
-
-        inactive_offer = offers_factories.ThingOfferFactory(venue=venue, isActive=False)
-        offers_factories.StockFactory(offer=inactive_offer)
-
-        active_offer_on_another_venue = offers_factories.ThingOfferFactory()
-        offers_factories.StockFactory(offer=active_offer_on_another_venue)
-
-        # When
-        active_offers_count = get_active_offers_count_for_venue(venue.id)
-
-        # Then
-        assert active_offers_count == 2
-
-
-@pytest.mark.usefixtures("db_session")
-class GetSoldOutOffersCountForVenueTest:
-    def test_counts_sold_out_offers_for_venue(self):
-        # Given
-        venue = offers_factories.VenueFactory()
-
-        active_offer = offers_factories.ThingOfferFactory(venue=venue)
-        offers_factories.StockFactory(offer=active_offer)
-
-        sold_out_offer = offers_factories.ThingOfferFactory(venue=venue)
-        sold_out_stock = offers_factories.StockFactory(quantity=1, offer=sold_out_offer)
-        bookings_factories.BookingFactory(stock=sold_out_stock)
-        other_sold_out_offer = offers_factories.EventOfferFactory(venue=venue)
-        other_sold_out_stock = offers_factories.EventStockFactory(quantity=1, offer=other_sold_out_offer)
-        bookings_factories.BookingFactory(stock=other_sold_out_stock)
-        offers_factories.EventStockFactory(quantity=0, offer=other_sold_out_offer)
-
-        expired_offer = offers_factories.EventOfferFactory(venue=venue)
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        offers_factories.EventStockFactory(offer=expired_offer, bookingLimitDatetime=yesterday)
-
-        inactive_offer = offers_factories.ThingOfferFactory(venue=venue, isActive=False)
-        offers_factories.StockFactory(offer=inactive_offer)
-
-        active_offer_on_another_venue = offers_factories.ThingOfferFactory()
-        offers_factories.StockFactory(offer=active_offer_on_another_venue)
-
-        # When
-        sold_out_offers_count = get_sold_out_offers_count_for_venue(venue.id)
-
-        # Then
-        assert sold_out_offers_count == 2
-
-
 @pytest.mark.usefixtures("db_session")
 class CheckStockConsistenceTest:
     def test_with_inconsistencies(self):
@@ -1126,6 +1087,51 @@ class CheckStockConsistenceTest:
         stock_ids = set(check_stock_consistency())
         assert stock_ids == {stock2.id, stock4.id, stock6.id}
 
+    @mock.patch("pcapi.core.offers.repository.STOCK_CONSISTENCY_BATCH_SIZE", 2)
+    def test_full_scan_by_batches(self):
+        stocks = offers_factories.StockFactory.create_batch(5, dnBookedQuantity=1)
+        offers_factories.StockFactory(dnBookedQuantity=0)
+
+        stock_ids = set(check_stock_consistency())
+        assert stock_ids == {stock.id for stock in stocks}
+
+    def test_only_check_stocks_touched_since(self):
+        long_ago = datetime.utcnow() - timedelta(days=10)
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        # inconsistent but untouched stock
+        old_booking = bookings_factories.BookingFactory(dateCreated=long_ago, stock__dateModified=long_ago)
+        old_booking.stock.dnBookedQuantity = 3
+        # inconsistent stock, booked recently
+        new_booking = bookings_factories.BookingFactory(stock__dateModified=long_ago)
+        new_booking.stock.dnBookedQuantity = 3
+        # inconsistent stock, with a booking cancelled recently
+        cancelled_booking = bookings_factories.BookingFactory(dateCreated=long_ago, stock__dateModified=long_ago)
+        cancelled_booking.stock.dnBookedQuantity = 1
+        # inconsistent stock, with a booking uncancelled recently
+        uncancelled_booking = bookings_factories.BookingFactory(
+            dateCreated=long_ago, isCancelled=True, stock__dateModified=long_ago
+        )
+        # inconsistent stock, modified recently
+        modified_stock = offers_factories.StockFactory(dnBookedQuantity=2)
+        repository.save(old_booking.stock, new_booking.stock, cancelled_booking.stock)
+        # The trigger sets `dateModified` on INSERT, unless an UPDATE
+        # sets it explicitly.
+        Booking.query.filter(
+            Booking.id.in_([old_booking.id, cancelled_booking.id, uncancelled_booking.id])
+        ).update({"dateModified": long_ago}, synchronize_session=False)
+        Booking.query.filter_by(id=cancelled_booking.id).update({"isCancelled": True}, synchronize_session=False)
+        Booking.query.filter_by(id=uncancelled_booking.id).update(
+            {"isCancelled": False, "cancellationDate": None}, synchronize_session=False
+        )
+
+        stock_ids = set(check_stock_consistency(since=yesterday))
+        assert stock_ids == {
+            new_booking.stock.id,
+            cancelled_booking.stock.id,
+            uncancelled_booking.stock.id,
+            modified_stock.id,
+        }
+
 
 @pytest.mark.usefixtures("db_session")
 class TomorrowStockTest:
@@ -1186,6 +1192,30 @@ class GetExpiredOffersTest:
         assert offers.all() == [offer1]
 
 
+@pytest.mark.usefixtures("db_session")
+class UpdateOffersStatusAfterDatesTest:
+    def test_refresh_offers_with_recently_passed_dates(self):
+        now = datetime.utcnow()
+        recent_stock = offers_factories.StockFactory(bookingLimitDatetime=now - timedelta(minutes=30))
+        old_stock = offers_factories.StockFactory(bookingLimitDatetime=now - timedelta(days=2))
+        # Simulate offers whose status was computed before the date passed.
+        Offer.query.update({"status": OfferStatus.ACTIVE.name}, synchronize_session=False)
+        db.session.commit()
+
+        updated = update_offers_status_after_dates(since=now - timedelta(hours=1))
+
+        assert updated == 1
+        assert Offer.query.get(recent_stock.offerId).status == OfferStatus.EXPIRED
+        assert Offer.query.get(old_stock.offerId).status == OfferStatus.ACTIVE
+
+    def test_ignore_offers_whose_status_is_up_to_date(self):
+        offers_factories.StockFactory(bookingLimitDatetime=datetime.utcnow() - timedelta(minutes=30))
+
+        updated = update_offers_status_after_dates(since=datetime.utcnow() - timedelta(hours=1))
+
+        assert updated == 0
+
+
 @pytest.mark.usefixtures("db_session")
 class DeletePastDraftOfferTest:
     @freeze_time("2020-10-15 09:00:00")
@@ -1,5 +1,5 @@
+from collections import namedtuple
 from datetime import datetime
-from datetime import timedelta
 from unittest.mock import patch
 
 from dateutil.relativedelta import relativedelta
@@ -9,7 +9,6 @@ from pcapi.core.bookings.factories import BookingFactory
 import pcapi.core.mails.testing as mails_testing
 from pcapi.core.offers.factories import OfferFactory
 from pcapi.core.offers.factories import OffererFactory
-from pcapi.core.offers.factories import ProductFactory
 from pcapi.core.offers.factories import UserOffererFactory
 from pcapi.core.offers.factories import VenueFactory
 from pcapi.core.offers.models import OfferValidationStatus
@@ -32,7 +31,7 @@ from pcapi.domain.user_emails import send_rejection_email_to_beneficiary_pre_sub
 from pcapi.domain.user_emails import send_reset_password_email_to_native_app_user
 from pcapi.domain.user_emails import send_reset_password_email_to_pro
 from pcapi.domain.user_emails import send_reset_password_email_to_user
-from pcapi.domain.user_emails import send_soon_to_be_expired_bookings_recap_email_to_beneficiary
+from pcapi.domain.user_emails import send_soon_to_be_expired_bookings_recap_emails
 from pcapi.domain.user_emails import send_user_driven_cancellation_email_to_offerer
 from pcapi.domain.user_emails import send_validation_confirmation_email_to_pro
 from pcapi.domain.user_emails import send_warning_to_beneficiary_after_pro_booking_cancellation
@@ -41,7 +40,6 @@ from pcapi.model_creators.generic_creators import create_offerer
 from pcapi.model_creators.generic_creators import create_user
 from pcapi.model_creators.generic_creators import create_venue
 from pcapi.model_creators.specific_creators import create_stock_with_event_offer
-from pcapi.models import offer_type
 from pcapi.utils.human_ids import humanize
 
 from tests.domain_creators.generic_creators import create_domain_beneficiary_pre_subcription
@@ -422,48 +420,31 @@ class SendExpiredBookingsRecapEmailToOffererTest:
         assert mails_testing.outbox[0].sent_data["Mj-TemplateID"] == 1952508
 
 
+UserBookings = namedtuple("UserBookings", ["id", "email", "firstName", "bookings"])
+
+
 @pytest.mark.usefixtures("db_session")
-class SendSoonToBeExpiredBookingsRecapEmailToBeneficiaryTest:
-    @patch(
-        "pcapi.domain.user_emails.build_soon_to_be_expired_bookings_recap_email_data_for_beneficiary",
-        return_value={"MJ-TemplateID": 12345},
-    )
-    def test_should_send_email_to_beneficiary_when_they_have_soon_to_be_expired_bookings(
-        self, build_soon_to_be_expired_bookings_recap_email_data_for_beneficiary
-    ):
+class SendSoonToBeExpiredBookingsRecapEmailsTest:
+    def test_should_send_one_email_per_user(self):
         # given
-        now = datetime.utcnow()
-        user = users_factories.UserFactory(email="isasimov@example.com", isBeneficiary=True, isAdmin=False)
-        created_23_days_ago = now - timedelta(days=23)
-
-        dvd = ProductFactory(type=str(offer_type.ThingType.AUDIOVISUEL))
-        soon_to_be_expired_dvd_booking = BookingFactory(
-            stock__offer__product=dvd,
-            stock__offer__name="Fondation",
-            stock__offer__venue__name="Première Fondation",
-            dateCreated=created_23_days_ago,
-            user=user,
-        )
-
-        cd = ProductFactory(type=str(offer_type.ThingType.MUSIQUE))
-        soon_to_be_expired_cd_booking = BookingFactory(
-            stock__offer__product=cd,
-            stock__offer__name="Fondation et Empire",
-            stock__offer__venue__name="Seconde Fondation",
-            dateCreated=created_23_days_ago,
-            user=user,
-        )
+        users_bookings = [
+            UserBookings(1, "isasimov@example.com", "Isaac", [{"offer_name": "Fondation", "venue_name": "Trantor"}]),
+            UserBookings(2, "hseldon@example.com", "Hari", [{"offer_name": "Prélude", "venue_name": "Terminus"}]),
+        ]
 
         # when
-        send_soon_to_be_expired_bookings_recap_email_to_beneficiary(
-            user, [soon_to_be_expired_cd_booking, soon_to_be_expired_dvd_booking]
-        )
+        successful = send_soon_to_be_expired_bookings_recap_emails(users_bookings)
 
         # then
-        build_soon_to_be_expired_bookings_recap_email_data_for_beneficiary.assert_called_once_with(
-            user, [soon_to_be_expired_cd_booking, soon_to_be_expired_dvd_booking]
-        )
-        assert mails_testing.outbox[0].sent_data["MJ-TemplateID"] == 12345
+        assert successful
+        assert len(mails_testing.outbox) == 2
+        assert mails_testing.outbox[0].sent_data["To"] == "isasimov@example.com"
+        assert mails_testing.outbox[0].sent_data["Mj-TemplateID"] == 1927224
+        assert mails_testing.outbox[0].sent_data["Vars"]["user_firstName"] == "Isaac"
+        assert mails_testing.outbox[1].sent_data["To"] == "hseldon@example.com"
+        assert mails_testing.outbox[1].sent_data["Vars"]["bookings"] == [
+            {"offer_name": "Prélude", "venue_name": "Terminus"}
+        ]
 
 
 @pytest.mark.usefixtures("db_session")
@@ -1,5 +1,6 @@
 import pytest
 
+from pcapi.core.testing import assert_num_queries
 from pcapi.domain.pro_offerers.paginated_offerers import PaginatedOfferers
 from pcapi.infrastructure.repository.pro_offerers.paginated_offerers_sql_repository import (
     PaginatedOfferersSQLRepository,
@@ -146,3 +147,83 @@ class PaginatedOffererSQLRepositoryTest:
         assert paginated_offerers.total == 1
         assert len(paginated_offerers.offerers) == 1
         assert paginated_offerers.offerers[0].id == offerer2.id
+
+    @pytest.mark.usefixtures("db_session")
+    def should_return_next_page_after_given_offerer(self, app):
+        # Given
+        user = create_user()
+        offerer1 = create_offerer(name="Cinema", siren="912345671")
+        offerer2 = create_offerer(name="Theatre", siren="912345672")
+        offerer3 = create_offerer(name="Theatre", siren="912345673")
+        user_offerer1 = create_user_offerer(user=user, offerer=offerer1)
+        user_offerer2 = create_user_offerer(user=user, offerer=offerer2)
+        user_offerer3 = create_user_offerer(user=user, offerer=offerer3)
+        repository.save(user_offerer1, user_offerer2, user_offerer3)
+
+        # When
+        first_page = PaginatedOfferersSQLRepository().with_status_and_keywords(
+            user_id=user.id,
+            user_is_admin=user.isAdmin,
+            is_filtered_by_offerer_status=False,
+            only_validated_offerers=None,
+            pagination_limit=2,
+        )
+        second_page = PaginatedOfferersSQLRepository().with_status_and_keywords(
+            user_id=user.id,
+            user_is_admin=user.isAdmin,
+            is_filtered_by_offerer_status=False,
+            only_validated_offerers=None,
+            pagination_limit=2,
+            after_id=first_page.offerers[-1].id,
+        )
+
+        # Then
+        assert [offerer.id for offerer in first_page.offerers] == [offerer1.id, offerer2.id]
+        assert [offerer.id for offerer in second_page.offerers] == [offerer3.id]
+        assert second_page.total == 3
+
+    @pytest.mark.usefixtures("db_session")
+    def should_not_count_offerers_when_total_is_not_requested(self, app):
+        # Given
+        user = create_user()
+        offerer = create_offerer()
+        user_offerer = create_user_offerer(user=user, offerer=offerer)
+        repository.save(user_offerer)
+        user_id = user.id
+
+        # When
+        with assert_num_queries(2):
+            paginated_offerers = PaginatedOfferersSQLRepository().with_status_and_keywords(
+                user_id=user_id,
+                user_is_admin=False,
+                is_filtered_by_offerer_status=False,
+                only_validated_offerers=None,
+                pagination_limit=10,
+                with_total=False,
+            )
+
+        # Then
+        assert paginated_offerers.total is None
+        assert [listed_offerer.id for listed_offerer in paginated_offerers.offerers] == [offerer.id]
+
+    @pytest.mark.usefixtures("db_session")
+    def should_compute_user_access_without_loading_user_offerers(self, app):
+        # Given
+        user = create_user()
+        offerer1 = create_offerer(name="A", siren="912345671")
+        offerer2 = create_offerer(name="B", siren="912345672")
+        user_offerer1 = create_user_offerer(user=user, offerer=offerer1)
+        user_offerer2 = create_user_offerer(user=user, offerer=offerer2, validation_token="TOKEN")
+        repository.save(user_offerer1, user_offerer2)
+
+        # When
+        paginated_offerers = PaginatedOfferersSQLRepository().with_status_and_keywords(
+            user_id=user.id,
+            user_is_admin=user.isAdmin,
+            is_filtered_by_offerer_status=False,
+            only_validated_offerers=None,
+            pagination_limit=10,
+        )
+
+        # Then
+        assert [offerer.userHasAccess for offerer in paginated_offerers.offerers] == [True, False]
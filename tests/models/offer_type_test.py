@@ -1,4 +1,8 @@
+import pytest
+
+from pcapi.models.offer_type import ALL_OFFER_TYPES_DICT
 from pcapi.models.offer_type import EventType
+from pcapi.models.offer_type import OFFER_TYPES_INFO
 from pcapi.models.offer_type import ProductType
 from pcapi.models.offer_type import ThingType
 
@@ -69,3 +73,27 @@ class ProductTypeTest:
 
             # Then
             assert is_event is False
+
+
+class OfferTypesInfoTest:
+    def test_index_all_offer_types(self):
+        assert set(OFFER_TYPES_INFO) == set(ALL_OFFER_TYPES_DICT)
+
+    def test_thing_type_info(self):
+        info = OFFER_TYPES_INFO[str(ThingType.JEUX_VIDEO)]
+
+        assert info.is_thing
+        assert not info.is_event
+        assert info.pro_label == ThingType.JEUX_VIDEO.value["proLabel"]
+        assert info.app_label == "Jeu vidéo"
+        assert info.app_category == "JEUX_VIDEO"
+        assert info.online_only
+
+    def test_type_without_category(self):
+        info = OFFER_TYPES_INFO[str(ThingType.OEUVRE_ART)]
+
+        assert info.app_category is None
+
+    def test_index_is_read_only(self):
+        with pytest.raises(TypeError):
+            OFFER_TYPES_INFO["ThingType.NEW"] = OFFER_TYPES_INFO[str(ThingType.JEUX_VIDEO)]
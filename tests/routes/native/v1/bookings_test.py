@@ -142,10 +142,11 @@ class GetBookingsTest:
         test_client.auth_header = {"Authorization": f"Bearer {access_token}"}
 
         # 1: get the user
+        # 1: get the bookings version (ETag)
         # 1: get the bookings
         # 1: get AUTO_ACTIVATE_DIGITAL_BOOKINGS feature
         # 1: rollback
-        with assert_num_queries(4):
+        with assert_num_queries(5):
             response = test_client.get("/native/v1/bookings")
 
         assert response.status_code == 200
@@ -207,6 +208,80 @@ class GetBookingsTest:
         for booking in response.json["ongoing_bookings"]:
             assert booking["qrCodeData"] is not None
 
+    def test_get_bookings_not_modified(self, app):
+        user = users_factories.UserFactory(email=self.identifier)
+        BookingFactory(user=user)
+
+        access_token = create_access_token(identity=self.identifier)
+        test_client = TestClient(app.test_client())
+        test_client.auth_header = {"Authorization": f"Bearer {access_token}"}
+
+        yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+        response = test_client.get(f"/native/v1/bookings?modifiedSince={yesterday}")
+        etag = response.headers["ETag"]
+
+        # 1: get the user
+        # 1: get the bookings version (ETag)
+        with assert_num_queries(2):
+            response = test_client.get(
+                f"/native/v1/bookings?modifiedSince={yesterday}", headers={"If-None-Match": etag}
+            )
+        assert response.status_code == 304
+
+        # The ETag depends on the parameters of the sync
+        two_days_ago = (datetime.utcnow() - timedelta(days=2)).isoformat()
+        response = test_client.get(f"/native/v1/bookings?modifiedSince={two_days_ago}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+        BookingFactory(user=user)
+        response = test_client.get(f"/native/v1/bookings?modifiedSince={yesterday}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_full_sync_ignores_etag(self, app):
+        booking = BookingFactory(user__email=self.identifier)
+
+        access_token = create_access_token(identity=self.identifier)
+        test_client = TestClient(app.test_client())
+        test_client.auth_header = {"Authorization": f"Bearer {access_token}"}
+
+        response = test_client.get("/native/v1/bookings")
+        assert "ETag" not in response.headers
+
+        # Offer changes do not change the bookings version.
+        booking.stock.offer.name = "Nouveau nom"
+        db.session.commit()
+        response = test_client.get("/native/v1/bookings", headers={"If-None-Match": "*"})
+        assert response.status_code == 200
+        assert response.json["ongoing_bookings"][0]["stock"]["offer"]["name"] == "Nouveau nom"
+
+    def test_get_bookings_modified_since(self, app):
+        user = users_factories.UserFactory(email=self.identifier)
+        old_booking = BookingFactory(user=user)
+        db.session.execute(
+            "UPDATE booking SET \"dateModified\" = :date WHERE id = :id",
+            {"date": datetime.utcnow() - timedelta(days=2), "id": old_booking.id},
+        )
+        event_booking = BookingFactory(user=user, stock__beginningDatetime=datetime.utcnow() - timedelta(hours=1))
+        db.session.execute(
+            "UPDATE booking SET \"dateModified\" = :date WHERE id = :id",
+            {"date": datetime.utcnow() - timedelta(days=2), "id": event_booking.id},
+        )
+        new_booking = BookingFactory(user=user)
+
+        access_token = create_access_token(identity=self.identifier)
+        test_client = TestClient(app.test_client())
+        test_client.auth_header = {"Authorization": f"Bearer {access_token}"}
+
+        yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+        response = test_client.get(f"/native/v1/bookings?modifiedSince={yesterday}")
+
+        assert response.status_code == 200
+        booking_ids = {b["id"] for b in response.json["ongoing_bookings"] + response.json["ended_bookings"]}
+        assert booking_ids == {event_booking.id, new_booking.id}
+        next_modified_since = datetime.fromisoformat(response.json["next_modified_since"].rstrip("Z"))
+        assert datetime.utcnow() - timedelta(minutes=6) < next_modified_since < datetime.utcnow() - timedelta(minutes=4)
+
 
 class CancelBookingTest:
     identifier = "pascal.ture@example.com"
@@ -4,6 +4,8 @@ from datetime import timedelta
 from freezegun import freeze_time
 import pytest
 
+from pcapi.connectors import redis
+import pcapi.core.bookings.api as bookings_api
 from pcapi.core.bookings.factories import BookingFactory
 import pcapi.core.mails.testing as mails_testing
 from pcapi.core.offers.factories import EventStockFactory
@@ -13,6 +15,7 @@ from pcapi.core.offers.factories import ProductFactory
 from pcapi.core.offers.factories import StockWithActivationCodesFactory
 from pcapi.core.offers.factories import ThingStockFactory
 from pcapi.core.testing import assert_num_queries
+import pcapi.core.users.factories as users_factories
 from pcapi.models.db import db
 from pcapi.models.offer_type import EventType
 from pcapi.models.offer_type import ThingType
@@ -26,6 +29,14 @@ from .utils import create_user_and_test_client
 pytestmark = pytest.mark.usefixtures("db_session")
 
 
+@pytest.fixture(autouse=True)
+def clear_native_offer_responses(app):
+    # Offer ids may be reused from a previous test session.
+    keys = app.redis_client.keys(redis.NATIVE_OFFER_RESPONSE_KEY.format(offer_id="*"))
+    if keys:
+        app.redis_client.delete(*keys)
+
+
 class OffersTest:
     @freeze_time("2020-01-01")
     def test_get_event_offer(self, app):
@@ -213,6 +224,62 @@ class OffersTest:
 
         assert response.status_code == 404
 
+    def test_get_offer_from_cache(self, app):
+        stock = ThingStockFactory(price=12.34)
+        offer_id = stock.offer.id
+        client = TestClient(app.test_client())
+        first_response = client.get(f"/native/v1/offer/{offer_id}")
+
+        with assert_num_queries(0):
+            response = client.get(f"/native/v1/offer/{offer_id}")
+
+        assert response.status_code == 200
+        assert response.json == first_response.json
+        assert response.headers["ETag"] == first_response.headers["ETag"]
+
+    def test_get_offer_not_modified(self, app):
+        stock = ThingStockFactory()
+        offer_id = stock.offer.id
+        client = TestClient(app.test_client())
+        etag = client.get(f"/native/v1/offer/{offer_id}").headers["ETag"]
+
+        with assert_num_queries(0):
+            response = client.get(f"/native/v1/offer/{offer_id}", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert not response.data
+
+    def test_get_offer_after_stock_update(self, app):
+        stock = ThingStockFactory(price=12.34)
+        offer_id = stock.offer.id
+        client = TestClient(app.test_client())
+        etag = client.get(f"/native/v1/offer/{offer_id}").headers["ETag"]
+
+        stock.price = 5
+        db.session.commit()
+
+        response = client.get(f"/native/v1/offer/{offer_id}", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json["stocks"][0]["price"] == 500
+
+    def test_get_offer_after_booking(self, app):
+        stock = ThingStockFactory(quantity=1)
+        offer_id = stock.offer.id
+        beneficiary = users_factories.UserFactory()
+        client = TestClient(app.test_client())
+        etag = client.get(f"/native/v1/offer/{offer_id}").headers["ETag"]
+
+        bookings_api.book_offer(beneficiary=beneficiary, stock_id=stock.id, quantity=1)
+
+        response = client.get(f"/native/v1/offer/{offer_id}", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json["isSoldOut"]
+
 
 class SendOfferWebAppLinkTest:
     def test_send_offer_webapp_link_by_email(self, app):
@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+import pytest
+
+import pcapi.core.bookings.factories as bookings_factories
+import pcapi.core.mails.testing as mails_testing
+import pcapi.core.offers.factories as offers_factories
+import pcapi.core.users.factories as users_factories
+
+from tests.conftest import TestClient
+
+
+@pytest.mark.usefixtures("db_session")
+class Returns202Test:
+    @patch("pcapi.core.users.utils.generate_signed_url", return_value="https://example.com/exports/bookings/signed")
+    @patch("pcapi.core.users.utils.store_file_object")
+    def when_user_is_linked_to_a_valid_offerer(self, mocked_store_file_object, mocked_generate_signed_url, app):
+        uploaded_content = []
+        mocked_store_file_object.side_effect = lambda **kwargs: uploaded_content.append(kwargs["file"].read())
+        booking = bookings_factories.BookingFactory(token="ABCDEF")
+        pro_user = users_factories.UserFactory(email="pro@example.com", isBeneficiary=False)
+        offers_factories.UserOffererFactory(user=pro_user, offerer=booking.stock.offer.venue.managingOfferer)
+
+        client = TestClient(app.test_client()).with_auth(pro_user.email)
+        response = client.post("/bookings/pro/export")
+
+        assert response.status_code == 202
+        mocked_store_file_object.assert_called_once()
+        assert b"ABCDEF" not in uploaded_content[0]  # token is hidden until used
+        assert len(mails_testing.outbox) == 1
+        assert mails_testing.outbox[0].sent_data["To"] == "pro@example.com"
+        assert "https://example.com/exports/bookings/signed" in mails_testing.outbox[0].sent_data["Html-part"]
+
+
+@pytest.mark.usefixtures("db_session")
+class Returns401Test:
+    def when_user_is_admin(self, app):
+        admin = users_factories.UserFactory(isAdmin=True)
+
+        client = TestClient(app.test_client()).with_auth(admin.email)
+        response = client.post("/bookings/pro/export")
+
+        assert response.status_code == 401
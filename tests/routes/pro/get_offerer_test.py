@@ -1,7 +1,9 @@
 import pytest
 
+from pcapi.core import testing
 import pcapi.core.offerers.models
 import pcapi.core.offers.factories as offers_factories
+from pcapi.core.offers.models import OfferValidationStatus
 import pcapi.core.users.factories as users_factories
 from pcapi.model_creators.generic_creators import create_bank_information
 from pcapi.utils.date import format_into_utc_date
@@ -94,3 +96,31 @@ class Returns200Test:
         # then
         assert response.status_code == 200
         assert response.json == expected_serialized_offerer
+
+    @pytest.mark.usefixtures("db_session")
+    def test_number_of_queries_does_not_depend_on_venues(self, app):
+        pro = users_factories.UserFactory(isBeneficiary=False)
+        offerer = offers_factories.OffererFactory()
+        offers_factories.UserOffererFactory(user=pro, offerer=offerer)
+        venues = offers_factories.VenueFactory.create_batch(3, managingOfferer=offerer)
+        create_bank_information(venue=venues[0], application_id=2)
+        offers_factories.OfferFactory.create_batch(2, venue=venues[0])
+        offers_factories.OfferFactory(venue=venues[1], validation=OfferValidationStatus.DRAFT)
+
+        client = TestClient(app.test_client()).with_auth(pro.email)
+        check_user_has_access_queries = 1
+        # offerer, venues, offer counts of all venues
+        get_offerer_queries = 3
+        with testing.assert_num_queries(
+            testing.AUTHENTICATION_QUERIES + check_user_has_access_queries + get_offerer_queries
+        ):
+            response = client.get(f"/offerers/{humanize(offerer.id)}")
+
+        assert response.status_code == 200
+        assert response.json["nOffers"] == 2
+        n_offers_by_venue_id = {venue["id"]: venue["nOffers"] for venue in response.json["managedVenues"]}
+        assert n_offers_by_venue_id == {
+            humanize(venues[0].id): 2,
+            humanize(venues[1].id): 0,
+            humanize(venues[2].id): 0,
+        }
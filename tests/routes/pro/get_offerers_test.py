@@ -1,11 +1,13 @@
 import pytest
 
+from pcapi.core import testing
 from pcapi.model_creators.generic_creators import create_bank_information
 from pcapi.model_creators.generic_creators import create_offerer
 from pcapi.model_creators.generic_creators import create_user
 from pcapi.model_creators.generic_creators import create_user_offerer
 from pcapi.model_creators.generic_creators import create_venue
 from pcapi.repository import repository
+from pcapi.utils.human_ids import humanize
 
 from tests.conftest import TestClient
 
@@ -339,6 +341,62 @@ class Returns200Test:
         assert len(response.json) == 1
         assert response.json[0]["name"] == active_offerer.name
 
+    @pytest.mark.usefixtures("db_session")
+    def test_does_not_return_count_when_not_requested(self, app):
+        # given
+        user = create_user(email="user@test.com")
+        offerer = create_offerer()
+        user_offerer = create_user_offerer(user, offerer)
+        repository.save(user_offerer)
+        auth_request = TestClient(app.test_client()).with_auth(email="user@test.com")
+
+        # when
+        response = auth_request.get("/offerers?count=false")
+
+        # then
+        assert response.status_code == 200
+        assert len(response.json) == 1
+        assert "Total-Data-Count" not in response.headers
+
+    @pytest.mark.usefixtures("db_session")
+    def test_number_of_queries_does_not_depend_on_offerers(self, app):
+        # given
+        user = create_user(email="user@test.com")
+        user_offerers = []
+        for i in range(3):
+            offerer = create_offerer(name=f"offreur {i}", siren=f"12345678{i}")
+            venue = create_venue(offerer, siret=f"1234567800000{i}")
+            create_bank_information(application_id=i + 1, venue=venue)
+            user_offerers.append(create_user_offerer(user, offerer))
+        repository.save(*user_offerers)
+        auth_request = TestClient(app.test_client()).with_auth(email="user@test.com")
+
+        # when
+        # count, offerers, venues, offer counts of all venues
+        with testing.assert_num_queries(testing.AUTHENTICATION_QUERIES + 4):
+            response = auth_request.get("/offerers")
+
+        # then
+        assert response.status_code == 200
+        assert len(response.json) == 3
+        assert all(offerer["userHasAccess"] for offerer in response.json)
+
+    @pytest.mark.usefixtures("db_session")
+    def test_returns_next_page_after_given_offerer(self, app):
+        # given
+        user = create_user(email="user@test.com")
+        offerer1 = create_offerer(name="offreur A", siren="123456781")
+        offerer2 = create_offerer(name="offreur B", siren="123456782")
+        repository.save(create_user_offerer(user, offerer1), create_user_offerer(user, offerer2))
+        auth_request = TestClient(app.test_client()).with_auth(email="user@test.com")
+
+        # when
+        response = auth_request.get(f"/offerers?paginate=1&after={humanize(offerer1.id)}")
+
+        # then
+        assert response.status_code == 200
+        assert [offerer["name"] for offerer in response.json] == ["offreur B"]
+
 
 class Returns400Test:
     @pytest.mark.usefixtures("db_session")
@@ -1,8 +1,11 @@
 import pytest
 
 import pcapi.core.bookings.factories as bookings_factories
+from pcapi.core.offerers import api as offerers_api
+from pcapi.core.offerers.models import VenueStats
 import pcapi.core.offers.factories as offers_factories
 import pcapi.core.users.factories as users_factories
+from pcapi.models.db import db
 from pcapi.utils.human_ids import humanize
 
 from tests.conftest import TestClient
@@ -16,6 +19,7 @@ class Returns200Test:
         bookings_factories.BookingFactory(isUsed=True, stock=booking.stock)
         venue = booking.stock.offer.venue
         venue_owner = offers_factories.UserOffererFactory(offerer=venue.managingOfferer).user
+        offerers_api.refresh_venue_stats()
 
         auth_request = TestClient(app.test_client()).with_auth(email=venue_owner.email)
 
@@ -30,6 +34,58 @@ class Returns200Test:
         assert response_json["activeOffersCount"] == 1
         assert response_json["soldOutOffersCount"] == 0
 
+    @pytest.mark.usefixtures("db_session")
+    def when_stats_have_been_computed(self, app):
+        # given
+        venue = offers_factories.VenueFactory()
+        venue_owner = offers_factories.UserOffererFactory(offerer=venue.managingOfferer).user
+        db.session.add(
+            VenueStats(
+                venue=venue,
+                activeBookingsQuantity=12,
+                validatedBookingsQuantity=7,
+                activeOffersCount=3,
+                soldOutOffersCount=1,
+            )
+        )
+        db.session.commit()
+
+        auth_request = TestClient(app.test_client()).with_auth(email=venue_owner.email)
+
+        # when
+        response = auth_request.get("/venues/%s/stats" % humanize(venue.id))
+
+        # then
+        assert response.status_code == 200
+        assert response.json == {
+            "activeBookingsQuantity": 12,
+            "validatedBookingsQuantity": 7,
+            "activeOffersCount": 3,
+            "soldOutOffersCount": 1,
+        }
+
+
+    @pytest.mark.usefixtures("db_session")
+    def when_venue_has_no_stats(self, app):
+        # given
+        venue = offers_factories.VenueFactory()
+        venue_owner = offers_factories.UserOffererFactory(offerer=venue.managingOfferer).user
+
+        auth_request = TestClient(app.test_client()).with_auth(email=venue_owner.email)
+
+        # when
+        response = auth_request.get("/venues/%s/stats" % humanize(venue.id))
+
+        # then
+        assert response.status_code == 200
+        assert response.json == {
+            "activeBookingsQuantity": 0,
+            "validatedBookingsQuantity": 0,
+            "activeOffersCount": 0,
+            "soldOutOffersCount": 0,
+        }
+        assert VenueStats.query.count() == 0
+
 
 class Returns403Test:
     @pytest.mark.usefixtures("db_session")
@@ -0,0 +1,82 @@
+import pytest
+
+from pcapi.core.bookings.factories import BookingFactory
+from pcapi.core.offerers.factories import ApiKeyFactory
+from pcapi.core.offerers.factories import DEFAULT_CLEAR_API_KEY
+import pcapi.core.offers.factories as offers_factories
+from pcapi.core.users.factories import UserFactory
+from pcapi.models import Booking
+
+from tests.conftest import TestClient
+
+
+@pytest.mark.usefixtures("db_session")
+class Returns200Test:
+    def test_with_api_key(self, app):
+        booking1 = BookingFactory(token="ABCDEF")
+        offerer = booking1.stock.offer.venue.managingOfferer
+        booking2 = BookingFactory(token="GHIJKL", stock__offer__venue__managingOfferer=offerer)
+        ApiKeyFactory(offerer=offerer)
+
+        client = TestClient(app.test_client())
+        response = client.patch(
+            "/v2/bookings/use/tokens",
+            json={"tokens": ["abcdef", "GHIJKL"]},
+            headers={"Authorization": f"Bearer {DEFAULT_CLEAR_API_KEY}", "Origin": "http://localhost"},
+        )
+
+        assert response.status_code == 200
+        assert response.json == {
+            "results": [
+                {"token": "ABCDEF", "isUsed": True, "errors": None},
+                {"token": "GHIJKL", "isUsed": True, "errors": None},
+            ]
+        }
+        assert Booking.query.get(booking1.id).isUsed
+        assert Booking.query.get(booking2.id).isUsed
+
+    def test_return_errors_per_token(self, app):
+        pro = UserFactory()
+        booking = BookingFactory(token="ABCDEF")
+        offers_factories.UserOffererFactory(user=pro, offerer=booking.stock.offer.venue.managingOfferer)
+        BookingFactory(token="CANCEL", isCancelled=True, stock__offer__venue=booking.stock.offer.venue)
+        other_offerer_booking = BookingFactory(token="OTHERS")
+
+        client = TestClient(app.test_client()).with_auth(pro.email)
+        response = client.patch("/v2/bookings/use/tokens", json={"tokens": ["ABCDEF", "CANCEL", "OTHERS", "UNKNOW"]})
+
+        assert response.status_code == 200
+        assert response.json == {
+            "results": [
+                {"token": "ABCDEF", "isUsed": True, "errors": None},
+                {"token": "CANCEL", "isUsed": False, "errors": {"booking": ["Cette réservation a été annulée"]}},
+                {
+                    "token": "OTHERS",
+                    "isUsed": False,
+                    "errors": {"user": ["Vous n'avez pas les droits suffisants pour valider cette contremarque."]},
+                },
+                {"token": "UNKNOW", "isUsed": False, "errors": {"global": ["Cette contremarque n'a pas été trouvée"]}},
+            ]
+        }
+        assert Booking.query.get(booking.id).isUsed
+        assert not Booking.query.get(other_offerer_booking.id).isUsed
+
+
+@pytest.mark.usefixtures("db_session")
+class Returns400Test:
+    def test_too_many_tokens(self, app):
+        pro = UserFactory()
+
+        client = TestClient(app.test_client()).with_auth(pro.email)
+        response = client.patch("/v2/bookings/use/tokens", json={"tokens": [f"T{i:05}" for i in range(101)]})
+
+        assert response.status_code == 400
+
+
+@pytest.mark.usefixtures("db_session")
+class Returns401Test:
+    def test_when_not_authenticated(self, app):
+        client = TestClient(app.test_client())
+        response = client.patch("/v2/bookings/use/tokens", json={"tokens": ["ABCDEF"]})
+
+        assert response.status_code == 401
@@ -7,6 +7,7 @@ import pytest
 from pcapi.core.bookings.factories import BookingFactory
 from pcapi.core.bookings.models import BookingCancellationReasons
 from pcapi.core.offers.factories import ProductFactory
+from pcapi.core.offers.factories import StockFactory
 from pcapi.core.testing import assert_num_queries
 from pcapi.core.users.factories import UserFactory
 from pcapi.models import offer_type
@@ -109,6 +110,26 @@ class CancelExpiredBookingsTest:
         assert not old_audio_book_booking.cancellationDate
         assert not old_audio_book_booking.cancellationReason
 
+    @mock.patch("pcapi.connectors.redis.add_offer_ids")
+    def should_update_stocks_and_reindex_offers_of_all_batches(self, mocked_add_offer_ids, app) -> None:
+        two_months_ago = datetime.utcnow() - timedelta(days=60)
+        book = ProductFactory(type=str(offer_type.ThingType.LIVRE_EDITION))
+        stock = StockFactory(offer__product=book)
+        BookingFactory.create_batch(size=3, stock=stock, dateCreated=two_months_ago)
+        BookingFactory(stock=stock, dateCreated=two_months_ago, quantity=2)
+        other_booking = BookingFactory(stock__offer__product=book, dateCreated=two_months_ago)
+        recent_booking = BookingFactory(stock=stock)
+
+        handle_expired_bookings.cancel_expired_bookings(batch_size=2)
+
+        assert stock.dnBookedQuantity == 1
+        assert other_booking.stock.dnBookedQuantity == 0
+        assert not recent_booking.isCancelled
+        reindexed_offer_ids = {
+            offer_id for call in mocked_add_offer_ids.call_args_list for offer_id in call.kwargs["offer_ids"]
+        }
+        assert reindexed_offer_ids == {stock.offerId, other_booking.stock.offerId}
+
     def test_queries_performance(self, app) -> None:
         now = datetime.utcnow()
         two_months_ago = now - timedelta(days=60)
@@ -116,13 +137,9 @@ class CancelExpiredBookingsTest:
         user = UserFactory()
         BookingFactory.create_batch(size=10, stock__offer__product=book, dateCreated=two_months_ago, user=user)
         n_queries = (
-            1  # select count
-            + 1  # select initial booking ids
-            + 1  # select associated stocks
-            + 1  # release savepoint/COMMIT
-            + 4 * 3  # update, release savepoint/COMMIT, select next ids
-            + 1  # recompute denormalized booking quantity in stock
-            + 1  # commit previous computation
+            1  # select SYNCHRONIZE_ALGOLIA feature
+            + 4 * 3  # update bookings, update stocks, release savepoint/COMMIT
+            + 1  # update bookings (none left)
         )
 
         with assert_num_queries(n_queries):
@@ -1,22 +1,18 @@
 from datetime import date
 from datetime import timedelta
-from unittest import mock
 
 import pytest
 
 from pcapi.core.bookings.factories import BookingFactory
+import pcapi.core.mails.testing as mails_testing
 from pcapi.core.offers.factories import ProductFactory
 from pcapi.models import offer_type
-from pcapi.repository import repository
 from pcapi.scripts.booking.notify_soon_to_be_expired_bookings import notify_users_of_soon_to_be_expired_bookings
 
 
 @pytest.mark.usefixtures("db_session")
 class NotifyUsersOfSoonToBeExpiredBookingsTest:
-    @mock.patch(
-        "pcapi.scripts.booking.notify_soon_to_be_expired_bookings.send_soon_to_be_expired_bookings_recap_email_to_beneficiary"
-    )
-    def should_call_email_service_for_bookings_which_will_expire_in_7_days(self, mocked_email_recap, app) -> None:
+    def should_send_email_for_bookings_which_will_expire_in_7_days(self, app) -> None:
         # Given
         now = date.today()
         booking_date_23_days_ago = now - timedelta(days=23)
@@ -25,19 +21,38 @@ class NotifyUsersOfSoonToBeExpiredBookingsTest:
         dvd = ProductFactory(type=str(offer_type.ThingType.AUDIOVISUEL))
         expire_in_7_days_dvd_booking = BookingFactory(
             stock__offer__product=dvd,
+            stock__offer__name="Fondation",
+            stock__offer__venue__name="Trantor",
+            stock__offer__venue__publicName=None,
             dateCreated=booking_date_23_days_ago,
             isCancelled=False,
         )
         non_expired_cd = ProductFactory(type=str(offer_type.ThingType.MUSIQUE))
-        dont_expire_in_7_days_cd_booking = BookingFactory(
+        BookingFactory(
             stock__offer__product=non_expired_cd,
             dateCreated=booking_date_22_days_ago,
             isCancelled=False,
         )
-        repository.save(dont_expire_in_7_days_cd_booking)
 
         # When
         notify_users_of_soon_to_be_expired_bookings()
 
         # Then
-        mocked_email_recap.assert_called_once_with(expire_in_7_days_dvd_booking.user, [expire_in_7_days_dvd_booking])
+        assert len(mails_testing.outbox) == 1
+        sent_data = mails_testing.outbox[0].sent_data
+        assert sent_data["To"] == expire_in_7_days_dvd_booking.user.email
+        assert sent_data["Vars"]["bookings"] == [{"offer_name": "Fondation", "venue_name": "Trantor"}]
+
+    def should_notify_users_in_batches(self, app) -> None:
+        # Given
+        booking_date_23_days_ago = date.today() - timedelta(days=23)
+        dvd = ProductFactory(type=str(offer_type.ThingType.AUDIOVISUEL))
+        bookings = BookingFactory.create_batch(3, stock__offer__product=dvd, dateCreated=booking_date_23_days_ago)
+
+        # When
+        notify_users_of_soon_to_be_expired_bookings(batch_size=2)
+
+        # Then
+        assert sorted(mail.sent_data["To"] for mail in mails_testing.outbox) == sorted(
+            booking.user.email for booking in bookings
+        )
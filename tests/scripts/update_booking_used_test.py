@@ -79,3 +79,22 @@ class UpdateBookingUsedTest:
     def test_raise_if_feature_flag_is_deactivated(self):
         with pytest.raises(ValueError):
             update_booking_used_after_stock_occurrence()
+
+    @freeze_time("2019-10-13")
+    @pytest.mark.usefixtures("db_session")
+    def test_update_bookings_by_batches(self):
+        # Given
+        beginning = datetime(2019, 10, 9, 10, 20, 0)
+        stock = offers_factories.EventStockFactory(beginningDatetime=beginning)
+        bookings = bookings_factories.BookingFactory.create_batch(5, stock=stock)
+        cancelled_booking = bookings_factories.BookingFactory(stock=stock, isCancelled=True)
+        future_booking = bookings_factories.BookingFactory(stock__beginningDatetime=datetime(2019, 10, 20))
+
+        # When
+        update_booking_used_after_stock_occurrence(batch_size=2)
+
+        # Then
+        assert all(booking.isUsed for booking in bookings)
+        assert all(booking.dateUsed == datetime(2019, 10, 13) for booking in bookings)
+        assert not cancelled_booking.isUsed
+        assert not future_booking.isUsed
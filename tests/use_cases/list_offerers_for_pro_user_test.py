@@ -62,4 +62,6 @@ class ListOfferersForProUserTest:
             pagination_limit=10,
             keywords="Offerer or venue name",
             page=2,
+            after_id=None,
+            with_total=True,
         )